@@ -6,9 +6,10 @@ sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 import streamlit as st
 from streamlit_folium import st_folium
-from src.load_data import load_wy_data, load_linked_data
+from src.load_data import load_wy_data, LinkedTableStore
+from src.cache import DEFAULT_CACHE_DIR, file_fingerprint
 from src.mappings import ui_mappings
-from filters import apply_filters
+from filters import apply_filters, FilterIndex
 from map_utils import render_incident_map
 import sidebars
 
@@ -28,17 +29,31 @@ st.set_page_config(page_title='West Yorkshire Traffic Analysis', layout='wide')
 
 @st.cache_data
 def get_data():
-    return load_wy_data('data/accidents.csv')
+    return load_wy_data('data/accidents.csv', cache_dir=DEFAULT_CACHE_DIR)
 
-@st.cache_data
-def get_linked_assets(ids):
-    # Ensure paths are relative to the project root
-    veh = load_linked_data('data/vehicles.csv', ids)
-    cas = load_linked_data("data/casualties.csv", ids)
-    print("--- Casualty Columns ---")
-    print(cas.columns.tolist())
+@st.cache_resource
+def get_linked_stores():
+    # Read each linked file once per process, then serve slices from memory.
+    veh = LinkedTableStore('data/vehicles.csv', cache_dir=DEFAULT_CACHE_DIR)
+    cas = LinkedTableStore('data/casualties.csv', cache_dir=DEFAULT_CACHE_DIR)
     return veh, cas
 
+def get_linked_assets(ids, year):
+    veh_store, cas_store = get_linked_stores()
+    return veh_store.rows_for(ids, year=year), cas_store.rows_for(ids, year=year)
+
+def data_fingerprint(year_df, cas_df):
+    # What a filter index was built from: the row counts and source files.
+    return (len(year_df), len(cas_df),
+            file_fingerprint('data/accidents.csv'),
+            file_fingerprint('data/casualties.csv'))
+
+@st.cache_resource
+def get_filter_index(_year_df, _cas_df, year, fingerprint):
+    # Bitmaps for every sidebar filter plus the casualty reverse index,
+    # built once per year (and version of the data) not per click.
+    return FilterIndex(_year_df, ui_mappings, _cas_df)
+
 df = get_data()
 
 filters = sidebars.render_sidebar(df, ui_mappings)
@@ -54,7 +69,9 @@ show_blackspots = filters['show_blackspots']
 # 1. Get initial data for the year
 filtered_df = df[df['year'] == selected_year].copy()
 target_ids = filtered_df['collision_index']
-veh_df, cas_df = get_linked_assets(target_ids)
+veh_df, cas_df = get_linked_assets(target_ids, selected_year)
+filter_index = get_filter_index(
+    filtered_df, cas_df, selected_year, data_fingerprint(filtered_df, cas_df))
 #-----------------------------------------------------------------------
 # 2. Apply complex filters (from filters.py)
 filtered_df = apply_filters(
@@ -67,7 +84,8 @@ filtered_df = apply_filters(
     road_type_choice=filters['road_type'],
     age_choice=filters['age_choice'],
     selected_genders=filters['genders'],
-    ui_mappings=ui_mappings
+    ui_mappings=ui_mappings,
+    index=filter_index
 )
 
 # 3. Handle Empty State
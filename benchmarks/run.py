@@ -0,0 +1,357 @@
+import argparse
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from contextlib import redirect_stdout
+from functools import cached_property
+
+# Benchmarks of the hot paths on a synthetic national extract (see
+# synthetic.py), with stored baselines and a regression check:
+#
+#   python -m benchmarks.run                    # 100k rows, compare to baseline
+#   python -m benchmarks.run --rows 1000000     # any size, generated once
+#   python -m benchmarks.run --save             # store the times as the baseline
+#
+# Like pytest-benchmark every benchmark runs a number of rounds (setup
+# untimed) and is judged on its best round, the one least disturbed by
+# the rest of the machine. A benchmark fails the check when it is more
+# than --threshold times its baseline, or over its budget in BUDGETS.
+# Everything runs offline (the geocoder is offline and the map and PDF
+# are only written to disk).
+# Baselines are only comparable on the machine they were saved on.
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+BASELINES_FILE = os.path.join(BENCH_DIR, "baselines.json")
+# Generated extracts are kept here between runs.
+DATA_DIR = os.path.join(BENCH_DIR, ".data")
+
+DEFAULT_ROWS = 100_000
+
+# Slower than baseline * threshold counts as a regression...
+DEFAULT_THRESHOLD = 1.5
+# ...if it is also this much slower (s): millisecond timings jitter by more.
+NOISE_FLOOR_S = 0.01
+
+# Fixed limits (s) on a benchmark's best time, checked with or without a
+# baseline. main.py took about 1.8s to import with every dependency loaded
+# up front; the heavy ones are now imported when first used.
+BUDGETS = {"import_main": 0.9}
+
+
+class BenchData:
+    """The extract's paths and, loaded on first use, what the stages make."""
+
+    def __init__(self, paths):
+        self.paths = paths
+
+    @cached_property
+    def accidents(self):
+        from src.load_data import load_wy_data
+        return load_wy_data(self.paths["accidents"])
+
+    @cached_property
+    def vehicles(self):
+        from src.load_data import load_linked_data
+        return load_linked_data(self.paths["vehicles"],
+                                self.accidents["collision_index"].unique())
+
+    @cached_property
+    def casualties(self):
+        from src.load_data import load_linked_data
+        return load_linked_data(self.paths["casualties"],
+                                self.accidents["collision_index"].unique())
+
+    @cached_property
+    def hotspots(self):
+        from src.analysis.blackspots import identify_blackspots
+        return identify_blackspots(self.accidents, top_n=5)
+
+
+# Every benchmark takes the BenchData and a scratch folder and returns
+# (function to time, setup or None). setup runs before each round,
+# untimed, and returns the function's arguments.
+
+def bench_import_main(data, folder):
+    # A fresh interpreter each round, so nothing is imported already.
+    command = [sys.executable, "-c", "import main"]
+    return lambda: subprocess.run(command, cwd=ROOT_DIR, check=True), None
+
+
+def bench_load_wy_data(data, folder):
+    from src.load_data import load_wy_data
+    return lambda: load_wy_data(data.paths["accidents"]), None
+
+
+def bench_add_road_labels(data, folder):
+    import pandas as pd
+    from src.load_data import add_road_labels
+
+    # Every collision in the extract, not just West Yorkshire's.
+    raw = pd.read_csv(data.paths["accidents"],
+                      usecols=["road_type", "first_road_class"])
+    return add_road_labels, lambda: (raw.copy(),)
+
+
+def bench_load_linked_data(data, folder):
+    from src.load_data import load_linked_data
+    ids = data.accidents["collision_index"].unique()
+    return lambda: load_linked_data(data.paths["vehicles"], ids), None
+
+
+def bench_apply_filters(data, folder):
+    from filters import apply_filters
+    from src.mappings import ui_mappings
+
+    def run():
+        # A few sidebar choices, casualty ones included (index built too).
+        return apply_filters(
+            data.accidents, data.casualties,
+            weather_choice=["Raining (no high winds)", "Fine (no high winds)"],
+            severity_choice=["Serious", "Slight"],
+            light_choice=["Daylight"], surface_choice=[],
+            road_type_choice=["Single carriageway", "Roundabout"],
+            age_choice=["21-25", "26-35"], selected_genders=["Male"],
+            ui_mappings=ui_mappings)
+    return run, None
+
+
+def bench_identify_blackspots(data, folder):
+    from src.analysis.blackspots import identify_blackspots
+    return lambda: identify_blackspots(data.accidents, top_n=5), None
+
+
+def bench_render_incident_map(data, folder):
+    from map_utils import render_incident_map
+    from src.mappings import ui_mappings
+
+    def run():
+        m = render_incident_map(data.accidents, data.casualties, data.vehicles,
+                                True, ui_mappings)
+        return m.get_root().render()
+    return run, None
+
+
+def bench_analysis_suites(data, folder):
+    from src.pipeline import charts_stage, DEFAULT_SETTINGS
+
+    state = {"df": data.accidents, "vehicles_df": data.vehicles,
+             "casualties_df": data.casualties, "hotspots": data.hotspots,
+             "data_duration": "2024"}
+
+    def setup():
+        # A new folder each round, or the chart cache skips the drawing.
+        settings = {**DEFAULT_SETTINGS, "chart_workers": 1,
+                    "output_dir": tempfile.mkdtemp(dir=folder)}
+        return state, settings
+    return charts_stage, setup
+
+
+def _report_bench(data, folder, image_dpi):
+    """The report of the extract's charts, drawn once, at image_dpi."""
+    from src.analysis.report_generator import generate_pdf_report
+    from src.pipeline import charts_stage, DEFAULT_SETTINGS
+
+    output_dir = os.path.join(folder, f"report-{image_dpi}")
+    charts = charts_stage(
+        {"df": data.accidents, "vehicles_df": data.vehicles,
+         "casualties_df": data.casualties, "hotspots": data.hotspots,
+         "data_duration": "2024"},
+        {**DEFAULT_SETTINGS, "chart_workers": 1, "output_dir": output_dir})
+
+    def run():
+        generate_pdf_report(
+            charts["report_content"], hotspots_list=data.hotspots,
+            chart_folder=output_dir, charts=charts["charts"],
+            image_dpi=image_dpi)
+    return run, None
+
+
+def bench_generate_pdf_report(data, folder):
+    from src.analysis.report_generator import REPORT_IMAGE_DPI
+    return _report_bench(data, folder, REPORT_IMAGE_DPI)
+
+
+def bench_generate_pdf_full_dpi(data, folder):
+    # The full-size charts, to compare with the compact report above.
+    return _report_bench(data, folder, None)
+
+
+# Benchmark name -> (function, rounds).
+BENCHMARKS = {
+    "import_main": (bench_import_main, 5),
+    "load_wy_data": (bench_load_wy_data, 5),
+    "add_road_labels": (bench_add_road_labels, 5),
+    "load_linked_data": (bench_load_linked_data, 5),
+    "apply_filters": (bench_apply_filters, 5),
+    "identify_blackspots": (bench_identify_blackspots, 5),
+    "render_incident_map": (bench_render_incident_map, 3),
+    "analysis_suites": (bench_analysis_suites, 3),
+    "generate_pdf_report": (bench_generate_pdf_report, 3),
+    "generate_pdf_full_dpi": (bench_generate_pdf_full_dpi, 3),
+}
+
+
+def measure(fn, setup=None, rounds=3):
+    """Seconds of every round (setup untimed), after one warm-up call."""
+    # The warm-up loads lazy imports and the geocoder, as a long run would.
+    fn(*(setup() if setup else ()))
+    times = []
+    for _ in range(rounds):
+        args = setup() if setup else ()
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def run_benchmarks(paths, names=None, rounds=None):
+    """
+    Runs the benchmarks (all of them by default) on the extract at paths.
+    Returns {name: {"best", "median", "rounds"}} in seconds.
+    """
+    data = BenchData(paths)
+    results = {}
+    with tempfile.TemporaryDirectory() as folder:
+        for name in names or BENCHMARKS:
+            bench, default_rounds = BENCHMARKS[name]
+            # The suites and the report print as they go, and folium warns
+            # about its tiles on every map; keep the table readable.
+            with redirect_stdout(io.StringIO()), warnings.catch_warnings():
+                warnings.simplefilter("ignore")
+                fn, setup = bench(data, folder)
+                times = measure(fn, setup, rounds or default_rounds)
+            results[name] = {
+                "best": round(min(times), 5),
+                "median": round(statistics.median(times), 5),
+                "rounds": len(times),
+            }
+            print(f"{name:<22} best {min(times):8.3f}s  "
+                  f"median {statistics.median(times):8.3f}s")
+    return results
+
+
+def load_baselines(path=BASELINES_FILE):
+    """{rows (as a string): {"environment", "benchmarks"}}, or {}."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_baselines(results, rows, path=BASELINES_FILE):
+    """Stores results as the baseline for rows, keeping the other sizes."""
+    baselines = load_baselines(path)
+    baselines[str(rows)] = {
+        "environment": environment(),
+        "benchmarks": results,
+    }
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def environment():
+    """What the times were measured on."""
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def check_regressions(results, baseline, threshold=DEFAULT_THRESHOLD,
+                      noise_floor=NOISE_FLOOR_S):
+    """
+    Compares the best times with a baseline's. Returns one row per
+    benchmark: (name, seconds, baseline seconds or None, ratio or None,
+    regressed).
+    """
+    rows = []
+    for name, result in results.items():
+        before = baseline.get(name, {}).get("best")
+        if not before:
+            rows.append((name, result["best"], None, None, False))
+            continue
+        ratio = result["best"] / before
+        slower = result["best"] - before > noise_floor
+        rows.append((name, result["best"], before, ratio,
+                     ratio > threshold and slower))
+    return rows
+
+
+def check_budgets(results, budgets=BUDGETS):
+    """(name, seconds, budget) for every benchmark slower than its budget."""
+    return [(name, results[name]["best"], budget)
+            for name, budget in budgets.items()
+            if name in results and results[name]["best"] > budget]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the analysis on a synthetic national extract.")
+    parser.add_argument("--rows", type=int, default=DEFAULT_ROWS,
+                        help="collisions in the extract (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS),
+                        help="run just these benchmarks")
+    parser.add_argument("--rounds", type=int, default=None,
+                        help="rounds per benchmark (default: each one's own)")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="slowdown against the baseline that fails "
+                             "(default: %(default)s)")
+    parser.add_argument("--save", action="store_true",
+                        help="store the times as the baseline for --rows")
+    parser.add_argument("--output", default=None,
+                        help="also write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    from benchmarks.synthetic import dataset, wy_rows
+
+    paths = dataset(DATA_DIR, args.rows, args.seed)
+    print(f"{args.rows} collisions, {wy_rows(paths['accidents'])} in West Yorkshire")
+    results = run_benchmarks(paths, args.only, args.rounds)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"rows": args.rows, "environment": environment(),
+                       "benchmarks": results}, f, indent=2)
+
+    over_budget = check_budgets(results)
+    for name, seconds, budget in over_budget:
+        print(f"{name:<22} {seconds:8.3f}s  OVER BUDGET of {budget:.3f}s")
+    failed = 1 if over_budget else 0
+
+    if args.save:
+        save_baselines(results, args.rows)
+        print(f"Baseline saved for {args.rows} rows: {BASELINES_FILE}")
+        return failed
+
+    baseline = load_baselines().get(str(args.rows))
+    if baseline is None:
+        print(f"No baseline for {args.rows} rows (run with --save to store one).")
+        return failed
+
+    regressed = False
+    print(f"\nAgainst the baseline (fails above {args.threshold:.2f}x):")
+    for name, seconds, before, ratio, slow in check_regressions(
+            results, baseline["benchmarks"], args.threshold):
+        if before is None:
+            print(f"{name:<22} {seconds:8.3f}s  (no baseline)")
+            continue
+        print(f"{name:<22} {seconds:8.3f}s  was {before:8.3f}s  "
+              f"{ratio:5.2f}x{'  REGRESSION' if slow else ''}")
+        regressed = regressed or slow
+    return 1 if regressed or over_budget else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,195 @@
+import argparse
+import os
+import numpy as np
+import pandas as pd
+from src.mappings import district_names
+
+# Synthetic STATS19 extracts for benchmarking at national scale.
+# Every row is a copy of a row of the bundled West Yorkshire sample, so
+# the code columns (severity, weather, road type, ages, vehicle types...)
+# keep their real distributions and combinations. The copies get new,
+# unique collision_index keys that the vehicles and casualties link to,
+# and all but wy_share of the collisions are moved to made-up districts
+# spread over England - roughly the share West Yorkshire has of the
+# national extract. The same rows and seed always give the same files.
+
+SAMPLE_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+
+# Bumped when the generator changes, so older extracts aren't reused.
+GENERATOR_VERSION = 2
+
+# Rows of collisions the benchmarks are usually run at.
+SIZES = (10_000, 100_000, 1_000_000, 10_000_000)
+
+# West Yorkshire's share of the collisions in the national extract.
+WY_SHARE = 0.04
+
+# Collisions generated (and written) at a time, so 10M rows fit in memory.
+CHUNK_ROWS = 100_000
+
+# Made-up districts outside West Yorkshire, each with its own police force.
+OTHER_DISTRICTS = 300
+OTHER_FORCES = [force for force in range(1, 64) if force != 13]
+
+# How far (degrees) a copied West Yorkshire collision is moved, so copies
+# of one site still land in the same blackspot cell (about 30m).
+JITTER_DEGREES = 0.0003
+
+# Metres in a degree of latitude (and of longitude at the equator), to move
+# the OS grid easting/northing with the latitude/longitude.
+METRES_PER_DEGREE = 111_320
+
+
+def _sample(name):
+    """A bundled CSV, every value kept as the string it was written as."""
+    return pd.read_csv(os.path.join(SAMPLE_DIR, f"{name}.csv"), dtype=str,
+                       keep_default_na=False)
+
+
+def _metres(lat_shift, lon_shift, latitude):
+    """A (lat, lon) shift in degrees as an (easting, northing) one in metres."""
+    return (lon_shift * METRES_PER_DEGREE * np.cos(np.radians(latitude)),
+            lat_shift * METRES_PER_DEGREE)
+
+
+def _other_districts(rng, accidents):
+    """
+    Code, police force and the shift from West Yorkshire of every made-up
+    district, as (lat, lon, easting, northing) - the grid shift is measured
+    at the district's latitude.
+    """
+    codes = np.array([f"E07{k:06d}" for k in range(OTHER_DISTRICTS)])
+    forces = np.array([str(OTHER_FORCES[k % len(OTHER_FORCES)])
+                       for k in range(OTHER_DISTRICTS)])
+    centres = np.column_stack([
+        rng.uniform(50.7, 55.0, OTHER_DISTRICTS),
+        rng.uniform(-3.5, 1.3, OTHER_DISTRICTS),
+    ])
+    wy_centre = accidents[["latitude", "longitude"]].astype(float).mean().to_numpy()
+    shifts = centres - wy_centre
+    east, north = _metres(shifts[:, 0], shifts[:, 1], centres[:, 0])
+    return codes, forces, np.column_stack([shifts, east, north])
+
+
+def _copy_rows(sample, counts, ids, rng):
+    """
+    Linked rows (vehicles or casualties): counts[i] copies of sample rows
+    for collision ids[i], numbered from 1 within each collision.
+    """
+    total = int(counts.sum())
+    rows = sample.iloc[rng.integers(0, len(sample), total)].reset_index(drop=True)
+    owner = np.repeat(np.arange(len(ids)), counts)
+    starts = np.repeat(np.cumsum(counts) - counts, counts)
+
+    linked = pd.Series(ids[owner])
+    rows["collision_index"] = linked
+    rows["collision_year"] = linked.str[:4]
+    rows["collision_ref_no"] = linked.str[4:]
+    return rows, owner, np.arange(total) - starts + 1
+
+
+def generate_chunk(samples, start, rows, seed, districts, wy_share=WY_SHARE):
+    """Collisions start..start+rows with their vehicles and casualties."""
+    accidents, vehicles, casualties = samples
+    rng = np.random.default_rng([seed, start])
+
+    df = accidents.iloc[rng.integers(0, len(accidents), rows)].reset_index(drop=True)
+    # Year then a 9 digit number, unique across the whole extract.
+    refs = pd.Series(np.arange(start, start + rows)).map("{:09d}".format)
+    df["collision_index"] = df["collision_year"] + refs
+    df["collision_ref_no"] = refs
+    ids = df["collision_index"].to_numpy()
+
+    lat = df["latitude"].astype(float).to_numpy()
+    lon = df["longitude"].astype(float).to_numpy()
+    east = df["location_easting_osgr"].astype(float).to_numpy()
+    north = df["location_northing_osgr"].astype(float).to_numpy()
+    jitter = rng.normal(0, JITTER_DEGREES, (2, rows))
+    lat += jitter[0]
+    lon += jitter[1]
+    jitter_east, jitter_north = _metres(jitter[0], jitter[1], lat)
+    east += jitter_east
+    north += jitter_north
+
+    # Everything outside the West Yorkshire share moves to another district.
+    codes, forces, shifts = districts
+    moved = np.flatnonzero(rng.random(rows) >= wy_share)
+    where = rng.integers(0, len(codes), len(moved))
+    lat[moved] += shifts[where, 0]
+    lon[moved] += shifts[where, 1]
+    east[moved] += shifts[where, 2]
+    north[moved] += shifts[where, 3]
+    for column in ("local_authority_ons_district", "local_authority_highway",
+                   "local_authority_highway_current"):
+        df.loc[moved, column] = codes[where]
+    df.loc[moved, "police_force"] = forces[where]
+    df["latitude"] = np.round(lat, 5).astype(str)
+    df["longitude"] = np.round(lon, 5).astype(str)
+    df["location_easting_osgr"] = np.rint(east).astype(np.int64).astype(str)
+    df["location_northing_osgr"] = np.rint(north).astype(np.int64).astype(str)
+
+    n_vehicles = df["number_of_vehicles"].astype(int).to_numpy()
+    veh, _, numbers = _copy_rows(vehicles, n_vehicles, ids, rng)
+    veh["vehicle_reference"] = numbers.astype(str)
+
+    n_casualties = df["number_of_casualties"].astype(int).to_numpy()
+    cas, owner, numbers = _copy_rows(casualties, n_casualties, ids, rng)
+    cas["casualty_reference"] = numbers.astype(str)
+    # Each casualty belongs to one of its collision's vehicles.
+    cas["vehicle_reference"] = (rng.integers(0, 2**31, len(cas))
+                                % np.maximum(n_vehicles[owner], 1) + 1).astype(str)
+
+    return df, veh, cas
+
+
+def generate(folder, rows, seed=0, wy_share=WY_SHARE, chunk_rows=CHUNK_ROWS):
+    """
+    Writes accidents.csv, vehicles.csv and casualties.csv with rows
+    collisions to folder. Returns {table: path}.
+    """
+    os.makedirs(folder, exist_ok=True)
+    samples = tuple(_sample(name) for name in ("accidents", "vehicles", "casualties"))
+    districts = _other_districts(np.random.default_rng(seed), samples[0])
+    paths = {name: os.path.join(folder, f"{name}.csv")
+             for name in ("accidents", "vehicles", "casualties")}
+
+    for start in range(0, rows, chunk_rows):
+        tables = generate_chunk(samples, start, min(chunk_rows, rows - start),
+                                seed, districts, wy_share)
+        for path, table in zip(paths.values(), tables):
+            # Temp files, so a half written extract is never picked up.
+            table.to_csv(path + ".tmp", index=False, header=start == 0,
+                         mode="w" if start == 0 else "a")
+
+    for path in paths.values():
+        os.replace(path + ".tmp", path)
+    return paths
+
+
+def dataset(folder, rows, seed=0):
+    """The extract for rows and seed in folder, generated the first time."""
+    target = os.path.join(
+        folder, f"stats19-{rows}-seed{seed}-v{GENERATOR_VERSION}")
+    paths = {name: os.path.join(target, f"{name}.csv")
+             for name in ("accidents", "vehicles", "casualties")}
+    if all(os.path.exists(path) for path in paths.values()):
+        return paths
+    return generate(target, rows, seed)
+
+
+def wy_rows(path):
+    """How many collisions of an extract are in West Yorkshire."""
+    districts = pd.read_csv(path, usecols=["local_authority_ons_district"])
+    return int(districts["local_authority_ons_district"].isin(district_names).sum())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Write a synthetic national STATS19 extract.")
+    parser.add_argument("folder")
+    parser.add_argument("--rows", type=int, default=SIZES[1])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    for name, path in generate(args.folder, args.rows, args.seed).items():
+        print(f"{name}: {path} ({os.path.getsize(path) / 2**20:.1f} MiB)")
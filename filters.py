@@ -1,3 +1,163 @@
+import numpy as np
+import pandas as pd
+
+# Sidebar filters that match a casualty (any casualty in the collision).
+CASUALTY_FILTERS = {
+    "gender": "sex_of_casualty",
+    "age_choice": "age_band_of_casualty",
+}
+
+# Sidebar filters that match a coded column in the accidents frame.
+CODED_FILTERS = {
+    "severity": "collision_severity",
+    "weather": "weather_conditions",
+    "light": "light_conditions",
+    "surface": "road_surface_conditions",
+}
+
+
+def _value_bitmaps(series):
+    """One boolean array per distinct value in the column (one hash pass)."""
+    codes, uniques = pd.factorize(series)
+    return {value: codes == i for i, value in enumerate(uniques)}
+
+
+def _collision_sets(cas_df, column):
+    """Value -> sorted unique collision ids with a casualty of that value."""
+    pairs = cas_df[[column, "collision_index"]].drop_duplicates()
+    return {
+        value: np.sort(ids.to_numpy())
+        for value, ids in pairs.groupby(column, observed=True)[
+            "collision_index"]
+    }
+
+
+def _rows_of(sorted_ids, order, collisions):
+    """Accident row positions for the given collision ids (binary search)."""
+    if len(sorted_ids) == 0:
+        return np.array([], dtype=np.int64)
+    pos = np.searchsorted(sorted_ids, collisions)
+    pos = np.minimum(pos, len(sorted_ids) - 1)
+    found = sorted_ids[pos] == collisions
+    return np.sort(order[pos[found]])
+
+
+class FilterIndex:
+    """
+    Precomputed bitmaps for every sidebar filter on one dataset.
+    Build it once (per year) and any sidebar combination is answered by
+    OR-ing the bitmaps within a filter, AND-ing across filters and taking
+    the matching rows in a single step.
+    Casualty filters use a reverse index from each gender/age band to the
+    collisions (and accident rows) that had such a casualty.
+    """
+
+    def __init__(self, df, ui_mappings, cas_df=None):
+        self.df = df
+        self.casualty_ids = None
+        self.casualty_rows = None
+
+        # Label -> code lookups, built once instead of on every rerun.
+        self.inverse = {
+            name: {label: code for code, label in labels.items()}
+            for name, labels in ui_mappings.items()
+        }
+
+        self.bitmaps = {
+            col: _value_bitmaps(df[col])
+            for col in CODED_FILTERS.values()
+            if col in df.columns
+        }
+
+        # Road type matches the exact text label picked in the sidebar.
+        if "display_road_type" in df.columns:
+            self.road_column = "display_road_type"
+            self.bitmaps[self.road_column] = _value_bitmaps(
+                df[self.road_column])
+        else:
+            # Emergency fallback to the numeric road type codes.
+            self.road_column = "road_type"
+            if self.road_column in df.columns:
+                self.bitmaps[self.road_column] = _value_bitmaps(
+                    df[self.road_column].astype(float))
+
+        if cas_df is not None:
+            self.index_casualties(cas_df)
+
+    def index_casualties(self, cas_df):
+        """
+        Builds value -> collision ids and value -> accident row positions
+        for the casualty filters, so they become set intersections.
+        """
+        ids = self.df["collision_index"].to_numpy()
+        order = np.argsort(ids, kind="stable")
+        sorted_ids = ids[order]
+
+        self.casualty_ids = {}
+        self.casualty_rows = {}
+
+        for col in CASUALTY_FILTERS.values():
+            if col not in cas_df.columns:
+                continue
+            self.casualty_ids[col] = _collision_sets(cas_df, col)
+            self.casualty_rows[col] = {}
+
+            for value, collisions in self.casualty_ids[col].items():
+                self.casualty_rows[col][value] = _rows_of(
+                    sorted_ids, order, collisions)
+
+    def _any_of(self, col, values):
+        """OR of the bitmaps for the chosen values in one column."""
+        hits = np.zeros(len(self.df), dtype=bool)
+        for value in values:
+            bitmap = self.bitmaps[col].get(value)
+            if bitmap is not None:
+                hits |= bitmap
+        return hits
+
+    def casualty_mask(self, name, codes):
+        """Rows whose collision had a casualty with any of the codes."""
+        col = CASUALTY_FILTERS[name]
+        mask = np.zeros(len(self.df), dtype=bool)
+        for code in codes:
+            rows = self.casualty_rows.get(col, {}).get(code)
+            if rows is not None:
+                mask[rows] = True
+        return mask
+
+    def codes_for(self, name, labels):
+        """Translate sidebar labels back to the numeric codes."""
+        return [self.inverse[name][label] for label in labels]
+
+    def mask(self, choices, casualty_mask=None):
+        """
+        Combines the chosen filters into one boolean row mask.
+        choices maps a ui_mappings name (severity, weather, ...) or
+        'road_type' to the labels picked in the sidebar.
+        """
+        mask = np.ones(len(self.df), dtype=bool)
+
+        for name, col in CODED_FILTERS.items():
+            if choices.get(name):
+                mask &= self._any_of(col, self.codes_for(name, choices[name]))
+
+        if choices.get("road_type"):
+            if self.road_column == "display_road_type":
+                targets = choices["road_type"]
+            else:
+                targets = self.codes_for("road_type", choices["road_type"])
+            mask &= self._any_of(self.road_column, targets)
+
+        if casualty_mask is not None:
+            mask &= casualty_mask
+
+        return mask
+
+    def take(self, mask):
+        """The single final selection of rows."""
+        return self.df[mask]
+
+
 def apply_filters(
     df,
     cas_df,
@@ -9,94 +169,33 @@ def apply_filters(
     age_choice,
     selected_genders,
     ui_mappings,
+    index=None,
 ):
-    filtered_df = df.copy()
-
-    # Severity
-    if severity_choice:
-        inv_sev = {v: k for k, v in ui_mappings["severity"].items()}
-        target_sev = [inv_sev[s] for s in severity_choice]
-        filtered_df = filtered_df[
-            filtered_df["collision_severity"].isin(target_sev)
-        ]
-
-    # Gender (The Refined Fix)
-    if selected_genders:
-        inv_gender = {v: k for k, v in ui_mappings["gender"].items()}
-        target_genders = [inv_gender[g] for g in selected_genders]
-
-        # Identify collision indices that have at least one of the selected genders
-        mask = cas_df["sex_of_casualty"].isin(target_genders)
-        valid_indices = cas_df[mask]["collision_index"].unique()
-
-        filtered_df = filtered_df[
-            filtered_df["collision_index"].isin(valid_indices)
-        ]
-
-    # Age band - casulty based filter
-    if age_choice:
-        inv_age = {v: k for k, v in ui_mappings["age_choice"].items()}
-        target_ages = [inv_age[a] for a in age_choice]
-
-        # Find all collision IDs in the casualty file that match these ages.
-        mask = cas_df["age_band_of_casualty"].isin(target_ages)
-        valid_indices = cas_df[mask]["collision_index"].unique()
-
-        # Filter the main dataframe to only show those accidents
-        filtered_df = filtered_df[
-            filtered_df["collision_index"].isin(valid_indices)
-        ]
-
-    #  Weather
-    if weather_choice:
-        inv_weather = {v: k for k, v in ui_mappings["weather"].items()}
-        target_w = [inv_weather[w] for w in weather_choice]
-        filtered_df = filtered_df[
-            filtered_df["weather_conditions"].isin(target_w)
-        ]
-
-    # Light Conditions
-    if light_choice:
-        inv_light = {v: k for k, v in ui_mappings["light"].items()}
-        target_lght = [inv_light[lght] for lght in light_choice]
-        filtered_df = filtered_df[
-            filtered_df["light_conditions"].isin(target_lght)
-        ]
-
-    # Road Surface
-    if surface_choice:
-        inv_surf = {v: k for k, v in ui_mappings["surface"].items()}
-        target_s = [inv_surf[s] for s in surface_choice]
-        filtered_df = filtered_df[
-            filtered_df["road_surface_conditions"].isin(target_s)
-        ]
-
-    # Road Type - Using the text-based column (Index 49) from mappings.py
-    if road_type_choice:
-        # Since the sidebar choice IS the text, we check it directly
-        # against the 'display_road_type' column.
-        col_name = "display_road_type"
-
-        if col_name in filtered_df.columns:
-            # Filter for the exact strings selected in the sidebar
-            filtered_df = filtered_df[
-                filtered_df[col_name].isin(road_type_choice)
-            ]
-            # Force both to lowercase to ignore spelling/case mistakes
-            filtered_df = filtered_df[
-                filtered_df[col_name]
-                .str.lower()
-                .isin([x.lower() for x in road_type_choice])
-            ]
-        else:
-            # Emergency fallback to column 20 if 49 isn't available
-            inv_road = {v: k for k, v in ui_mappings["road_type"].items()}
-            target_r = [inv_road[r] for r in road_type_choice]
-            filtered_df = filtered_df[
-                filtered_df["road_type"]
-                .astype(float)
-                .astype(int)
-                .isin(target_r)
-            ]
-
-    return filtered_df
+    # Reuse a prebuilt index where possible (the dashboard caches one).
+    if index is None:
+        index = FilterIndex(df, ui_mappings)
+
+    # Casualty filters (gender, age band) come from the reverse index.
+    if index.casualty_rows is None and (selected_genders or age_choice):
+        index.index_casualties(cas_df)
+
+    casualty_mask = None
+    casualty_choices = {"gender": selected_genders, "age_choice": age_choice}
+    for name, choice in casualty_choices.items():
+        if choice:
+            hits = index.casualty_mask(name, index.codes_for(name, choice))
+            casualty_mask = hits if casualty_mask is None else (
+                casualty_mask & hits)
+
+    mask = index.mask(
+        {
+            "severity": severity_choice,
+            "weather": weather_choice,
+            "light": light_choice,
+            "surface": surface_choice,
+            "road_type": road_type_choice,
+        },
+        casualty_mask=casualty_mask,
+    )
+
+    return index.take(mask)
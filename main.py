@@ -1,107 +1,99 @@
-import matplotlib.pyplot as plt
-plt.style.use('grayscale')
-import time
+import argparse
 import os
-from src.load_data import load_wy_data, load_linked_data, get_data_period
-from src.charts import generate_blackspots_chart
-
-from src.analysis.geography import run_geographical_suite
-from src.analysis.environmental import run_environmental_suite
-from src.analysis.infrastructure import run_infrastructure_suite
-from src.analysis.temporal import run_temporal_suite
-from src.analysis.mapping import generate_severity_map
-from src.analysis.summary_analysis import run_comprehensive_summary
-from src.analysis.blackspots import identify_blackspots
-from src.analysis.demographics import run_demographic_suite
-from src.analysis.report_generator import generate_pdf_report
-
-def main():
-    """Load the data (West Yorkshire filtered)"""
-    
-    #print("Loading West Yorkshire collison data...")
-    df = load_wy_data("data/accidents.csv")
-
-    if df is None or df.empty:
-        # Error notification.
-        print("Error: No data loaded. Please check the file path.")
-        return
-
-    # Get the duration.
-    data_duration = get_data_period(df)
-    #print(f"Analyzing data from: {data_duration}")
-
-    # This now returns a list of dictionaries.
-    hotspots = identify_blackspots(df, top_n=5)
-
-    # Print the results for verification.
-    #print("\n" + "😊" * 17)
-    #print("🌍 OFFLINE GEO-LOOKUP SUCCESSFUL")
-    #print("" + "😊" * 17)
-
-    for i, spot in enumerate(hotspots, 1):
-        #print(f"{i}. {spot['site_label']} | {spot['road_type']})")
-        #print(f"   Coords: {spot['latitude']}, {spot['longitude']}")
-        #print(f"   Total Incidents: {spot['count']}")
-        print("-" * 30)
-
-    # Link the new files to run after the main accidents csv file.
-    wy_indices = df['collision_index'].unique()
-    vehicles_df = load_linked_data("data/vehicles.csv", wy_indices)
-    casualties_df = load_linked_data("data/casualties.csv", wy_indices)
-
-    if df is None or df.empty:
+from src import instrument
+from src.cache import DEFAULT_CACHE_DIR
+from src.pipeline import (
+    ARTEFACT_DIR,
+    DEFAULT_STAGE_WORKERS,
+    STAGES,
+    TIMINGS_FILE,
+    StageError,
+    critical_path_seconds,
+    run_stages,
+)
+
+# Where --blackspot-state keeps the totals when no folder is given.
+BLACKSPOT_STATE_DIR = os.path.join(DEFAULT_CACHE_DIR, "blackspots")
+
+def main(argv=None):
+    """Load the data (West Yorkshire filtered) and run the analysis stages.
+
+    python main.py [load|vehicles|casualties|blackspots|charts|map|report|all]
+    A single stage reuses the saved outputs of the stages before it."""
+
+    parser = argparse.ArgumentParser(
+        description="West Yorkshire traffic analysis, one stage at a time.")
+    parser.add_argument(
+        "stage", nargs="?", default="all", choices=[*STAGES, "all"],
+        help="stage to run (default: all of them)")
+    parser.add_argument(
+        "--artefacts", default=ARTEFACT_DIR,
+        help="folder the stage outputs are saved to and read from")
+    parser.add_argument(
+        "--timings", default=None,
+        help=f"where to write the JSON timing report "
+             f"(default: {TIMINGS_FILE} in the artefact folder)")
+    parser.add_argument(
+        "--memory", action="store_true",
+        help="also trace the Python memory peak of every stage "
+             "(slower, runs one stage at a time)")
+    parser.add_argument(
+        "--workers", type=int, default=DEFAULT_STAGE_WORKERS,
+        help="stages run at the same time (default: %(default)s)")
+    parser.add_argument(
+        "--chart-workers", type=int, default=None,
+        help="processes drawing the charts (default: one per CPU)")
+    parser.add_argument(
+        "--blackspot-state", nargs="?", default=None, const=BLACKSPOT_STATE_DIR,
+        help="keep running blackspot totals in this folder and only add the "
+             f"collisions newer than the last run (default: {BLACKSPOT_STATE_DIR})")
+    parser.add_argument(
+        "--trace", default=None,
+        help="write a Chrome trace of the run's hot paths to this file "
+             "(open it in chrome://tracing or ui.perfetto.dev)")
+    parser.add_argument(
+        "--events", default=None,
+        help="write the same events as a plain JSON list to this file")
+    args = parser.parse_args(argv)
+
+    targets = list(STAGES) if args.stage == "all" else [args.stage]
+    timings_path = args.timings or os.path.join(args.artefacts, TIMINGS_FILE)
+
+    # Instrumentation costs nothing unless a trace is asked for.
+    if args.trace or args.events:
+        instrument.enable(memory=args.memory)
+
+    try:
+        _, timings = run_stages(
+            targets,
+            settings={"cache_dir": DEFAULT_CACHE_DIR,
+                      "chart_workers": args.chart_workers,
+                      "blackspot_state": args.blackspot_state},
+            artefact_dir=args.artefacts,
+            timings_path=timings_path,
+            trace_memory=args.memory,
+            workers=args.workers,
+        )
+    except StageError as e:
         # Error notification.
-        print("Error: No data loaded. Please check the file path.")
+        print(f"Error: {e}")
         return
-    
-    #print(f"Data loaded successfully. Analysing {len(df)} records...\n")
-    start_time = time.time()
-
-    # Execute analysis suites. Print charts to folder.
-    #print("Running full analysis suites(Saving charts to folder)...")
-    run_geographical_suite(df)
-    run_temporal_suite(df)
-    run_infrastructure_suite(df)
-    run_environmental_suite(df)
-    run_demographic_suite(vehicles_df, casualties_df)
-
-    # Print the 5 accident blackspots chart.
-    generate_blackspots_chart(
-        df, "output_charts", hotspots_data=hotspots, data_duration=data_duration)
-
-    # Run the summary
-    report_content = run_comprehensive_summary(df, vehicles_df)
-
-    # Insert the duration into the list for the PDF.
-    report_content.insert(0, f"Analysis Period: {data_duration}")
-    report_content.insert(1, "") # Add a blank space for better look on pdf.
-    
-    # Print Folium map - this will open in the browser.
-    print("Generating Interactive Map...")
-    generate_severity_map(df, blackspots=hotspots)
-
-    # Final summary report.
-    end_time = time.time()
-    duration = round(end_time - start_time, 2)
-    #print(f"\n Analysis complete! Total processing time: {duration} seconds")
-    
-    # At the very end of Main.py
-    generated_files = os.listdir("output_charts")
-    chart_count = len([f for f in generated_files if f.endswith('.png')])
-
-    #print("-" * 30)
-    #print(f"📊 FINAL SANITY CHECK:")
-    #print(f"Total Charts Expected: 16")
-    #print(f"Total Charts Found:    {chart_count}")
-    #print("-" * 30)
-
-    if chart_count < 16:
-        print("⚠️ WARNING: Some charts are missing. Check for duplicate titles!")
-    else:
-        print("✅ All systems go! The folder is full.")
 
-    # Generate the PDF file.
-    generate_pdf_report(report_content, hotspots_list=hotspots)
+    # Where the seconds went.
+    for timing in timings:
+        print(f"{timing['stage']:<11} {timing['source']:<9} {timing['seconds']:>8.2f}s"
+              f"  ({timing['start']:.2f}s - {timing['end']:.2f}s)")
+    if timings:
+        wall = max(timing["end"] for timing in timings)
+        print(f"Wall time {wall:.2f}s, longest path {critical_path_seconds(timings):.2f}s")
+    print(f"Timing report: {timings_path}")
+
+    if args.events:
+        instrument.write_json(args.events)
+        print(f"Events: {args.events}")
+    if args.trace:
+        instrument.write_chrome_trace(args.trace)
+        print(f"Trace: {args.trace}")
 
 if __name__ == "__main__":
     main()
@@ -1,11 +1,149 @@
 import folium
-from folium.plugins import MarkerCluster, HeatMap
+from folium.plugins import MarkerCluster, HeatMap, FastMarkerCluster
+import numpy as np
 import pandas as pd
 
-def render_incident_map(display_df, cas_df, veh_df, show_blackspots, ui_mappings):
+from src import instrument
+from src.fast_markers import compact_payload, popup_callback
+
+# Marker cap for the 'markers' renderer - every marker is a folium object
+# with its own popup, so the render time and the page size grow with it.
+# Bigger selections go to the 'fast' renderer instead.
+MAX_MARKERS = 2_500
+
+# Browser-side marker for the 'fast' renderer (see src/fast_markers.py).
+FAST_MARKER_JS = """
+            var color = value('color');
+            marker = L.circleMarker(new L.LatLng(row[0], row[1]), {
+                radius: 5, color: color, fill: true,
+                fillColor: color, fillOpacity: 0.8
+            });
+"""
+
+POPUP_TEMPLATE = """
+        <div style="font-family: Arial; font-size: 13px; width: 230px;">
+            <h4 style="margin:0 0 10px 0; color: #e74c3c; border-bottom: 1px solid #ccc;">{sev} Incident</h4>
+            <b>Date:</b> {date}<br>
+            <b>Location:</b> {area} Area<br>
+            <b>Road Type:</b> {road}<br>
+            <hr style="margin: 8px 0;">
+            <b>Conditions:</b><br>
+            ☀️ {weather}<br>
+            💡 {light}<br>
+            🛣️ {surface} Surface<br>
+            ⚠️ {special}<br>
+            <hr style="margin: 8px 0;">
+            <b>Involved:</b> {vehicles} Vehicles<br>
+            <b>Casualties:</b> {casualties} 👤<br>
+            <b>Vehicle:</b> {vehicle_summary} 🚗<br>
+        </div>
+        """
+
+
+def _join_per_collision(ids, details):
+    """Joins the distinct detail strings of each collision: 'a, b'."""
+    pairs = pd.DataFrame({'collision_index': ids, 'detail': details})
+    return pairs.drop_duplicates().groupby(
+        'collision_index', sort=False)['detail'].agg(', '.join)
+
+
+def casualty_summaries(cas_df, ui_mappings):
+    """'Male (26-35), Female (6-10)' for every collision, in one grouped pass."""
+    if cas_df.empty:
+        return pd.Series(dtype=object)
+
+    gender = cas_df['sex_of_casualty'].map(ui_mappings['gender']).fillna('Unknown')
+    age = cas_df['age_band_of_casualty'].map(ui_mappings['age_choice']).fillna('Age Unknown')
+    details = gender.astype(str) + ' (' + age.astype(str) + ')'
+
+    return _join_per_collision(cas_df['collision_index'].to_numpy(), details.to_numpy())
+
+
+def vehicle_summaries(veh_df):
+    """
+    The distinct makes/models involved in every collision. 'Unknown Make'
+    when the extract has no make column, 'Vehicle Data Missing' for a
+    collision with a vehicle whose make is blank.
+    """
+    if veh_df.empty:
+        return pd.Series(dtype=object)
+
+    ids = veh_df['collision_index'].to_numpy()
+    if 'generic_make_model' not in veh_df.columns:
+        return _join_per_collision(ids, np.full(len(veh_df), 'Unknown Make', dtype=object))
+
+    makes = veh_df['generic_make_model'].astype(object)
+    summaries = _join_per_collision(ids, makes.fillna('').astype(str).to_numpy())
+    missing = pd.unique(ids[makes.isna().to_numpy()])
+    summaries[summaries.index.isin(missing)] = 'Vehicle Data Missing'
+    return summaries
+
+
+def _labels(codes, labels):
+    """Vectorised code -> label translation, 'Unknown' when not listed."""
+    return codes.map(labels).astype(object).fillna('Unknown').to_numpy()
+
+
+def popup_fields(incidents, cas_df, veh_df, ui_mappings):
+    """Every popup value for every incident, one array per template field."""
+    ids = incidents['collision_index']
+
+    # Summaries are grouped once then joined on to the incidents.
+    casualties = ids.map(casualty_summaries(cas_df, ui_mappings)).fillna('Not Recorded')
+    vehicle_summary = ids.map(vehicle_summaries(veh_df)).fillna('Unknown Vehicle')
+
+    # Prefer the smart road label, fall back to the numeric road type code.
+    road = pd.Series(np.nan, index=incidents.index, dtype=object)
+    if 'display_road_type' in incidents.columns:
+        road = incidents['display_road_type'].astype(object)
+    if road.isna().any():
+        raw = incidents['road_type']
+        if pd.api.types.is_numeric_dtype(raw):
+            fallback = pd.Series(_labels(raw, ui_mappings['road_type']), index=incidents.index)
+        else:
+            fallback = raw.astype(object).fillna('Unknown')
+        road = road.fillna(fallback)
+
+    return {
+        'sev': _labels(incidents['collision_severity'], ui_mappings['severity']),
+        'date': pd.to_datetime(incidents['date']).dt.strftime('%d %b %Y').to_numpy(),
+        'area': _labels(incidents['urban_or_rural_area'], ui_mappings['area']),
+        'road': road.to_numpy(),
+        'weather': _labels(incidents['weather_conditions'], ui_mappings['weather']),
+        'light': _labels(incidents['light_conditions'], ui_mappings['light']),
+        'surface': _labels(incidents['road_surface_conditions'], ui_mappings['surface']),
+        'special': _labels(incidents['special_conditions_at_site'], ui_mappings['special']),
+        'vehicles': incidents['number_of_vehicles'].to_numpy(),
+        'casualties': casualties.to_numpy(),
+        'vehicle_summary': vehicle_summary.to_numpy(),
+    }
+
+
+def build_popups(incidents, cas_df, veh_df, ui_mappings):
+    """Builds the popup HTML for every incident in one go."""
+    columns = popup_fields(incidents, cas_df, veh_df, ui_mappings)
+    names = list(columns)
+    return [
+        POPUP_TEMPLATE.format(**dict(zip(names, values)))
+        for values in zip(*columns.values())
+    ]
+
+def _marker_colors(severity):
+    # Severity colours: Fatal red, Serious orange, everything else yellow.
+    severity = np.asarray(severity)
+    return np.select([severity == 1, severity == 2], ['red', 'orange'], 'yellow')
+
+
+@instrument.timed()
+def render_incident_map(display_df, cas_df, veh_df, show_blackspots, ui_mappings,
+                        max_markers=MAX_MARKERS, renderer='auto'):
     """
     Handles all map rendering logic, including markers and heatmap overlays.
     'mappings' should be a dictionary containing all your label dictionaries.
+    renderer='fast' ships every incident to the browser as one compact
+    array and builds each popup on click, instead of one marker per row.
+    renderer='markers' draws a marker per incident (the first max_markers);
+    'auto' does that up to max_markers incidents and goes fast beyond.
     """
     
     # Create the base map centered on West Yorkshire
@@ -18,9 +156,6 @@ def render_incident_map(display_df, cas_df, veh_df, show_blackspots, ui_mappings
     if display_df.empty:
         return m
 
-    # Pre-index casualties for lightning-fast lookup in the loop
-    cas_indexed = cas_df.set_index('collision_index')
-
     # 1. Add Heatmap Layer (if toggled)
     if show_blackspots:
         heat_data = display_df[['latitude', 'longitude']].values.tolist()
@@ -32,88 +167,38 @@ def render_incident_map(display_df, cas_df, veh_df, show_blackspots, ui_mappings
             gradient={0.4: 'blue', 0.65: 'lime', 1: 'red'}
         ).add_to(m)
 
-    # 2. Add Marker Cluster Layer
+    if renderer == 'auto':
+        renderer = 'fast' if len(display_df) > max_markers else 'markers'
+
+    # 2a. Client-side clusters - no cap, nothing built per row in Python.
+    if renderer == 'fast':
+        fields = popup_fields(display_df, cas_df, veh_df, ui_mappings)
+        fields['color'] = _marker_colors(display_df['collision_severity'])
+        rows, names, tables = compact_payload(
+            display_df['latitude'], display_df['longitude'], fields)
+        FastMarkerCluster(
+            rows,
+            callback=popup_callback(POPUP_TEMPLATE, names, tables,
+                                    FAST_MARKER_JS, max_width=400),
+        ).add_to(m)
+        return m
+
+    # 2b. Add Marker Cluster Layer
     marker_cluster = MarkerCluster().add_to(m)
 
-    def get_marker_color(severity_code):
-        if severity_code == 1: return 'red'
-        if severity_code == 2: return 'orange'
-        return 'yellow'
-
-    # Loop through incidents (capped at 2500 for performance)
-    for idx, row in display_df.head(2500).iterrows():
-        this_id = row['collision_index']
-        
-        # Casualty/Gender/Age Lookup
-        try:
-            accident_casualties = pd.DataFrame(cas_indexed.loc[[this_id]])
-
-            # Combine Gender and Age for each person involved.
-            cas_details = []
-            for _, c_row in accident_casualties.iterrows():
-                g = ui_mappings['gender'].get(int(c_row['sex_of_casualty']), 'Unknown')
-                age_code = int(c_row['age_band_of_casualty'])
-                a = ui_mappings['age_choice'].get(age_code, 'Age Unknown')
-                cas_details.append(f"{g} ({a})")
-            
-            casualty_summary = ", ".join(set(cas_details))
-        except KeyError:
-            casualty_summary = 'Not Recorded'
-
-        # Vehicle lookup
-        try:
-            accident_vehicles = veh_df[veh_df['collision_index'] == this_id]
-
-            veh_details = []
-            for _, v_row in accident_vehicles.iterrows():
-                # Grab the make and model of the vehicle from the CSV file.
-                make = v_row.get('generic_make_model', 'Unknown Make')
-                veh_details.append(make)
-
-            vehicle_summary = ", ".join(set(veh_details)) if veh_details else 'Unknown Vehicle'
-        except Exception:
-            vehicle_summary = 'Vehicle Data Missing'
-
-        # Translate codes using our mappings
-        sev = ui_mappings['severity'].get(int(row['collision_severity']), 'Unknown')
-        weather = ui_mappings['weather'].get(int(row['weather_conditions']), 'Unknown')
-        light = ui_mappings['light'].get(int(row['light_conditions']), 'Unknown')
-        surface = ui_mappings['surface'].get(int(row['road_surface_conditions']), 'Unknown')
-        if 'display_road_type' in row and pd.notna(row['display_road_type']):
-            road = row['display_road_type']
-        else:
-            # Fallback to the dictionary lookup using the numeric code
-            raw_code = int(row['road_type'])
-            road = ui_mappings['road_type'].get(raw_code, 'Unknown')
-        area = ui_mappings['area'].get(int(row['urban_or_rural_area']), 'Unknown')
-        special = ui_mappings['special'].get(int(row['special_conditions_at_site']), 'Unknown')
-        
-        clean_date = pd.to_datetime(row['date']).strftime('%d %b %Y')
-
-        # Build the Popup HTML
-        popup_text = f"""
-        <div style="font-family: Arial; font-size: 13px; width: 230px;">
-            <h4 style="margin:0 0 10px 0; color: #e74c3c; border-bottom: 1px solid #ccc;">{sev} Incident</h4>
-            <b>Date:</b> {clean_date}<br>
-            <b>Location:</b> {area} Area<br>
-            <b>Road Type:</b> {road}<br>
-            <hr style="margin: 8px 0;">
-            <b>Conditions:</b><br>
-            ☀️ {weather}<br>
-            💡 {light}<br>
-            🛣️ {surface} Surface<br>
-            ⚠️ {special}<br>
-            <hr style="margin: 8px 0;">
-            <b>Involved:</b> {row['number_of_vehicles']} Vehicles<br>
-            <b>Casualties:</b> {casualty_summary} 👤<br>
-            <b>Vehicle:</b> {vehicle_summary} 🚗<br>
-        </div>
-        """
-        
-        color = get_marker_color(row['collision_severity'])
+    # Only the first max_markers incidents get a marker.
+    incidents = display_df.head(max_markers)
+    popups = build_popups(incidents, cas_df, veh_df, ui_mappings)
+    colors = _marker_colors(incidents['collision_severity'])
 
+    for lat, lon, color, popup_text in zip(
+        incidents['latitude'].to_numpy(),
+        incidents['longitude'].to_numpy(),
+        colors,
+        popups,
+    ):
         folium.CircleMarker(
-            location=[row['latitude'], row['longitude']],
+            location=[lat, lon],
             radius=5,
             color=color,
             fill=True,
@@ -123,4 +208,4 @@ def render_incident_map(display_df, cas_df, veh_df, show_blackspots, ui_mappings
             tooltip="Click for details"
         ).add_to(marker_cluster)
 
-    return m
\ No newline at end of file
+    return m
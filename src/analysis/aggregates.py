@@ -0,0 +1,147 @@
+import numpy as np
+import pandas as pd
+from src.mappings import (
+    district_names,
+    severity_labels,
+    weather_labels,
+    light_labels,
+    surface_labels,
+    special_labels,
+    urban_rural_labels,
+)
+from src.schema import WEEKDAYS
+
+# Shared aggregation layer for the analysis suites.
+# Every count the suites chart is worked out here in one go from the integer
+# codes (a bincount per column), so the suites don't each copy the frame,
+# map labels and run value_counts over it again.
+
+# Coded columns shown with readable labels: aggregate name -> (column, labels).
+LABELLED_COUNTS = {
+    "weather": ("weather_conditions", weather_labels),
+    "light": ("light_conditions", light_labels),
+    "surface": ("road_surface_conditions", surface_labels),
+    "special": ("special_conditions_at_site", special_labels),
+    "urban_rural": ("urban_or_rural_area", urban_rural_labels),
+    "severity": ("collision_severity", severity_labels),
+}
+
+# Numeric columns charted in code order: aggregate name -> column.
+ORDERED_COUNTS = {
+    "hour": "hour",
+    "month": "month",
+    "speed_limit": "speed_limit",
+}
+
+# Severity columns of the district breakdown, in a logical order.
+SEVERITY_ORDER = ["Fatal", "Serious", "Slight"]
+
+
+def code_counts(series):
+    """
+    Counts of every value in an integer or categorical column, in value
+    order, from a single bincount (missing values are skipped).
+    """
+    if series.dtype == object:
+        # Plain labels, in a frame that didn't come from load_wy_data.
+        series = series.astype("category")
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        codes = series.cat.codes.to_numpy()
+        counts = np.bincount(
+            codes[codes >= 0], minlength=len(series.cat.categories))
+        return pd.Series(counts, index=series.cat.categories, name="count")
+
+    values = series.to_numpy(dtype="float64", na_value=np.nan)
+    values = values[~np.isnan(values)].astype(np.int64)
+    if len(values) == 0:
+        return pd.Series(dtype="int64", name="count")
+
+    low = values.min()
+    counts = np.bincount(values - low)
+    seen = np.flatnonzero(counts)
+    return pd.Series(counts[seen], index=seen + low, name="count")
+
+
+def by_count(counts):
+    """Biggest first, ties kept in their current order (like value_counts)."""
+    order = np.argsort(-counts.to_numpy(), kind="stable")
+    return counts.iloc[order]
+
+
+def labelled_counts(counts, labels):
+    """
+    Renames code counts to their labels (codes without one are dropped,
+    codes sharing a label are added together), biggest first.
+    """
+    named = pd.Series(counts.index.map(labels), index=counts.index)
+    known = named.notna().to_numpy()
+    totals = counts[known].groupby(named[known].to_numpy(), sort=False).sum()
+    return by_count(totals.rename("count"))
+
+
+def district_severity(df):
+    """District x severity table (the crosstab) from one joint bincount."""
+    districts = df["local_authority_ons_district"].astype("category")
+    district_codes = districts.cat.codes.to_numpy()
+    severity = df["collision_severity"].to_numpy(dtype="float64", na_value=np.nan)
+
+    known = (district_codes >= 0) & np.isin(severity, list(severity_labels))
+    severity_codes = np.searchsorted(
+        sorted(severity_labels), severity[known]).astype(np.int64)
+    n_severity = len(severity_labels)
+
+    joint = np.bincount(
+        district_codes[known] * n_severity + severity_codes,
+        minlength=len(districts.cat.categories) * n_severity,
+    ).reshape(-1, n_severity)
+
+    # Districts without a name (outside West Yorkshire) keep their code.
+    codes = districts.cat.categories
+    table = pd.DataFrame(
+        joint,
+        index=[district_names.get(code, code) for code in codes],
+        columns=[severity_labels[code] for code in sorted(severity_labels)],
+    )
+
+    # Same shape as the crosstab: districts with collisions only.
+    table = table[(table.sum(axis=1) > 0).to_numpy()]
+    table = table.groupby(level=0, sort=False).sum()
+    table = table.loc[:, table.sum() > 0]
+    table.index.name = "district"
+    table.columns.name = "severity"
+
+    return table.reindex(columns=[c for c in SEVERITY_ORDER if c in table])
+
+
+def aggregate_collisions(df):
+    """
+    Every count the geographical, temporal, infrastructure, environmental
+    and summary suites need, worked out once. Returns a dict of small
+    Series/DataFrames (plus the raw code counts under "codes").
+    """
+    columns = {col for col, _ in LABELLED_COUNTS.values()}
+    columns |= set(ORDERED_COUNTS.values())
+    columns |= {"first_road_class", "day_name", "display_road_type"}
+
+    codes = {col: code_counts(df[col]) for col in columns if col in df}
+    aggregates = {"total": len(df), "codes": codes}
+
+    for name, col in ORDERED_COUNTS.items():
+        if col in codes:
+            aggregates[name] = codes[col]
+
+    for name, (col, labels) in LABELLED_COUNTS.items():
+        if col in codes:
+            aggregates[name] = labelled_counts(codes[col], labels)
+
+    if "day_name" in codes:
+        aggregates["weekday"] = codes["day_name"].reindex(WEEKDAYS)
+
+    if "display_road_type" in codes:
+        road = codes["display_road_type"]
+        aggregates["road_type"] = by_count(road[road > 0])
+
+    if {"local_authority_ons_district", "collision_severity"} <= set(df.columns):
+        aggregates["district_severity"] = district_severity(df)
+
+    return aggregates
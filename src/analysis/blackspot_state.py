@@ -0,0 +1,318 @@
+import os
+import numpy as np
+import pandas as pd
+from src.analysis.blackspots import (
+    CELL_DECIMALS,
+    SiteGrid,
+    _road_codes,
+    describe_sites,
+    label_histogram,
+    modal_from_histogram,
+    rank_sites,
+)
+from src.analysis.scoring import (
+    HALF_LIFE_DAYS,
+    SCORES,
+    SEVERITY_WEIGHTS,
+    collision_weights,
+    empirical_bayes,
+)
+
+# File name of the saved state inside a state_dir.
+STATE_FILE = "blackspot_state.npz"
+
+# Late reports dated up to this long before the newest collision counted
+# are still added; the ids of the collisions counted in that window are
+# kept so a re-sent collision isn't counted twice.
+LOOKBACK_DAYS = 366
+
+# Cell ids pack the integer grid latitude above the (offset) longitude.
+LON_OFFSET = 2 ** 31
+
+
+def _pack(lat_cells, lon_cells):
+    """One sortable int64 per cell, ordered like (lat, lon)."""
+    return (lat_cells << 32) + (lon_cells + LON_OFFSET)
+
+
+def _unpack(keys):
+    return keys >> 32, (keys & 0xFFFFFFFF) - LON_OFFSET
+
+
+class BlackspotState:
+    """
+    Running per-cell totals for the blackspot grid, kept on disk between
+    monthly refreshes. Each update only bins the new collisions and adds
+    them into the cells they fall in; the top-N is then read straight from
+    the totals (counts, severity counts, severity weights, a decayed
+    weight, road type histograms and the last collision date per cell).
+    """
+
+    def __init__(self, decimals=CELL_DECIMALS, half_life_days=HALF_LIFE_DAYS,
+                 lookback_days=LOOKBACK_DAYS):
+        self.decimals = decimals
+        self.half_life_days = half_life_days
+        self.lookback_days = lookback_days
+        self.reference_date = None
+        # The newest collision date counted, and the ids (sorted) and dates
+        # of the collisions counted within lookback_days of it.
+        self.watermark = None
+        self.recent_ids = np.array([], dtype=str)
+        self.recent_dates = np.array([], dtype="datetime64[D]")
+
+        # One entry per cell, sorted by cell id.
+        self.keys = np.array([], dtype=np.int64)
+        self.counts = np.array([], dtype=np.int64)
+        self.severity = np.zeros((0, len(SEVERITY_WEIGHTS)), dtype=np.int64)
+        self.weight = np.array([], dtype=float)
+        self.decayed = np.array([], dtype=float)
+        self.last_seen = np.array([], dtype="datetime64[D]")
+        self.road_labels = []
+        self.roads = np.zeros((0, 0), dtype=np.int64)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @property
+    def latitude(self):
+        return _unpack(self.keys)[0] / 10.0 ** self.decimals
+
+    @property
+    def longitude(self):
+        return _unpack(self.keys)[1] / 10.0 ** self.decimals
+
+    @classmethod
+    def load(cls, state_dir, **kwargs):
+        """Reads the saved state (or starts an empty one)."""
+        path = os.path.join(state_dir, STATE_FILE)
+        if not os.path.exists(path):
+            return cls(**kwargs)
+
+        with np.load(path, allow_pickle=False) as saved:
+            state = cls(
+                decimals=int(saved["decimals"]),
+                half_life_days=float(saved["half_life_days"]),
+                **kwargs,
+            )
+            for name in ("keys", "counts", "severity", "weight", "decayed",
+                         "last_seen", "roads"):
+                setattr(state, name, saved[name])
+            state.road_labels = saved["road_labels"].tolist()
+            if saved["reference_date"].size:
+                state.reference_date = saved["reference_date"][0]
+            if "watermark" in saved and saved["watermark"].size:
+                state.watermark = saved["watermark"][0]
+            elif len(state.last_seen):
+                # States saved before the watermark: the newest cell date.
+                state.watermark = state.last_seen.max()
+            if "recent_ids" in saved:
+                state.recent_ids = saved["recent_ids"]
+                state.recent_dates = saved["recent_dates"]
+            elif "seen_ids" in saved and state.watermark is not None:
+                # Older states kept every id; their dates weren't saved.
+                state.recent_ids = saved["seen_ids"]
+                state.recent_dates = np.full(
+                    len(state.recent_ids), state.watermark)
+        return state
+
+    def save(self, state_dir):
+        """Writes the state atomically (temp file, then rename)."""
+        os.makedirs(state_dir, exist_ok=True)
+        path = os.path.join(state_dir, STATE_FILE)
+        reference = [] if self.reference_date is None else [self.reference_date]
+        watermark = [] if self.watermark is None else [self.watermark]
+
+        with open(path + ".tmp", "wb") as f:
+            np.savez(
+                f,
+                decimals=self.decimals,
+                half_life_days=self.half_life_days,
+                reference_date=np.array(reference, dtype="datetime64[D]"),
+                watermark=np.array(watermark, dtype="datetime64[D]"),
+                recent_ids=self.recent_ids,
+                recent_dates=self.recent_dates,
+                keys=self.keys,
+                counts=self.counts,
+                severity=self.severity,
+                weight=self.weight,
+                decayed=self.decayed,
+                last_seen=self.last_seen,
+                road_labels=np.array(self.road_labels, dtype=str),
+                roads=self.roads,
+            )
+        os.replace(path + ".tmp", path)
+
+    def _new_rows(self, df):
+        """
+        The rows of df not counted yet (each collision once). Collisions
+        dated within lookback_days of the watermark are checked by id;
+        older ones are taken as counted. Moves the watermark forward.
+        """
+        dates = pd.to_datetime(df["date"]).to_numpy().astype("datetime64[D]")
+        ids = df["collision_index"].astype(str).to_numpy(dtype=str)
+        fresh = ~pd.Series(ids).duplicated().to_numpy()
+
+        if self.watermark is not None:
+            cutoff = self.watermark - np.timedelta64(self.lookback_days, "D")
+            too_old = fresh & (dates <= cutoff)
+            if too_old.any():
+                print(f"Skipped {int(too_old.sum())} collisions dated on or "
+                      f"before {cutoff}, too late to add to the running totals.")
+            # recent_ids is kept sorted, so the check is a binary search.
+            pos = np.searchsorted(self.recent_ids, ids)
+            seen = pos < len(self.recent_ids)
+            seen[seen] = self.recent_ids[pos[seen]] == ids[seen]
+            fresh &= ~too_old & ~seen
+
+        if fresh.any():
+            newest = dates[fresh].max()
+            if self.watermark is None or newest > self.watermark:
+                self.watermark = newest
+            self._remember(ids[fresh], dates[fresh])
+        return df[fresh]
+
+    def _remember(self, ids, dates):
+        """Adds counted ids, then drops those now behind the lookback window."""
+        ids = np.concatenate((self.recent_ids, ids))
+        dates = np.concatenate((self.recent_dates, dates))
+        keep = dates > self.watermark - np.timedelta64(self.lookback_days, "D")
+        order = np.argsort(ids[keep], kind="stable")
+        self.recent_ids = ids[keep][order]
+        self.recent_dates = dates[keep][order]
+
+    def _road_histogram(self, rows, cells, n_cells):
+        """Road type counts of the new cells, in the state's label order."""
+        if "display_road_type" not in rows:
+            return np.zeros((n_cells, len(self.road_labels)), dtype=np.int64)
+
+        codes, labels = _road_codes(rows["display_road_type"])
+
+        # Labels seen for the first time get a new histogram column.
+        for label in labels:
+            if label not in self.road_labels:
+                self.road_labels.append(str(label))
+        positions = np.array(
+            [self.road_labels.index(str(label)) for label in labels] + [-1])
+        return label_histogram(
+            positions[codes], cells, n_cells, len(self.road_labels))
+
+    def update(self, df):
+        """
+        Adds the collisions in df that aren't counted yet.
+        Only the new rows are binned; returns how many were added.
+        """
+        rows = self._new_rows(df)
+        grid = SiteGrid(rows["latitude"], rows["longitude"],
+                        decimals=self.decimals)
+        located = grid.labels >= 0
+        cells = grid.labels[located]
+        rows = rows[located]
+        n_cells = len(grid)
+        if n_cells == 0:
+            return 0
+
+        scale = 10.0 ** self.decimals
+        new_keys = _pack(np.rint(grid.latitude * scale).astype(np.int64),
+                         np.rint(grid.longitude * scale).astype(np.int64))
+
+        # Move the decay reference forward to the newest collision.
+        dates = pd.to_datetime(rows["date"]).to_numpy().astype("datetime64[D]")
+        newest = dates.max()
+        if self.reference_date is None or newest > self.reference_date:
+            if self.reference_date is not None:
+                days = (newest - self.reference_date).astype(float)
+                self.decayed = self.decayed * 0.5 ** (days / self.half_life_days)
+            self.reference_date = newest
+
+        # A missing (<NA>) severity matches no code.
+        severity = rows["collision_severity"]
+        new = {
+            "counts": grid.counts,
+            "severity": np.column_stack([
+                np.bincount(
+                    cells[severity.eq(code).fillna(False).to_numpy(dtype=bool)],
+                    minlength=n_cells)
+                for code in SEVERITY_WEIGHTS
+            ]),
+            "weight": np.bincount(
+                cells, weights=collision_weights(rows), minlength=n_cells),
+            "decayed": np.bincount(
+                cells,
+                weights=collision_weights(
+                    rows, decay=True, half_life_days=self.half_life_days,
+                    reference_date=pd.Timestamp(self.reference_date)),
+                minlength=n_cells),
+        }
+        last_seen = np.full(n_cells, np.iinfo(np.int64).min)
+        np.maximum.at(last_seen, cells, dates.astype(np.int64))
+        new["last_seen"] = last_seen.astype("datetime64[D]")
+        new["roads"] = self._road_histogram(rows, cells, n_cells)
+
+        # Older state may have fewer road columns than the new rows.
+        if self.roads.shape[1] < len(self.road_labels):
+            self.roads = np.pad(
+                self.roads,
+                ((0, 0), (0, len(self.road_labels) - self.roads.shape[1])))
+
+        self._merge(new_keys, new)
+        return int(grid.counts.sum())
+
+    def _merge(self, new_keys, new):
+        """Adds the new cell totals into the existing cells (or inserts them)."""
+        pos = np.searchsorted(self.keys, new_keys)
+        exists = pos < len(self.keys)
+        exists[exists] = self.keys[pos[exists]] == new_keys[exists]
+        hit = pos[exists]
+
+        # Cells that already exist: add in place.
+        for name in ("counts", "severity", "weight", "decayed", "roads"):
+            getattr(self, name)[hit] += new[name][exists]
+        self.last_seen[hit] = np.fmax(self.last_seen[hit],
+                                      new["last_seen"][exists])
+
+        # New cells are inserted at their sorted position.
+        fresh = ~exists
+        if fresh.any():
+            at = pos[fresh]
+            self.keys = np.insert(self.keys, at, new_keys[fresh])
+            for name in ("counts", "severity", "weight", "decayed", "roads",
+                         "last_seen"):
+                setattr(self, name, np.insert(
+                    getattr(self, name), at, new[name][fresh], axis=0))
+
+    def modal_roads(self):
+        return modal_from_histogram(self.roads, self.road_labels)
+
+    def scores(self, score="count"):
+        """(score, low, high) for every cell, like scoring.site_scores."""
+        if score not in SCORES:
+            raise ValueError(f"Unknown score {score!r}, expected one of {SCORES}")
+        if score == "count":
+            return None, None, None
+        if score == "severity":
+            return self.weight, None, None
+        if score == "decayed":
+            return self.decayed, None, None
+        return empirical_bayes(self.decayed, self.modal_roads())
+
+    def identify_blackspots(self, top_n=10, min_accidents=2, score="count",
+                            cache_dir=None):
+        """The top-N blackspots from the totals, same dicts as the batch run."""
+        scores, lows, highs = self.scores(score)
+        top_indices = rank_sites(self.counts, top_n, min_accidents, scores)
+        return describe_sites(
+            top_indices, self.latitude, self.longitude, self.counts,
+            self.modal_roads(), min_accidents, cache_dir, scores, lows, highs)
+
+
+def refresh_blackspots(new_rows, state_dir, top_n=10, min_accidents=2,
+                       score="count", cache_dir=None):
+    """
+    Monthly refresh: folds the new extract into the saved state and
+    returns the updated top-N blackspots.
+    """
+    state = BlackspotState.load(state_dir)
+    state.update(new_rows)
+    state.save(state_dir)
+    return state.identify_blackspots(
+        top_n, min_accidents, score=score, cache_dir=cache_dir)
@@ -1,53 +1,377 @@
 import pandas as pd
 import numpy as np
-import reverse_geocoder as rg # offline tool for the blackspots coordinates.
+from src import instrument
+from src.analysis.scoring import site_scores
 
-def identify_blackspots(df, top_n=10, min_accidents=2):
-    """Uses NumPy, Pandas and Geocoder to identify 
-    high-frequency accident locations."""
+# Coordinates are rounded to this many decimal places to form a site.
+# 3 dp is ~111m, so accidents at the same junction are grouped together.
+CELL_DECIMALS = 3
 
-    # Round coordinates to 3 decimal places (~111m precision)
-    # This ensures that accidents at the same junction are grouped together.
-    lats = np.round(df["latitude"].to_numpy(), 3)
-    lons = np.round(df["longitude"].to_numpy(), 3)
+# How identify_blackspots can group collisions into sites.
+MODES = ("grid", "radius")
 
-    # Use numpy to find unique coordinate pairs and their counts.
-    coords = np.column_stack((lats, lons))
-    unique_coords, counts = np.unique(coords, axis=0, return_counts=True)
+# Neighbour distance (metres, on the OS grid) for the "radius" mode.
+CLUSTER_RADIUS_M = 50
 
-    # Sort by counts in descending order.
-    sorted_indices = np.argsort(-counts)
+# Neighbour pairs the radius mode holds in memory at a time (about).
+CLUSTER_BATCH = 5_000_000
+
+
+def _road_codes(roads):
+    """
+    Integer codes for the road labels, ordered the way Series.mode() breaks
+    ties (category order for categoricals, sorted values otherwise).
+    -1 marks a missing label.
+    """
+    roads = pd.Series(roads)
+    if isinstance(roads.dtype, pd.CategoricalDtype):
+        return roads.cat.codes.to_numpy(), roads.cat.categories.to_numpy()
+    codes, uniques = pd.factorize(roads, sort=True)
+    return codes, np.asarray(uniques)
+
+
+def modal_labels(roads, groups, n_groups):
+    """
+    Most common road label in every group ('Unknown' if none), in one pass.
+    roads and groups are per row; groups numbers each row's site.
+    """
+    codes, labels = _road_codes(roads)
+    histogram = label_histogram(codes, groups, n_groups, len(labels))
+    return modal_from_histogram(histogram, labels)
+
+
+def label_histogram(codes, groups, n_groups, n_labels):
+    """(group, label) counts as an n_groups x n_labels array (-1 skipped)."""
+    known = codes >= 0
+    n_labels = max(n_labels, 1)
+    return np.bincount(
+        groups[known] * n_labels + codes[known],
+        minlength=n_groups * n_labels,
+    ).reshape(n_groups, n_labels)
+
+
+def modal_from_histogram(histogram, labels):
+    """Most common label per histogram row; argmax keeps the first on ties."""
+    modal = np.full(len(histogram), "Unknown", dtype=object)
+    if histogram.size == 0:
+        return modal
+    has_label = histogram.max(axis=1) > 0
+    modal[has_label] = np.asarray(labels)[histogram.argmax(axis=1)[has_label]]
+    return modal
+
+
+class SiteGrid:
+    """
+    Bins coordinates onto a lat/lon grid in a single pass.
+    Each rounded (lat, lon) pair is packed into one int64 cell id, so the
+    grouping is a hash of integers and the counts a bincount. Cells are
+    kept in (lat, lon) order, the same order np.unique gives the rounded
+    float pairs.
+    """
+
+    def __init__(self, lats, lons, roads=None, decimals=CELL_DECIMALS):
+        lats = np.asarray(lats, dtype=float)
+        lons = np.asarray(lons, dtype=float)
+        scale = 10.0 ** decimals
+
+        # Rows without a position can't belong to a site.
+        located = np.flatnonzero(np.isfinite(lats) & np.isfinite(lons))
+
+        # Integer grid coordinates - rint(x * 10**d) is what np.round does.
+        lat_cells = np.rint(lats[located] * scale).astype(np.int64)
+        lon_cells = np.rint(lons[located] * scale).astype(np.int64)
+
+        # Pack both into one id; lat-major, so ids sort like (lat, lon).
+        lon_min = lon_cells.min() if len(located) else 0
+        lon_span = (lon_cells.max() - lon_min + 1) if len(located) else 1
+        keys = (lat_cells * lon_span) + (lon_cells - lon_min)
+
+        # Hash the ids, then put the cells in grid order.
+        codes, uniques = pd.factorize(keys)
+        rank = np.argsort(uniques)
+        cell_of = np.empty(len(uniques), dtype=np.int64)
+        cell_of[rank] = np.arange(len(uniques))
+        cells = cell_of[codes]
+        n_cells = len(uniques)
+
+        # Cell number of every row (-1 for rows without a position).
+        self.labels = np.full(len(lats), -1, dtype=np.int64)
+        self.labels[located] = cells
+
+        self.counts = np.bincount(cells, minlength=n_cells)
+        self.latitude = np.floor_divide(uniques[rank], lon_span) / scale
+        self.longitude = (uniques[rank] % lon_span + lon_min) / scale
+
+        # Member rows of each cell, as one sorted array plus offsets.
+        self._order = located[np.argsort(cells, kind="stable")]
+        self._starts = np.concatenate(([0], np.cumsum(self.counts)))
+
+        self.road = None
+        if roads is not None:
+            self.road = modal_labels(
+                pd.Series(roads).iloc[located], cells, n_cells)
+
+    def __len__(self):
+        return len(self.counts)
+
+    def members(self, cell):
+        """Row positions (in the binned arrays) that fall in the cell."""
+        return self._order[self._starts[cell]:self._starts[cell + 1]]
+
+    def top(self, n):
+        """Cell numbers of the n busiest cells, busiest first."""
+        return np.argsort(-self.counts)[:n]
+
+
+class RadiusClusters:
+    """
+    Density-based (DBSCAN style) clusters of collisions on the OS grid.
+    Collisions within radius metres of each other are neighbours; a
+    collision with at least min_samples neighbours (itself included) is a
+    core point, connected core points form one site and the other
+    collisions join the site of a core neighbour. The neighbour search is a
+    KD-tree on easting/northing, so a site is never split by a grid line,
+    run about batch neighbour pairs at a time to bound their memory.
+    """
+
+    def __init__(self, eastings, northings, radius=CLUSTER_RADIUS_M,
+                 min_samples=2, batch=CLUSTER_BATCH):
+        # scipy is only needed by the radius mode.
+        from scipy.sparse import coo_matrix
+        from scipy.sparse.csgraph import connected_components
+        from scipy.spatial import cKDTree
+
+        eastings = np.asarray(eastings, dtype=float)
+        northings = np.asarray(northings, dtype=float)
+        n = len(eastings)
+
+        # Rows without a position can't belong to a site.
+        located = np.flatnonzero(np.isfinite(eastings) & np.isfinite(northings))
+        points = np.column_stack((eastings[located], northings[located]))
+        n_points = len(points)
+        tree = cKDTree(points)
+
+        # Points go through in batches of about batch neighbour pairs, so a
+        # dense junction never holds all of its pairs in memory at once.
+        # The batches follow radius sized squares, and a point has no more
+        # neighbours than there are points in the 3x3 squares around it.
+        squares = np.floor(points / radius).astype(np.int64)
+        keys = _pack_squares(squares[:, 0], squares[:, 1])
+        order = np.argsort(keys, kind="stable")
+        ends = _batch_ends(
+            _square_neighbours(keys[order], squares[order]), batch)
+        rank = np.empty(n_points, dtype=np.int64)
+        rank[order] = np.arange(n_points)
+
+        # Whether a point is core is known once its batch has been through.
+        # A pair is seen from both ends, and is used in the later of the two
+        # batches. roots is each point's site so far.
+        is_core = np.zeros(n_points, dtype=bool)
+        roots = np.arange(n_points)
+        border_of = np.full(n_points, n_points)
+        first = 0
+        for end in ends:
+            rows = order[first:end]
+            pairs = cKDTree(points[rows]).sparse_distance_matrix(
+                tree, radius, output_type="ndarray")
+            left, right = rows[pairs["i"]], pairs["j"]
+            is_core[rows] = np.bincount(
+                pairs["i"], minlength=len(rows)) >= min_samples
+
+            known = rank[right] < end
+            left, right = left[known], right[known]
+            # Only the pairs that join two different sites so far.
+            joins = is_core[left] & is_core[right]
+            joins[joins] = roots[left[joins]] != roots[right[joins]]
+            if joins.any():
+                graph = coo_matrix(
+                    (np.ones(joins.sum()),
+                     (roots[left[joins]], roots[right[joins]])),
+                    shape=(n_points, n_points),
+                )
+                roots = connected_components(graph, directed=False)[1][roots]
+
+            # Border points take the site of their first core neighbour.
+            for a, b in ((left, right), (right, left)):
+                border = ~is_core[a] & is_core[b]
+                np.minimum.at(border_of, a[border], b[border])
+            first = end
+
+        # Sites are numbered in the order of their first point.
+        labels = np.full(n_points, -1, dtype=np.int64)
+        _, firsts, core_labels = np.unique(
+            roots[is_core], return_index=True, return_inverse=True)
+        labels[is_core] = np.argsort(np.argsort(firsts))[core_labels]
+
+        border = border_of < n_points
+        labels[border] = labels[border_of[border]]
+
+        self.labels = np.full(n, -1, dtype=np.int64)
+        self.labels[located] = labels
+        n_sites = len(firsts)
+
+        in_site = np.flatnonzero(self.labels >= 0)
+        sites = self.labels[in_site]
+        self.counts = np.bincount(sites, minlength=n_sites)
+        self._order = in_site[np.argsort(sites, kind="stable")]
+        self._starts = np.concatenate(([0], np.cumsum(self.counts)))
+
+    def __len__(self):
+        return len(self.counts)
+
+    def members(self, site):
+        """Row positions that belong to the site."""
+        return self._order[self._starts[site]:self._starts[site + 1]]
+
+    def top(self, n):
+        """Site numbers of the n busiest sites, busiest first."""
+        return np.argsort(-self.counts, kind="stable")[:n]
+
+
+def _pack_squares(x, y):
+    """One sortable int64 per (x, y) square, ordered like (x, y)."""
+    return (x << 32) + y
+
+
+def _square_neighbours(keys, squares):
+    """
+    Points in the 3x3 squares around each point's (x, y) square, for
+    points sorted by their packed square keys.
+    """
+    starts = np.flatnonzero(np.diff(keys, prepend=keys[:1] - 1))
+    packed = keys[starts]
+    counts = np.diff(starts, append=len(keys))
+    x, y = squares[starts, 0], squares[starts, 1]
+    total = np.zeros(len(packed), dtype=np.int64)
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            around = _pack_squares(x + dx, y + dy)
+            pos = np.minimum(np.searchsorted(packed, around), len(packed) - 1)
+            total += np.where(packed[pos] == around, counts[pos], 0)
+    return np.repeat(total, counts)
+
+
+def _batch_ends(sizes, batch):
+    """Ends of the runs of sizes that add up to about batch (at least one each)."""
+    ends = []
+    total = np.cumsum(sizes)
+    start, done = 0, 0
+    while start < len(sizes):
+        end = max(int(np.searchsorted(total, done + batch, side="right")),
+                  start + 1)
+        ends.append(end)
+        start, done = end, total[end - 1]
+    return ends
+
+
+def _radius_sites(df, radius, min_samples):
+    """
+    Clusters the collisions and returns (clusters, latitudes, longitudes,
+    roads) - the site centres are the mean position of their collisions.
+    """
+    clusters = RadiusClusters(
+        df["location_easting_osgr"], df["location_northing_osgr"],
+        radius=radius, min_samples=min_samples,
+    )
+
+    in_site = np.flatnonzero(clusters.labels >= 0)
+    sites = clusters.labels[in_site]
+    counts = np.maximum(clusters.counts, 1)
+
+    def centre(col):
+        total = np.bincount(
+            sites, weights=df[col].to_numpy(dtype=float)[in_site],
+            minlength=len(clusters))
+        return np.round(total / counts, 5)
+
+    roads = None
+    if "display_road_type" in df:
+        roads = modal_labels(
+            df["display_road_type"].iloc[in_site], sites, len(clusters))
+
+    return clusters, centre("latitude"), centre("longitude"), roads
+
+
+@instrument.timed(rows=True)
+def identify_blackspots(df, top_n=10, min_accidents=2,
+                        decimals=CELL_DECIMALS, cache_dir=None, mode="grid",
+                        radius=CLUSTER_RADIUS_M, score="count"):
+    """Uses NumPy, Pandas and Geocoder to identify
+    high-frequency accident locations.
+    mode="grid" groups collisions on rounded coordinates; mode="radius"
+    clusters the collisions within radius metres of each other.
+    score ranks the sites: "count" (raw), "severity" (severity and
+    casualty weighted), "decayed" (also fading with age) or "eb" (decayed,
+    shrunk towards the road type baseline, with an interval)."""
+
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode {mode!r}, expected one of {MODES}")
+
+    if mode == "radius":
+        # Density clusters on the OS grid, a site needs min_accidents.
+        sites, site_lats, site_lons, site_roads = _radius_sites(
+            df, radius, min_samples=max(min_accidents, 1))
+    else:
+        # Count the accidents on each grid cell in one pass.
+        roads = df["display_road_type"] if "display_road_type" in df else None
+        sites = SiteGrid(df["latitude"], df["longitude"], roads, decimals)
+        site_lats, site_lons, site_roads = (
+            sites.latitude, sites.longitude, sites.road)
+
+    if score == "count":
+        scores = lows = highs = None
+    else:
+        # Score every site at once.
+        scores, lows, highs = site_scores(
+            df, sites.labels, sites.counts, site_roads, score)
+
+    top_indices = rank_sites(sites.counts, top_n, min_accidents, scores)
+
+    return describe_sites(
+        top_indices, site_lats, site_lons, sites.counts, site_roads,
+        min_accidents, cache_dir, scores, lows, highs)
+
+
+def rank_sites(counts, top_n, min_accidents, scores=None):
+    """
+    Site numbers of the top_n sites, best first: by count, or by score
+    among the sites with at least min_accidents collisions.
+    """
+    if scores is None:
+        # Ensure we don't try to grab more blackspots than actually exist.
+        return np.argsort(-counts)[:top_n]
+
+    eligible = np.flatnonzero(counts >= min_accidents)
+    return eligible[np.argsort(-scores[eligible], kind="stable")[:top_n]]
+
+
+def describe_sites(top_indices, site_lats, site_lons, counts, site_roads,
+                   min_accidents, cache_dir=None, scores=None, lows=None,
+                   highs=None):
+    """Builds the blackspot dicts (the map, chart and PDF all read these)."""
+    if len(top_indices) == 0:
+        return []
+
+    from src.geocoding import reverse_geocode
+
+    # Ask the offline database "Where is the this place from the lat,lon?"
+    # One batched (and cached) lookup for all the sites.
+    coords = [(site_lats[i], site_lons[i]) for i in top_indices]
+    places = reverse_geocode(coords, cache_dir=cache_dir)
 
-    # Ensure we don't try to grab more blackspots than actually exist.
-    actual_top_n = min(top_n, len(unique_coords))
-    top_indices = sorted_indices[:actual_top_n]
-    
     # Build a list of results.
     blackspots_results = []
 
-    for i in top_indices:
-        # Get specific coordinates.
-        lat, lon = unique_coords[i]
-        # Get specific count.
-        current_count = counts[i]
+    for i, place in zip(top_indices, places):
+        lat, lon = site_lats[i], site_lons[i]
 
-        # Ask the offline database "Where is the this place from the lat,lon?"
-        # Mode=1 means find the closest single match.
-        results = rg.search((lat, lon), mode=1)
-
-        # Results is a list of dictionaries.
         # Admin2 usually give "Leeds District", "Bradford District", WY.
-        area_name = results[0]['admin2']
-        
-        # Get the most common road type at this specific spot for context.
-        mask = (np.round(df["latitude"], 3) == lat) & (
-            np.round(df["longitude"], 3) == lon)
-        
-        road_info = df[mask][
-            "display_road_type"
-            ].mode().iloc[0] if not df[mask].empty else "Unknown"
-        
-        # Create a label for the chart. 
+        area_name = place['admin2']
+
+        # The most common road type at this specific spot for context.
+        road_info = site_roads[i] if site_roads is not None else "Unknown"
+
+        # Create a label for the chart.
         # This is a specific spot (site) at these coordinates.
         site_label = f"Site @ {lat}, {lon} ({area_name})"
 
@@ -57,15 +381,20 @@ def identify_blackspots(df, top_n=10, min_accidents=2):
             "longitude": lon,
             "area": area_name,
             "site_label": site_label,
-            "count": int(current_count),
+            "count": int(counts[i]),
             "road_type": road_info
         })
-    
+
+        # The scored modes also carry the score (and interval) per site.
+        if scores is not None:
+            blackspots_results[-1]["score"] = round(float(scores[i]), 2)
+            if lows is not None:
+                blackspots_results[-1]["score_low"] = round(float(lows[i]), 2)
+                blackspots_results[-1]["score_high"] = round(float(highs[i]), 2)
+
     final_filtered_results = [
-        spot for spot in blackspots_results 
+        spot for spot in blackspots_results
         if spot['count'] >= min_accidents
     ]
 
     return final_filtered_results
-
-    
\ No newline at end of file
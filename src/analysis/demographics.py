@@ -1,4 +1,5 @@
-from src.charts import pie_chart, bar_chart
+from src import instrument
+from src.charts import DEFAULT_REGION, pie_chart, bar_chart
 from src.mappings import (
 casualty_class_labels, 
 age_band_labels, 
@@ -7,15 +8,17 @@ gender_options
 
 #print(silence debugging prints, turn on when ready)
 
-def run_demographic_suite(vehicles_df, casualties_df):
-    """Analyses the 'who' and the 'what' using linked data."""
+@instrument.timed()
+def run_demographic_suite(vehicles_df, casualties_df, region=DEFAULT_REGION):
+    """Analyses the 'who' and the 'what' using linked data.
+    region names the area in the chart titles."""
 
     #print("Running Demographic & Vehicle Analysis...")
 
     # Driver Gender (from vehicle file)
     if not vehicles_df.empty and 'sex_of_driver' in vehicles_df.columns:
         gender_counts = vehicles_df["sex_of_driver"].map(gender_options).value_counts()
-        pie_chart(gender_counts, "Driver Gender Distribution West Yorkshire",
+        pie_chart(gender_counts, f"Driver Gender Distribution {region}",
                   pctdistance=1.0,
                   labeldistance=0.5,
                   colors=["#0698f8", "#f781a8", "#E2CC07FF"]
@@ -61,5 +64,5 @@ def run_demographic_suite(vehicles_df, casualties_df):
         top_makes = valid_vehicles['generic_make_model'].value_counts().head(10)
 
         # Plot chart
-        bar_chart(top_makes, "Top 10 Vehicle Makes in West Yorkshire Collisions",
+        bar_chart(top_makes, f"Top 10 Vehicle Makes in {region} Collisions",
                   "Vehicle Make/Model", "Total Incidents", color="#667294")
@@ -1,62 +1,57 @@
-import pandas as pd
-from src.charts import bar_chart
-from src.mappings import(
-    weather_labels,
-    light_labels,
-    surface_labels,
-    special_labels
-)
+from src import instrument
+from src.analysis.aggregates import aggregate_collisions
+from src.charts import DEFAULT_REGION, bar_chart
 
 #print(silence debugging prints, turn on when ready)
 
-def analyse_weather_distribution(df):
+def analyse_weather_distribution(df, counts=None, region=DEFAULT_REGION):
     """Analyzes collisions based on weather (Rain, Snow, Icy, etc)"""
-    df_local = df.copy()
-    df_local["weather_label"] = df_local["weather_conditions"].map(weather_labels)
-
-    counts = df_local["weather_label"].value_counts()
+    if counts is None:
+        counts = aggregate_collisions(df)["weather"]
 
     bar_chart(
         counts,
-        "Collisions by Weather Condition (West Yorkshire)",
+        f"Collisions by Weather Condition ({region})",
         "Weather Condition",
         "Number of Collisions",
         color="#9b9030ff"
     )
 
 # Collisions by Light Conditions
-def analyse_light_condtions(df):
+def analyse_light_condtions(df, counts=None, region=DEFAULT_REGION):
     """Analyse conditions based on Daylight vs Darkness."""
-    light_data = df["light_conditions"].map(light_labels)
-    light_counts = light_data.value_counts()
+    light_counts = counts
+    if light_counts is None:
+        light_counts = aggregate_collisions(df)["light"]
 
     bar_chart(
         light_counts,
-        "Collisions by Light Conditions (West Yorkshire)",
+        f"Collisions by Light Conditions ({region})",
         "Light Condition",
         "Number of Collisions",
         color="slateblue"
     )
 
 # Collisions by Road Surface Conditions
-def analyse_road_surface(df):
+def analyse_road_surface(df, counts=None, region=DEFAULT_REGION):
     """Analyzes if the road was Dry, Wet or Icy."""
-    surface_data = df["road_surface_conditions"].map(surface_labels)
-    surface_counts = surface_data.value_counts()
+    surface_counts = counts
+    if surface_counts is None:
+        surface_counts = aggregate_collisions(df)["surface"]
 
     bar_chart(
         surface_counts,
-        "Collisions by Road Surface Conditions (West Yorkshire)",
+        f"Collisions by Road Surface Conditions ({region})",
         "Road Surface Condition",
         "Number of Collisions",
         color="#F87A1A"
     )
 
 # 4I — Special Conditions at Site
-def analyse_special_conditions(df):
+def analyse_special_conditions(df, counts=None):
     """Highlights site hazards like Roadworks or Oil, excluding 'normal'"""
-    data = df["special_conditions_at_site"].map(special_labels)
-    counts = data.value_counts()
+    if counts is None:
+        counts = aggregate_collisions(df)["special"]
 
     # Filter out "No special conditions" to see actual hazards.
     if "No special conditions" in counts:
@@ -74,9 +69,14 @@ def analyse_special_conditions(df):
         color="#5b0bf0"
     )
 
-def run_environmental_suite(df):
-    """Execute the environmental analysis."""
-    analyse_weather_distribution(df)
-    analyse_light_condtions(df)
-    analyse_road_surface(df)
-    analyse_special_conditions(df)
\ No newline at end of file
+@instrument.timed()
+def run_environmental_suite(df, aggregates=None, region=DEFAULT_REGION):
+    """Execute the environmental analysis.
+    Pass the aggregate_collisions() result to reuse its counts; region
+    names the area in the chart titles."""
+    if aggregates is None:
+        aggregates = aggregate_collisions(df)
+    analyse_weather_distribution(df, aggregates["weather"], region)
+    analyse_light_condtions(df, aggregates["light"], region)
+    analyse_road_surface(df, aggregates["surface"], region)
+    analyse_special_conditions(df, aggregates["special"])
\ No newline at end of file
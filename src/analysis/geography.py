@@ -1,7 +1,6 @@
-import pandas as pd
-import matplotlib.pyplot as plt
-from src.charts import pie_chart, bar_chart, stacked_bar_chart
-from src.mappings import severity_labels, district_names
+from src import instrument
+from src.analysis.aggregates import aggregate_collisions, district_severity
+from src.charts import DEFAULT_REGION, pie_chart, bar_chart, stacked_bar_chart
 
 #Below def method has already been taken care of.
 # Severity Distribution
@@ -18,44 +17,33 @@ from src.mappings import severity_labels, district_names
 #         labeldistance=1.0
 #     )
 
-def analyse_severity_by_district(df):
+def analyse_severity_by_district(df, district_comparison=None, region=DEFAULT_REGION):
     """
     Compares the accident count and severity levels across the
-    5 West Yorkshire districts.
+    5 West Yorkshire districts (or the districts of region).
     """
 
-    df_local = df.copy()
+    # Counts of severity per district, in a format for a stacked bar chart.
+    if district_comparison is None:
+        district_comparison = district_severity(df)
 
-    # Map the ONS codes and severity levels using your mappings.py
-    df_local[
-        "district"] = df_local[
-        "local_authority_ons_district"].map(district_names)
-    df_local["severity"] = df_local["collision_severity"].map(severity_labels)
-
-    # Create a cross tabulation(counts of severity per district)
-    # This turns the data into a format for a stacked bar chart.
-    district_comparison = pd.crosstab(
-        df_local["district"],
-        df_local["severity"])
-
-    # Ensure the columns are in a logical severity order.
-    column_order = ["Fatal", "Serious", "Slight"]
-
-    district_comparison = district_comparison.reindex(
-        columns=[c for c in column_order if c in district_comparison.columns])
-    
     # Plotting the stacked bar chart.
     stacked_bar_chart(
         district_comparison,
-        "Accident Severity Breakdown by West Yorkshire District",
+        f"Accident Severity Breakdown by {region} District",
         "District",
         "Number of Accidents",
         ["#e74c3c", "#f39c12", "#f1c40f"]
     )
 
-def run_geographical_suite(df):
-    """Execute the geographical analysis."""
+@instrument.timed()
+def run_geographical_suite(df, aggregates=None, region=DEFAULT_REGION):
+    """Execute the geographical analysis.
+    Pass the aggregate_collisions() result to reuse its counts; region
+    names the area in the chart titles."""
     #analyse_overall_severity(df)
-    analyse_severity_by_district(df)
+    if aggregates is None:
+        aggregates = aggregate_collisions(df)
+    analyse_severity_by_district(df, aggregates["district_severity"], region)
     
 
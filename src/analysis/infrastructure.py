@@ -1,50 +1,57 @@
-from src.charts import bar_chart, pie_chart
-from src.mappings import urban_rural_labels
+from src import instrument
+from src.analysis.aggregates import aggregate_collisions
+from src.charts import DEFAULT_REGION, bar_chart, pie_chart
 
-def analyse_road_type_distribution(df):
+def analyse_road_type_distribution(df, counts=None, region=DEFAULT_REGION):
     """Analyzes collisions by road layout (Roundabouts, Single carriageways, etc)"""
 
-    counts = df["display_road_type"].value_counts()
+    if counts is None:
+        counts = aggregate_collisions(df)["road_type"]
 
     bar_chart(
         counts,
-        "Collisions by Road Type (West Yorkshire)",
+        f"Collisions by Road Type ({region})",
         "Road Type",
         "Number of Collisions",
         color="#56CF5AFF"
     )
 
 # Urban/Rural x Speed Limit.
-def analyse_urban_rural_proportion(df):
+def analyse_urban_rural_proportion(df, counts=None, region=DEFAULT_REGION):
     """Compares the proportion of accidents in urban vs rural areas."""
 
-    df_local = df.copy()
-    df_local["area_label"] = df_local["urban_or_rural_area"].map(urban_rural_labels)
-    counts = df_local["area_label"].value_counts()
+    if counts is None:
+        counts = aggregate_collisions(df)["urban_rural"]
     
     pie_chart(
         counts,
-        "Proportion of Urban vs Rural Collisions (West Yorkshire)",
+        f"Proportion of Urban vs Rural Collisions ({region})",
         pctdistance=0.8,
         labeldistance=1.0,
         colors=["#8cb49d", "#fd0707"]
     )
 
-def analyse_speed_limit_distribution(df):
+def analyse_speed_limit_distribution(df, counts=None, region=DEFAULT_REGION):
     """Visualizes the frequency of collisions at different speed limits."""
     
-    counts = df["speed_limit"].value_counts().sort_index()
+    if counts is None:
+        counts = aggregate_collisions(df)["speed_limit"]
 
     bar_chart(
         counts,
-        "Collisions by Speed Limit (West Yorkshire)",
+        f"Collisions by Speed Limit ({region})",
         "Speed Limit (mph)",
         "Number of Collisions",
         color="#3cbaf0ff"
     )
 
-def run_infrastructure_suite(df):
-    """Executes the full infrastructure analysis."""
-    analyse_road_type_distribution(df)
-    analyse_speed_limit_distribution(df)
-    analyse_urban_rural_proportion(df)
+@instrument.timed()
+def run_infrastructure_suite(df, aggregates=None, region=DEFAULT_REGION):
+    """Executes the full infrastructure analysis.
+    Pass the aggregate_collisions() result to reuse its counts; region
+    names the area in the chart titles."""
+    if aggregates is None:
+        aggregates = aggregate_collisions(df)
+    analyse_road_type_distribution(df, aggregates["road_type"], region)
+    analyse_speed_limit_distribution(df, aggregates["speed_limit"], region)
+    analyse_urban_rural_proportion(df, aggregates["urban_rural"], region)
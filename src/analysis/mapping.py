@@ -1,26 +1,80 @@
 import webbrowser
 import os
 import folium
-import reverse_geocoder as rg # better than geopy to stop hitting apis.
-from folium.plugins import MarkerCluster
+import numpy as np
+from folium.plugins import MarkerCluster, FastMarkerCluster
+from src import instrument
+from src.fast_markers import compact_payload, popup_callback
+from src.geocoding import reverse_geocode
 from src.mappings import severity_labels
 
-def get_address(lat, lon):
-    """Translate the coordinates into a human readable street name. (OFFLINE)"""
+# Popup shown for each collision pin.
+SEVERITY_POPUP = """
+        <b>Severity:</b> {severity}<br>
+        <b>Date:</b> {date}<br>
+        <b>Road Type:</b> {road_type}<br>
+        """
+
+# Browser-side pin for the 'fast' renderer (see src/fast_markers.py).
+FAST_PIN_JS = """
+            marker = L.marker(new L.LatLng(row[0], row[1]), {
+                icon: L.AwesomeMarkers.icon({
+                    icon: value('icon'), markerColor: value('color'),
+                    iconColor: 'white', prefix: 'glyphicon'
+                })
+            });
+"""
+
+def get_addresses(coords, cache_dir=None):
+    """Street/area names for many coordinates in one lookup. (OFFLINE)"""
 
     # Initiate the try block.
     try:
-        # Add a timeout for web requests.
-        results = rg.search((lat, lon))
-        if results:
-            area = results[0].get('name', 'Unknown Area')
-            return area
+        places = reverse_geocode(coords, cache_dir=cache_dir)
     except Exception:
-        return "Area Lookup Failed"
-    return "Unknown Location"
+        return ["Area Lookup Failed"] * len(coords)
+    return [place.get('name') or 'Unknown Area' for place in places]
 
-def generate_severity_map(df, blackspots=None, output_path="collision_map.html"):
-    """Creates an interactive cluster map of collisons."""
+def get_address(lat, lon, cache_dir=None):
+    """Translate the coordinates into a human readable street name. (OFFLINE)"""
+    return get_addresses([(lat, lon)], cache_dir=cache_dir)[0]
+
+def add_fast_collision_pins(m, df):
+    """
+    Adds every collision as one compact array with a browser-side callback,
+    rather than a folium.Marker per row - so no sampling is needed.
+    """
+    is_motorway = (df["first_road_class"] == 1).to_numpy()
+
+    if "display_road_type" in df.columns:
+        road_type = df["display_road_type"].astype(object).fillna("Standard Road")
+    else:
+        road_type = np.full(len(df), "Standard Road", dtype=object)
+
+    fields = {
+        "severity": df["collision_severity"].map(severity_labels).fillna("Unknown"),
+        "date": df["date"].astype(str),
+        "road_type": road_type,
+        # Motorway collisions stand out as red.
+        "color": np.where(is_motorway, "red", "lightblue"),
+        "icon": np.where(is_motorway, "road", "info-sign"),
+    }
+
+    rows, names, tables = compact_payload(df["latitude"], df["longitude"], fields)
+    FastMarkerCluster(
+        rows, callback=popup_callback(SEVERITY_POPUP, names, tables, FAST_PIN_JS)
+    ).add_to(m)
+
+
+@instrument.timed()
+def generate_severity_map(df, blackspots=None, output_path="collision_map.html",
+                          renderer="markers", cache_dir=None, open_browser=True):
+    """
+    Creates an interactive cluster map of collisons.
+    renderer="fast" draws every collision in the browser instead of
+    sampling 5000 folium markers. open_browser=False only saves the file
+    (the batch runner makes one map per region).
+    """
 
     # Initialize the map centered on Leeds area.
     m = folium.Map(
@@ -29,55 +83,59 @@ def generate_severity_map(df, blackspots=None, output_path="collision_map.html")
         tiles="cartodbpositron"
     )
 
-    # Initialize the cluster group.
-    marker_cluster = MarkerCluster().add_to(m)
-
     # Drop rows without coordinates to prevent errors.
-    sample_df = df.dropna(subset=["latitude", "longitude"]).head(5000)
-
-    for _, row in sample_df.iterrows():
-        severity = severity_labels.get(row["collision_severity"], "Unknown")
-
-        # Color logic for the pins on the map.
-        # Motorway collisions stand out as red.
-        if row["first_road_class"] == 1:
-            pin_color = "red"
-            pin_icon = "road"
+    located_df = df.dropna(subset=["latitude", "longitude"])
+
+    if renderer == "fast":
+        add_fast_collision_pins(m, located_df)
+    else:
+        # Initialize the cluster group.
+        marker_cluster = MarkerCluster().add_to(m)
+
+        for _, row in located_df.head(5000).iterrows():
+            severity = severity_labels.get(row["collision_severity"], "Unknown")
+
+            # Color logic for the pins on the map.
+            # Motorway collisions stand out as red.
+            if row["first_road_class"] == 1:
+                pin_color = "red"
+                pin_icon = "road"
         
-        else:
-            pin_color = "lightblue"
-            pin_icon = "info-sign"
+            else:
+                pin_color = "lightblue"
+                pin_icon = "info-sign"
 
-        # Safe access to display road type.
-        road_type = row.get("display_road_type", "Standard Road")
+            # Safe access to display road type.
+            road_type = row.get("display_road_type", "Standard Road")
 
-        # Define popup content.
-        popup_text = f"""
-        <b>Severity:</b> {severity}<br>
-        <b>Date:</b> {row['date']}<br>
-        <b>Road Type:</b> {road_type}<br>
-        """
+            # Define popup content.
+            popup_text = SEVERITY_POPUP.format(
+                severity=severity, date=row["date"], road_type=road_type)
     
-        # Create the marker and add to the cluster.
-        folium.Marker(
-            location=[row["latitude"], row["longitude"]],
-            popup=folium.Popup(popup_text, max_width=300),
-            tooltip="Click for details",
-            icon=folium.Icon(color=pin_color, icon=pin_icon)
-        ).add_to(marker_cluster)
+            # Create the marker and add to the cluster.
+            folium.Marker(
+                location=[row["latitude"], row["longitude"]],
+                popup=folium.Popup(popup_text, max_width=300),
+                tooltip="Click for details",
+                icon=folium.Icon(color=pin_color, icon=pin_icon)
+            ).add_to(marker_cluster)
 
     # Add high risk accident blackspots (OFFLINE Mode)
     if blackspots is not None:
         print("Mapping Priority Blackspots (Local Lookup)......")
-        for i, spot in enumerate(blackspots, 1):
+
+        # Look every blackspot up at once.
+        street_names = get_addresses(
+            [(spot['latitude'], spot['longitude']) for spot in blackspots],
+            cache_dir=cache_dir,
+        )
+
+        for i, (spot, street_name) in enumerate(zip(blackspots, street_names), 1):
             
             lat = spot['latitude']
             lon = spot['longitude']
             count = spot['count']
 
-            # Use new helper method
-            street_name = get_address(lat, lon)
-
             # Create a label that explains the rank of the blackspot.
             # Rank 1-3 are the critical accident blackspots.
             rank_desc = "CRITICAL HAZARD" if i <= 3 else "High Risk Area"
@@ -165,7 +223,8 @@ def generate_severity_map(df, blackspots=None, output_path="collision_map.html")
     #print("Map and Legend generated successfully.")
 
     # This will open the map file in the default browser automatically.
-    full_path = os.path.abspath(output_path)
-    webbrowser.open(f"file://{full_path}")
+    if open_browser:
+        full_path = os.path.abspath(output_path)
+        webbrowser.open(f"file://{full_path}")
 
 
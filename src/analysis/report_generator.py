@@ -1,6 +1,20 @@
 from fpdf import FPDF
+from PIL import Image
 from datetime import datetime
+from src import instrument
+from src.charts import DEFAULT_REGION, chart_caption, load_manifest
 import os
+import re
+
+# Resolution charts are embedded at in the compact build (dots per inch of
+# the placed width). The PNGs are drawn far larger than the page needs.
+REPORT_IMAGE_DPI = 150
+
+def report_filename(region=None):
+    """File name of the PDF for region (West Yorkshire by default)."""
+    name = re.sub(r"[^A-Za-z0-9]+", "_", region or DEFAULT_REGION).strip("_")
+    return f"{name}_Traffic_Analysis_Report.pdf"
+
 
 now = datetime.now()
 timestamp = now.strftime("%d/%m/%Y %H:%M:%S")
@@ -8,9 +22,12 @@ timestamp = now.strftime("%d/%m/%Y %H:%M:%S")
 class WYTrafficReport(FPDF):
     """Generate a traffic report with all the findings."""
 
+    # Printed at the top of every page.
+    report_title = "West Yorkshire Traffic Analysis Report"
+
     def header(self):
         self.set_font("Arial", "B", 12)
-        self.cell(0, 10, "West Yorkshire Traffic Analysis Report", 0, 1, "C")
+        self.cell(0, 10, self.report_title, 0, 1, "C")
         self.ln(5)
 
     def footer(self):
@@ -18,9 +35,69 @@ class WYTrafficReport(FPDF):
         self.set_font("Arial", "I", 8)
         self.cell(0, 10, f"Page {self.page_no()}", 0, 0, "C")
 
-def generate_pdf_report(summary_data, hotspots_list=None, chart_folder="output_charts"):
+def compact_image(path, width_mm, dpi=REPORT_IMAGE_DPI):
+    """
+    The chart at path, ready to embed at width_mm: flattened onto white
+    (no alpha mask), scaled down to dpi for that width and reduced to a
+    256 colour palette (the charts only use a handful of colours).
+    """
+    with Image.open(path) as image:
+        image = image.convert("RGBA")
+    flat = Image.new("RGB", image.size, "white")
+    flat.paste(image, mask=image.getchannel("A"))
+
+    width_px = round(width_mm / 25.4 * dpi)
+    if flat.width > width_px:
+        height_px = max(round(flat.height * width_px / flat.width), 1)
+        flat = flat.resize((width_px, height_px), Image.LANCZOS)
+
+    return flat.quantize(256, method=Image.Quantize.FASTOCTREE)
+
+
+def place_image(pdf, path, x, w, image_dpi=None, prepared=None):
+    """
+    Adds a chart to the page. With image_dpi the compact version is
+    embedded; prepared maps (path, width) to images already made, so a
+    chart used twice is only converted (and stored in the PDF) once.
+    """
+    if image_dpi is None:
+        pdf.image(path, x=x, w=w)
+        return
+
+    if prepared is None:
+        prepared = {}
+    key = (path, w)
+    if key not in prepared:
+        prepared[key] = compact_image(path, w, image_dpi)
+    pdf.image(prepared[key], x=x, w=w)
+
+
+def report_charts(chart_folder):
+    """
+    Chart records from the folder's chart manifest (charts that are
+    still on disk), for when the records of the run aren't passed in.
+    """
+    return [
+        {"path": os.path.join(chart_folder, name), **entry}
+        for name, entry in load_manifest(chart_folder).items()
+        if os.path.exists(os.path.join(chart_folder, name))
+    ]
+
+
+@instrument.timed()
+def generate_pdf_report(summary_data, hotspots_list=None, chart_folder="output_charts",
+                        charts=None, image_dpi=None, region=None):
+    """charts are the chart records of the run (see src.charts.chart_record);
+    without them the charts listed in the folder's manifest are used.
+    image_dpi builds the compact report: charts are downsampled to that
+    resolution and palette-compressed instead of embedded full size.
+    The PDF is saved in chart_folder (see report_filename); region
+    replaces West Yorkshire in its name and page header."""
 
     pdf = WYTrafficReport()
+    if region is not None:
+        pdf.report_title = f"{region} Traffic Analysis Report"
+    prepared = {}
     pdf.set_auto_page_break(auto=True)
 
     # Incident summary.
@@ -95,15 +172,20 @@ def generate_pdf_report(summary_data, hotspots_list=None, chart_folder="output_c
 
         if os.path.exists(special_chart_path):
             pdf.ln(10)
-            pdf.image(special_chart_path, x=10, w=190)
+            place_image(pdf, special_chart_path, 10, 190, image_dpi, prepared)
         else:
             print(f"Warning: Could not find {special_chart}")
     
-    # Charts Visuals- use sorted() so they appear in a consistent order.
-    charts = sorted([c for c in os.listdir(chart_folder)if c.endswith(".png")])
+    if charts is None:
+        charts = report_charts(chart_folder)
+
+    # Charts Visuals- sorted by file name so they appear in a consistent order.
+    charts = sorted(charts, key=lambda chart: os.path.basename(chart["path"]))
     
     # For loop to skip the chart that already has been printed earlier.
-    for i, chart_name in enumerate(charts):
+    for i, chart in enumerate(charts):
+        chart_path = chart["path"]
+        chart_name = os.path.basename(chart_path)
         if "blackspot_priority_analysis" in chart_name.lower():
             print(f"Skipping duplicate: {chart_name}")
             continue
@@ -113,19 +195,17 @@ def generate_pdf_report(summary_data, hotspots_list=None, chart_folder="output_c
         else:
             pdf.ln(2)
 
-        chart_path = os.path.join(chart_folder, chart_name)
-
         # Clean up the name for the chart caption (eg, remove underscores, etc)
-        caption = chart_name.replace("_", " ").replace(".png", "").title()
+        caption = chart_caption(chart_path)
 
         pdf.set_font("Arial", "B", 12)
         pdf.cell(0, 1, caption, ln=1, align="C")
         # Manual gap between charts.
         pdf.ln(20)
-        pdf.image(chart_path, x=20, w=170)
+        place_image(pdf, chart_path, 20, 170, image_dpi, prepared)
 
-    target_folder = "output_charts"
-    filename = "West_Yorkshire_Traffic_Analysis_Report.pdf"
+    target_folder = chart_folder
+    filename = report_filename(region)
 
     full_path = os.path.join(target_folder, filename)
 
@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+
+# Blackspot scoring - ranks sites by harm rather than by raw count.
+# Every collision gets a weight from its severity and casualties, older
+# collisions count for less, and sites with few collisions are shrunk
+# towards the typical site on the same kind of road (empirical Bayes).
+
+# Ranking options for identify_blackspots(score=...).
+SCORES = ("count", "severity", "decayed", "eb")
+
+# Relative cost of a collision by severity code (Fatal, Serious, Slight).
+SEVERITY_WEIGHTS = {1: 10.0, 2: 3.0, 3: 1.0}
+
+# A collision's weight halves every HALF_LIFE_DAYS before the latest date.
+HALF_LIFE_DAYS = 365
+
+# Width of the empirical Bayes interval (90%).
+INTERVAL = 0.9
+
+
+def collision_weights(df, decay=False, half_life_days=HALF_LIFE_DAYS,
+                      reference_date=None):
+    """
+    Weight of every collision: severity weight x casualties, optionally
+    decayed by age (relative to reference_date, default the latest date).
+    """
+    codes = df["collision_severity"].to_numpy()
+    lookup = pd.Index(list(SEVERITY_WEIGHTS)).get_indexer(codes)
+    weights = np.where(
+        lookup >= 0, np.array(list(SEVERITY_WEIGHTS.values()))[lookup], 1.0)
+
+    if "number_of_casualties" in df:
+        casualties = df["number_of_casualties"].to_numpy(dtype=float)
+        weights = weights * np.maximum(np.nan_to_num(casualties, nan=1.0), 1.0)
+
+    if decay:
+        dates = pd.to_datetime(df["date"])
+        if reference_date is None:
+            reference_date = dates.max()
+        age_days = (reference_date - dates).dt.days.to_numpy(dtype=float)
+        weights = weights * 0.5 ** (np.maximum(age_days, 0) / half_life_days)
+
+    return weights
+
+
+def empirical_bayes(observed, groups):
+    """
+    Shrinks every site's score towards the mean of its group (road type).
+    Within a group the scores are treated as Poisson with a gamma prior
+    fitted by the method of moments; returns the posterior mean and the
+    INTERVAL credible bounds for every site.
+    """
+    # scipy.stats is slow to import, and only the "eb" score uses it.
+    from scipy.stats import gamma
+
+    observed = np.asarray(observed, dtype=float)
+    codes, _ = pd.factorize(pd.Series(groups), use_na_sentinel=False)
+    n_groups = codes.max() + 1 if len(codes) else 0
+
+    sizes = np.bincount(codes, minlength=n_groups)
+    means = np.bincount(codes, weights=observed, minlength=n_groups) / sizes
+    squares = np.bincount(codes, weights=observed ** 2, minlength=n_groups)
+    variances = squares / sizes - means ** 2
+
+    # Prior variance = spread beyond the Poisson noise (kept above zero).
+    prior_var = np.maximum(variances - means, 1e-6 * np.maximum(means, 1))
+    shape = (means ** 2 / prior_var)[codes]
+    rate = (means / prior_var)[codes]
+
+    # One collision-period of exposure per site.
+    post_shape = shape + observed
+    post_rate = rate + 1.0
+    tail = (1 - INTERVAL) / 2
+
+    return (
+        post_shape / post_rate,
+        gamma.ppf(tail, post_shape, scale=1 / post_rate),
+        gamma.ppf(1 - tail, post_shape, scale=1 / post_rate),
+    )
+
+
+def site_scores(df, labels, counts, roads=None, score="count",
+                half_life_days=HALF_LIFE_DAYS):
+    """
+    Scores every site at once.
+    labels gives the site number of each row of df (-1 for none) and counts
+    the collisions per site. Returns (score, low, high) arrays; low/high are
+    None unless score="eb".
+    """
+    if score not in SCORES:
+        raise ValueError(f"Unknown score {score!r}, expected one of {SCORES}")
+
+    if score == "count":
+        return counts.astype(float), None, None
+
+    weights = collision_weights(
+        df, decay=score in ("decayed", "eb"), half_life_days=half_life_days)
+
+    in_site = labels >= 0
+    totals = np.bincount(
+        labels[in_site], weights=weights[in_site], minlength=len(counts))
+
+    if score != "eb":
+        return totals, None, None
+
+    if roads is None:
+        roads = np.zeros(len(counts))
+    return empirical_bayes(totals, roads)
@@ -1,5 +1,7 @@
 import pandas as pd
-from src.charts import pie_chart
+from src import instrument
+from src.analysis.aggregates import aggregate_collisions, by_count
+from src.charts import DEFAULT_REGION, pie_chart
 from src.mappings import (
     severity_labels, 
     weather_labels, 
@@ -9,29 +11,32 @@ from src.mappings import (
 
 #print(silence debugging prints, turn on when ready)
 
-def run_comprehensive_summary(df, vehicles_df):
+@instrument.timed()
+def run_comprehensive_summary(df, vehicles_df, aggregates=None, region=DEFAULT_REGION):
     """
     Acts as the master analysis engine.
     Processes 1,613 records to find high-risk patterns from all three CSV files.
     Returns a list for PDF generation.
+    Pass the aggregate_collisions() result to reuse its counts; region
+    names the area in the chart title.
     """
-    total_accidents = len(df)
     report_lines = [] # Stores data for the generated PDF.
 
-    # Infrastructure Breakdown
-    motorway_df = df[df["first_road_class"] == 1]
-    motorway_count = len(motorway_df)
-    motorway_pct = (motorway_count / total_accidents) * 100
+    if aggregates is None:
+        aggregates = aggregate_collisions(df)
+
+    # Everything below comes from the precomputed code counts.
+    codes = aggregates["codes"]
+    total_accidents = aggregates["total"]
+    motorway_count = int(codes["first_road_class"].get(1, 0))
 
-    # Environmental Hazards
-    # Identifying the 'typical' conditions for a West Yorkshire accident
-    top_weather = df["weather_conditions"].mode()[0]
-    top_light = df["light_conditions"].mode()[0]
+    # idxmax keeps the lowest code on ties, the same as mode()[0].
+    top_weather = codes["weather_conditions"].idxmax()
+    top_light = codes["light_conditions"].idxmax()
+    severity_counts = by_count(
+        codes["collision_severity"]).rename(index=severity_labels)
 
-    # Severity Analysis & Hazard Score
-    # Mapping numbers (Fatal, Serious, Slight) from mappings.py
-    severity_counts = df[
-        "collision_severity"].value_counts().rename(index=severity_labels)
+    motorway_pct = (motorway_count / total_accidents) * 100
 
     # Calculate Hazard Score (Percentage of accidents that are Serious or Fatal)
     high_severity = severity_counts.get(
@@ -83,7 +88,7 @@ def run_comprehensive_summary(df, vehicles_df):
 
     pie_chart(
         severity_counts,
-        "Collision Severity Distribution West Yorkshire",
+        f"Collision Severity Distribution {region}",
         pctdistance=0.7,
         colors=["#fa0202", "#fd7906", "#F9F906"],
     )
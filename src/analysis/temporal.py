@@ -1,24 +1,30 @@
-from src.charts import bar_chart
+from src import instrument
+from src.analysis.aggregates import aggregate_collisions
+from src.charts import DEFAULT_REGION, bar_chart
 
 
-def analyse_hour_distribution(df):
+def analyse_hour_distribution(df, counts=None, region=DEFAULT_REGION):
     """Shows when collisions peak during the day (Rush hour, etc)"""
-    hour_counts = df["hour"].value_counts().sort_index()
+    hour_counts = counts
+    if hour_counts is None:
+        hour_counts = aggregate_collisions(df)["hour"]
 
     bar_chart(
         hour_counts,
-        "Collisions by Hour of Day (West Yorkshire)",
+        f"Collisions by Hour of Day ({region})",
         "Hour(24h)",
         "Number of Collisions",
         color="steelblue",
     )
 
 
-def analyse_weekday_distribution(df):
+def analyse_weekday_distribution(df, counts=None, region=DEFAULT_REGION):
     """Show which days are the most dangerous to have a collision."""
 
     # Ensure your data has a 'day_of_week' column or use the index.
-    weekday_counts = df["day_name"].value_counts()
+    weekday_counts = counts
+    if weekday_counts is None:
+        weekday_counts = aggregate_collisions(df)["weekday"]
 
     ordered_days = [
         "Monday",
@@ -33,7 +39,7 @@ def analyse_weekday_distribution(df):
 
     bar_chart(
         weekday_counts,
-        "Collisions by Weekday (West Yorkshire)",
+        f"Collisions by Weekday ({region})",
         "Day of Week",
         "Number of Collisions",
         color="darkorange",
@@ -41,23 +47,30 @@ def analyse_weekday_distribution(df):
 
 
 # 4C — Collisions by Month
-def analyse_month_distribution(df):
+def analyse_month_distribution(df, counts=None, region=DEFAULT_REGION):
     """Analyzes seasonal trends across the year."""
 
     # Sort index keeps months in order (1-12)
-    month_counts = df["month"].value_counts().sort_index()
+    month_counts = counts
+    if month_counts is None:
+        month_counts = aggregate_collisions(df)["month"]
 
     bar_chart(
         month_counts,
-        "Collisions by Month (West Yorkshire)",
+        f"Collisions by Month ({region})",
         "Month",
         "Number of Collisions",
         color="seagreen",
     )
 
 
-def run_temporal_suite(df):
-    """Executes the full time series analysis."""
-    analyse_hour_distribution(df)
-    analyse_weekday_distribution(df)
-    analyse_month_distribution(df)
+@instrument.timed()
+def run_temporal_suite(df, aggregates=None, region=DEFAULT_REGION):
+    """Executes the full time series analysis.
+    Pass the aggregate_collisions() result to reuse its counts; region
+    names the area in the chart titles."""
+    if aggregates is None:
+        aggregates = aggregate_collisions(df)
+    analyse_hour_distribution(df, aggregates["hour"], region)
+    analyse_weekday_distribution(df, aggregates["weekday"], region)
+    analyse_month_distribution(df, aggregates["month"], region)
@@ -0,0 +1,218 @@
+import argparse
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
+from src.cache import DEFAULT_CACHE_DIR
+from src.load_data import ALL_DISTRICTS, LinkedTableStore, load_wy_data
+from src.mappings import district_names
+from src.pipeline import run_analysis
+
+# Batch runner - one report per region from a single national load.
+# The accidents, vehicles and casualties are parsed once, written to
+# uncompressed Arrow files and memory-mapped by the worker processes, which
+# only take their own region's rows. Without pyarrow each worker is sent
+# its region's rows instead.
+
+# Columns a batch can be split on.
+PARTITIONS = ("police_force", "local_authority_ons_district")
+
+# Each region gets a folder with this name inside the output root.
+DEFAULT_OUTPUT_ROOT = "output_regions"
+
+
+def region_name(by, key):
+    """Readable name of one region (district names where we have them)."""
+    if by == "local_authority_ons_district":
+        return district_names.get(key, str(key))
+    return f"Police Force {key}"
+
+
+def region_folder(name):
+    """File system safe folder name for a region."""
+    return re.sub(r"[^A-Za-z0-9]+", "_", name).strip("_")
+
+
+def partition_regions(df, by="police_force"):
+    """
+    Row positions of every region: {name: positions}, biggest region first.
+    by is a column in PARTITIONS or a dict of {name: district codes}.
+    """
+    if isinstance(by, dict):
+        districts = df["local_authority_ons_district"].astype(str).to_numpy()
+        groups = {
+            name: np.flatnonzero(np.isin(districts, list(codes)))
+            for name, codes in by.items()
+        }
+    elif by in PARTITIONS:
+        codes, keys = df[by].factorize(sort=True)
+        order = np.argsort(codes, kind="stable")
+        starts = np.searchsorted(codes[order], np.arange(len(keys) + 1))
+        groups = {
+            region_name(by, key): order[starts[i]:starts[i + 1]]
+            for i, key in enumerate(keys)
+        }
+    else:
+        raise ValueError(f"Unknown partition {by!r}, expected one of {PARTITIONS}")
+
+    groups = {name: rows for name, rows in groups.items() if len(rows)}
+    return dict(sorted(groups.items(), key=lambda item: -len(item[1])))
+
+
+def share_frame(df, folder, name):
+    """
+    Writes the frame as an uncompressed Arrow file for the workers to
+    memory-map. Returns its path, or the frame itself without pyarrow.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.feather as feather
+    except ImportError:
+        return df
+
+    path = os.path.join(folder, f"{name}.arrow")
+    table = pa.Table.from_pandas(df, preserve_index=True)
+    feather.write_feather(table, path, compression="uncompressed")
+    return path
+
+
+def take_rows(source, positions=None):
+    """
+    The rows at positions of a shared frame (an Arrow path or a frame);
+    a frame without positions is already just the region's rows.
+    """
+    if not isinstance(source, str):
+        return source if positions is None else source.iloc[positions]
+
+    import pyarrow.feather as feather
+
+    table = feather.read_table(source, memory_map=True)
+    return table.take(positions).to_pandas()
+
+
+def _job_table(source, positions):
+    """What a job carries: the shared path and positions, or just the rows."""
+    if isinstance(source, str):
+        return source, positions
+    return source.iloc[positions], None
+
+
+def run_region(job):
+    """Runs the whole analysis for one region (in a worker process)."""
+    frames = {
+        table: take_rows(source, positions)
+        for table, (source, positions) in job["tables"].items()
+    }
+
+    os.makedirs(job["output_dir"], exist_ok=True)
+    records = run_analysis(
+        frames["accidents"], frames["vehicles"], frames["casualties"],
+        output_dir=job["output_dir"],
+        cache_dir=job["cache_dir"],
+        region=job["name"],
+        chart_workers=job["chart_workers"],
+        map_path=os.path.join(job["output_dir"], "collision_map.html"),
+        open_browser=False,
+    )
+    return job["name"], job["output_dir"], len(records)
+
+
+def _run_parallel(jobs, workers):
+    """
+    Runs the jobs in worker processes, or returns None if the pool can't
+    start. A region that fails raises here, it isn't run again.
+    """
+    pool = None
+    try:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        futures = [pool.submit(run_region, job) for job in jobs]
+    except (OSError, BrokenProcessPool) as e:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        print(f"Could not start the worker processes, running the regions serially: {e}")
+        return None
+
+    with pool:
+        return [future.result() for future in futures]
+
+
+def run_batch(accidents_path="data/accidents.csv",
+              vehicles_path="data/vehicles.csv",
+              casualties_path="data/casualties.csv",
+              by="police_force", output_root=DEFAULT_OUTPUT_ROOT,
+              cache_dir=DEFAULT_CACHE_DIR, workers=None):
+    """
+    Loads the national extract once and writes a report folder (charts,
+    map and PDF) per region, the regions running in parallel processes.
+    Returns {region name: output folder}.
+    """
+    df = load_wy_data(accidents_path, cache_dir=cache_dir,
+                      districts=ALL_DISTRICTS)
+    if df is None or df.empty:
+        print("Error: No data loaded. Please check the file path.")
+        return {}
+
+    vehicles = LinkedTableStore(vehicles_path, cache_dir=cache_dir)
+    casualties = LinkedTableStore(casualties_path, cache_dir=cache_dir)
+    regions = partition_regions(df, by)
+
+    workers = min(workers or os.cpu_count() or 1, max(len(regions), 1))
+    # The regions already run in parallel, so each draws its charts serially.
+    chart_workers = 1 if workers > 1 else None
+
+    os.makedirs(output_root, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=output_root) as shared:
+        sources = {
+            "accidents": share_frame(df, shared, "accidents"),
+            "vehicles": share_frame(vehicles.frame, shared, "vehicles"),
+            "casualties": share_frame(casualties.frame, shared, "casualties"),
+        }
+
+        jobs = []
+        collision_ids = df["collision_index"].to_numpy()
+        for name, rows in regions.items():
+            ids = collision_ids[rows]
+            positions = {
+                "accidents": rows,
+                "vehicles": vehicles.positions_for(ids),
+                "casualties": casualties.positions_for(ids),
+            }
+            jobs.append({
+                "name": name,
+                "output_dir": os.path.join(output_root, region_folder(name)),
+                "cache_dir": cache_dir,
+                "chart_workers": chart_workers,
+                "tables": {
+                    table: _job_table(source, positions[table])
+                    for table, source in sources.items()
+                },
+            })
+
+        results = None
+        if workers > 1 and len(jobs) > 1:
+            results = _run_parallel(jobs, workers)
+
+        if results is None:
+            results = [run_region(job) for job in jobs]
+
+    for name, output_dir, n_charts in results:
+        print(f"{name}: {n_charts} charts in {output_dir}")
+
+    return {name: output_dir for name, output_dir, _ in results}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Run the traffic analysis for every region of an extract.")
+    parser.add_argument("--accidents", default="data/accidents.csv")
+    parser.add_argument("--vehicles", default="data/vehicles.csv")
+    parser.add_argument("--casualties", default="data/casualties.csv")
+    parser.add_argument("--by", default="police_force", choices=PARTITIONS)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT_ROOT)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    run_batch(args.accidents, args.vehicles, args.casualties, by=args.by,
+              output_root=args.output, workers=args.workers)
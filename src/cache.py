@@ -0,0 +1,109 @@
+import glob
+import hashlib
+import json
+import os
+import pandas as pd
+from src import mappings
+
+# Where the cleaned frames are stored between runs.
+DEFAULT_CACHE_DIR = os.path.join("data", ".cache")
+
+# Bump this whenever the cleaning logic changes so old caches are rebuilt.
+CACHE_VERSION = 5
+
+# How much of the start and end of the CSV gets hashed (1 MiB each).
+SAMPLE_BYTES = 1024 * 1024
+
+
+def file_fingerprint(path, sample_bytes=SAMPLE_BYTES):
+    """
+    Fingerprints a source file from its size, mtime and a content hash.
+    Only the head and tail are hashed so multi-GB extracts stay cheap.
+    """
+    stat = os.stat(path)
+    digest = hashlib.sha256()
+    digest.update(f"{stat.st_size}:{stat.st_mtime_ns}".encode())
+
+    with open(path, "rb") as f:
+        digest.update(f.read(sample_bytes))
+        if stat.st_size > sample_bytes:
+            f.seek(max(stat.st_size - sample_bytes, sample_bytes))
+            digest.update(f.read(sample_bytes))
+
+    return digest.hexdigest()
+
+
+def mappings_fingerprint():
+    """Hashes every label table in src/mappings.py."""
+    tables = {
+        name: value
+        for name, value in vars(mappings).items()
+        if isinstance(value, dict) and not name.startswith("_")
+    }
+    payload = json.dumps(tables, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def cache_key(source_path, extra_key=None):
+    """Combines the source file, the mappings and any extra options."""
+    parts = [
+        str(CACHE_VERSION),
+        file_fingerprint(source_path),
+        mappings_fingerprint(),
+        json.dumps(extra_key, sort_keys=True, default=str),
+    ]
+    return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+
+def cached_frame(source_path, build, cache_dir=DEFAULT_CACHE_DIR,
+                 name=None, extra_key=None):
+    """
+    Returns the frame produced by build(), using an Arrow IPC copy on disk
+    when the source CSV and the mapping tables are unchanged.
+    The cache file is memory-mapped so it is read without an extra buffer,
+    but the frame is still one full copy - zero-copy columns would be
+    read-only, and an in-place edit of a cached frame would then fail.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.feather as feather
+    except ImportError:
+        # No pyarrow installed - just do the full load every time.
+        return build()
+
+    try:
+        key = cache_key(source_path, extra_key)
+    except OSError:
+        # The source can't be fingerprinted (missing/unreadable) so skip.
+        return build()
+
+    name = name or os.path.splitext(os.path.basename(source_path))[0]
+    cache_path = os.path.join(cache_dir, f"{name}-{key[:16]}.arrow")
+
+    if os.path.exists(cache_path):
+        try:
+            table = feather.read_table(cache_path, memory_map=True)
+            return table.to_pandas()
+        except Exception as e:
+            print(f"Ignoring unreadable cache {cache_path}: {e}")
+
+    df = build()
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # Remove caches built from older versions of the same source. Only
+        # this name plus a key: "accidents" mustn't match "accidents-all-...".
+        pattern = f"{glob.escape(name)}-{'[0-9a-f]' * 16}.arrow"
+        for stale in glob.glob(os.path.join(cache_dir, pattern)):
+            os.remove(stale)
+
+        # Write to a temp file first so a crash never leaves half a cache.
+        table = pa.Table.from_pandas(df, preserve_index=True)
+        tmp_path = cache_path + ".tmp"
+        feather.write_feather(table, tmp_path, compression="uncompressed")
+        os.replace(tmp_path, cache_path)
+    except Exception as e:
+        print(f"Could not write cache {cache_path}: {e}")
+
+    return df
@@ -1,62 +1,106 @@
-import matplotlib
-
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
-from matplotlib.ticker import MaxNLocator
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from importlib.metadata import version
+import hashlib
+import json
+import multiprocessing
 import numpy as np
+import pandas as pd
 import os
+import threading
+import time
+from src import instrument
 
 # print(silence debugging prints, turn on when ready)
 
-# Create an Output chart folder if it does not exist.
-if not os.path.exists("output_charts"):
-    os.makedirs("output_charts")
+# matplotlib is only imported (and styled) when the first chart is drawn,
+# and chart folders are made when a chart is saved into them - importing
+# this module has no side effects.
 
-# The Academic Grayscale Look for all the charts.
-plt.style.use("grayscale")
+# Charts submitted while a ChartQueue is open are queued, not drawn. The
+# open queue is per thread, so stages drawing side by side keep their own.
+_queues = threading.local()
 
 
-def bar_chart(series, title, xlabel, ylabel, color=None):
-    plt.figure(figsize=(12, 16))
-    series.plot(kind="bar", color=color)
-    plt.title(title, fontsize=18)
-    plt.xlabel(xlabel, fontsize=18)
-    plt.ylabel(ylabel)
-    plt.xticks(rotation=45, ha="right", fontsize=12)
-    plt.yticks(fontsize=12)
-    plt.tight_layout()
+def _active_queue():
+    """The ChartQueue open on this thread, or None."""
+    return getattr(_queues, "queue", None)
 
-    # Save charts insted of plt.show(). plt.show() causes weird behaviour.
-    clean_title = (
-        title.replace(" ", "_").replace("(", "").replace(")", "") + ".png"
-    )
-    filename = f"{clean_title}"
-    save_path = os.path.join("output_charts", filename)
-    plt.savefig(save_path)
-    # Important closes the plot memory so the script keeps moving.
-    plt.close()
-    # print(f"Chart saved: {save_path}")
+# Where the suites' charts are saved unless a ChartQueue says otherwise.
+CHART_FOLDER = "output_charts"
 
+# The area the charts and report describe unless a region is given.
+DEFAULT_REGION = "West Yorkshire"
 
-def stacked_bar_chart(df_comparison, title, xlabel, ylabel, colors):
-    # This uses your master height of 16
-    plt.figure(figsize=(12, 16))
-    df_comparison.plot(kind="bar", stacked=True, color=colors, ax=plt.gca())
-    plt.title(title)
-    plt.xlabel(xlabel, fontsize=12)
-    plt.ylabel(ylabel, fontsize=12)
-    plt.xticks(rotation=0)
-    plt.yticks(fontsize=12)
-    plt.legend(title="Severity")
-    plt.tight_layout()
+# Records the input hash of every PNG in a chart folder.
+MANIFEST_FILE = "chart_manifest.json"
 
-    clean_title = title.replace(" ", "_") + ".png"
-    plt.savefig(f"output_charts/{clean_title}")
-    plt.close()
+# Bump this when the drawing code changes so every chart is redrawn.
+CHART_CACHE_VERSION = 1
 
 
-def pie_chart(series, title, colors=None, pctdistance=1.0, labeldistance=1.05):
-    plt.figure(figsize=(12, 16))
+def chart_filename(title, strip_brackets=True):
+    """The PNG name for a chart title (the same title always gives the same file)."""
+    clean_title = title.replace(" ", "_")
+    if strip_brackets:
+        clean_title = clean_title.replace("(", "").replace(")", "")
+    return clean_title + ".png"
+
+
+@lru_cache(maxsize=None)
+def _setup_matplotlib():
+    """Imports matplotlib once per process, with the Agg backend and style."""
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.style
+
+    # The Academic Grayscale Look for all the charts.
+    matplotlib.style.use("grayscale")
+
+
+def _new_figure(figsize):
+    """A stand-alone Figure (no pyplot global state, safe in any process)."""
+    _setup_matplotlib()
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=figsize)
+    return fig, fig.add_subplot()
+
+
+def _render_bar(series, path, title, xlabel, ylabel, color=None):
+    fig, ax = _new_figure((12, 16))
+    series.plot(kind="bar", color=color, ax=ax)
+    ax.set_title(title, fontsize=18)
+    ax.set_xlabel(xlabel, fontsize=18)
+    ax.set_ylabel(ylabel)
+    for label in ax.get_xticklabels():
+        label.set_rotation(45)
+        label.set_horizontalalignment("right")
+        label.set_fontsize(12)
+    ax.tick_params(axis="y", labelsize=12)
+    fig.tight_layout()
+    fig.savefig(path)
+
+
+def _render_stacked_bar(df_comparison, path, title, xlabel, ylabel, colors):
+    # This uses your master height of 16
+    fig, ax = _new_figure((12, 16))
+    df_comparison.plot(kind="bar", stacked=True, color=colors, ax=ax)
+    ax.set_title(title)
+    ax.set_xlabel(xlabel, fontsize=12)
+    ax.set_ylabel(ylabel, fontsize=12)
+    ax.tick_params(axis="x", labelrotation=0)
+    ax.tick_params(axis="y", labelsize=12)
+    ax.legend(title="Severity")
+    fig.tight_layout()
+    fig.savefig(path)
+
+
+def _render_pie(series, path, title, colors=None, pctdistance=1.0,
+                labeldistance=1.05):
+    fig, ax = _new_figure((12, 16))
 
     # Label styling.
     label_font = {"fontsize": 14, "color": "black"}
@@ -68,28 +112,357 @@ def pie_chart(series, title, colors=None, pctdistance=1.0, labeldistance=1.05):
         pctdistance=pctdistance,
         labeldistance=labeldistance,
         textprops=label_font,
+        ax=ax,
     )
-    plt.title(title, pad=20, fontsize=16)
-    plt.ylabel("")  # hides the y axis.
-    plt.tight_layout()
+    ax.set_title(title, pad=20, fontsize=16)
+    ax.set_ylabel("")  # hides the y axis.
+    fig.tight_layout()
+    fig.savefig(path)
 
-    # Save charts insted of plt.show(). plt.show() causes weird behaviour.
 
-    clean_title = (
-        title.replace(" ", "_").replace("(", "").replace(")", "") + ".png"
+def _render_blackspots(path, labels, values, errors, texts, ends, xlabel,
+                       integer_ticks, data_duration, region=DEFAULT_REGION):
+    fig, ax = _new_figure((12, 10))
+    y_pos = np.arange(len(labels))
+
+    bars = ax.barh(
+        y_pos, values, xerr=errors, color="#F70202", align="center", height=0.6
     )
-    filename = f"{clean_title}"
-    save_path = os.path.join("output_charts", filename)
-    plt.savefig(save_path)
-    # Important closes the plot memory so the script keeps moving.
-    plt.close()
-    # print(f"Chart saved: {save_path}")
+    if integer_ticks:
+        from matplotlib.ticker import MaxNLocator
+
+        ax.xaxis.set_major_locator(MaxNLocator(integer=True))
+    ax.set_yticks(y_pos, labels, fontsize=11)
+
+    for bar, text, end in zip(bars, texts, ends):
+        ax.text(
+            end + 0.1,
+            bar.get_y() + bar.get_height() / 2,
+            text,
+            va="center",
+            color="black",
+            fontsize=12,
+        )
+
+    ax.set_title(
+        f"Priority Analysis: Top 5 {region} Blackspots",
+        fontsize=18,
+        pad=25,
+        weight="bold",
+    )
+    ax.set_xlabel(xlabel, fontsize=12)
+    ax.set_xlim(0, max(ends) * 1.4)
+    fig.tight_layout(pad=3.0)
+
+    # Add a note for the user to open the PDF for a full summary.
+    fig.text(
+        0.5,
+        0.01,
+        f"Anaylsis Period: {data_duration} | Coordinates listed in full report.",
+        ha="center",
+        fontsize=12,
+        style="italic",
+        color="black",
+    )
+
+    # Save PDF.
+    fig.savefig(path, dpi=300)
+
+
+# Chart kind -> the function that draws it.
+RENDERERS = {
+    "bar": _render_bar,
+    "stacked_bar": _render_stacked_bar,
+    "pie": _render_pie,
+    "blackspots": _render_blackspots,
+}
+
+
+def render_job(job):
+    """Draws one queued chart: job is (kind, data, path, spec)."""
+    kind, data, path, spec = job
+    # Create the chart folder if it does not exist.
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if data is None:
+        RENDERERS[kind](path, **spec)
+    else:
+        RENDERERS[kind](data, path, **spec)
+    return path
+
+
+def chart_hash(kind, data, spec):
+    """
+    Hash of everything that decides how a chart looks: its kind, the data
+    (values, index, names and dtypes), the title/colours/figure settings
+    and the matplotlib version.
+    """
+    digest = hashlib.sha256()
+    digest.update(
+        f"{CHART_CACHE_VERSION}|{version('matplotlib')}|{kind}".encode())
+
+    if isinstance(data, (pd.Series, pd.DataFrame)):
+        digest.update(pd.util.hash_pandas_object(data, index=True).to_numpy())
+        digest.update(str(data.index.tolist()).encode())
+        columns = data.columns if isinstance(data, pd.DataFrame) else [data.name]
+        dtypes = data.dtypes if isinstance(data, pd.DataFrame) else [data.dtype]
+        digest.update(repr((list(columns), [str(d) for d in dtypes])).encode())
+
+    digest.update(json.dumps(spec, sort_keys=True, default=_jsonable).encode())
+    return digest.hexdigest()
+
+
+def _jsonable(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    return str(value)
+
+
+def load_manifest(folder):
+    """The chart manifest of a folder: file name -> entry (empty if none)."""
+    try:
+        with open(os.path.join(folder, MANIFEST_FILE), encoding="utf-8") as f:
+            return json.load(f).get("charts", {})
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(folder, charts):
+    """Writes the manifest atomically next to the charts."""
+    path = os.path.join(folder, MANIFEST_FILE)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({"version": CHART_CACHE_VERSION, "charts": charts}, f,
+                  indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def _is_current(path, digest):
+    """True when the PNG on disk was drawn from exactly these inputs."""
+    entry = load_manifest(os.path.dirname(path)).get(os.path.basename(path))
+    return bool(entry) and entry.get("hash") == digest and os.path.exists(path)
+
+
+def chart_record(path, title, digest, render_seconds=None, cached=False):
+    """
+    What every chart function returns: where the chart is, its title and
+    input hash, how long it took to draw (None until drawn, or when the
+    cached PNG was reused) and its size on disk.
+    """
+    return {
+        "path": path,
+        "title": title,
+        "hash": digest,
+        "render_seconds": render_seconds,
+        "bytes": os.path.getsize(path) if os.path.exists(path) else None,
+        "cached": cached,
+    }
+
 
+def _timed_render(job):
+    """Draws one job and returns the seconds it took."""
+    start = time.perf_counter()
+    render_job(job)
+    return time.perf_counter() - start
 
+
+def _finish(record, seconds):
+    """Fills in the timing and size of a record once its chart is drawn."""
+    record["render_seconds"] = round(seconds, 4)
+    if os.path.exists(record["path"]):
+        record["bytes"] = os.path.getsize(record["path"])
+
+
+def _remember(records):
+    """Adds freshly drawn charts to their folders' manifests."""
+    by_folder = {}
+    for record in records:
+        # Only charts that actually reached the disk are recorded.
+        if record["bytes"] is not None:
+            by_folder.setdefault(
+                os.path.dirname(record["path"]), []).append(record)
+
+    for folder, drawn in by_folder.items():
+        charts = load_manifest(folder)
+        for record in drawn:
+            charts[os.path.basename(record["path"])] = {
+                key: record[key]
+                for key in ("title", "hash", "render_seconds", "bytes")
+            }
+        try:
+            save_manifest(folder, charts)
+        except OSError as e:
+            print(f"Could not save the chart manifest in {folder}: {e}")
+
+
+def _submit(kind, data, path, **spec):
+    """
+    Skips the chart if the PNG is already drawn from the same inputs,
+    queues it if a ChartQueue is open, otherwise draws it now.
+    Returns the chart's record, or None when there's nothing to plot.
+    """
+    title = spec.get("title", chart_caption(path))
+    # An empty table can't be plotted (a region with none of the rows).
+    if data is not None and data.empty:
+        print(f" No data for chart: {title}")
+        return None
+    digest = chart_hash(kind, data, spec)
+    if _is_current(path, digest):
+        record = chart_record(path, title, digest, cached=True)
+        queue = _active_queue()
+        if queue is not None:
+            queue.records.append(record)
+        return record
+
+    record = chart_record(path, title, digest)
+    job = (kind, data, path, spec)
+    queue = _active_queue()
+    if queue is not None:
+        return queue.submit(job, record)
+
+    _finish(record, _timed_render(job))
+    _remember([record])
+    return record
+
+
+def chart_caption(path):
+    """Readable caption from a chart file name (underscores to spaces)."""
+    return os.path.basename(path).replace("_", " ").replace(".png", "").title()
+
+
+def _pool_context():
+    """
+    How the chart processes start: forkserver, or spawn where there's no
+    forkserver. The charts stage runs on a thread beside the other stages,
+    and forking a process with other threads running can copy a lock one
+    of them holds and deadlock the child.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context(
+        "forkserver" if "forkserver" in methods else "spawn")
+
+
+def _render_parallel(jobs, workers):
+    """
+    Draws the jobs in worker processes and returns their seconds, or None
+    if the pool can't start. A chart that fails to draw raises here.
+    """
+    pool = None
+    try:
+        pool = ProcessPoolExecutor(max_workers=workers,
+                                   mp_context=_pool_context())
+        futures = [pool.submit(_timed_render, job) for job in jobs]
+    except (OSError, BrokenProcessPool) as e:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        print(f"Could not start the chart processes, drawing serially: {e}")
+        return None
+
+    with pool:
+        return [future.result() for future in futures]
+
+
+class ChartQueue:
+    """
+    Collects the charts made inside a `with ChartQueue():` block and draws
+    them all when the block ends, in a process pool (one figure per worker
+    at a time). Every chart is drawn through its own Figure, so nothing is
+    shared between workers. Falls back to drawing them one by one when
+    there's a single worker or the pool can't be started.
+    Charts whose PNG is already up to date are recorded but not drawn.
+    records holds every chart of the block, in the order it was made.
+    folder sends the block's charts somewhere other than CHART_FOLDER.
+    """
+
+    def __init__(self, workers=None, folder=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.folder = folder
+        if folder is not None:
+            os.makedirs(folder, exist_ok=True)
+        self.jobs = []
+        self.pending = []
+        self.records = []
+
+    @property
+    def paths(self):
+        return [record["path"] for record in self.records]
+
+    def submit(self, job, record=None):
+        if record is None:
+            record = chart_record(job[2], chart_caption(job[2]), None)
+        self.jobs.append(job)
+        self.pending.append(record)
+        self.records.append(record)
+        return record
+
+    def run(self):
+        """Draws every queued chart, returns their records in queued order."""
+        jobs, self.jobs = self.jobs, []
+        records, self.pending = self.pending, []
+
+        with instrument.span("render_charts", charts=len(jobs),
+                             workers=self.workers):
+            seconds = None
+            if self.workers > 1 and len(jobs) > 1:
+                seconds = _render_parallel(jobs, min(self.workers, len(jobs)))
+            if seconds is None:
+                seconds = [_timed_render(job) for job in jobs]
+
+        for record, took in zip(records, seconds):
+            _finish(record, took)
+        _remember([record for record in records if record["hash"] is not None])
+        return records
+
+    def __enter__(self):
+        self._previous = _active_queue()
+        _queues.queue = self
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _queues.queue = self._previous
+        if exc_type is None:
+            self.run()
+        return False
+
+
+def chart_folder():
+    """The folder charts go to: the open ChartQueue's, or CHART_FOLDER."""
+    queue = _active_queue()
+    if queue is not None and queue.folder is not None:
+        return queue.folder
+    return CHART_FOLDER
+
+
+@instrument.timed()
+def bar_chart(series, title, xlabel, ylabel, color=None):
+    # Save charts insted of plt.show(). plt.show() causes weird behaviour.
+    save_path = os.path.join(chart_folder(), chart_filename(title))
+    return _submit("bar", series, save_path, title=title, xlabel=xlabel,
+                   ylabel=ylabel, color=color)
+
+
+@instrument.timed()
+def stacked_bar_chart(df_comparison, title, xlabel, ylabel, colors):
+    save_path = os.path.join(
+        chart_folder(), chart_filename(title, strip_brackets=False))
+    return _submit("stacked_bar", df_comparison, save_path, title=title,
+                   xlabel=xlabel, ylabel=ylabel, colors=colors)
+
+
+@instrument.timed()
+def pie_chart(series, title, colors=None, pctdistance=1.0, labeldistance=1.05):
+    # Save charts insted of plt.show(). plt.show() causes weird behaviour.
+    save_path = os.path.join(chart_folder(), chart_filename(title))
+    return _submit("pie", series, save_path, title=title, colors=colors,
+                   pctdistance=pctdistance, labeldistance=labeldistance)
+
+
+@instrument.timed()
 def generate_blackspots_chart(
-    df, chart_folder, hotspots_data=None, data_duration="unknown"
+    df, chart_folder, hotspots_data=None, data_duration="unknown", score="count",
+    region=DEFAULT_REGION,
 ):
-    """Generate the accident blackspots chart for west yorkshire."""
+    """Generate the accident blackspots chart for west yorkshire (or region).
+    With a score other than "count" the bars show each site's priority
+    score (and its interval when the sites carry one)."""
 
     # If no data passed, chart cant be drawn.
     if not hotspots_data:
@@ -98,6 +471,8 @@ def generate_blackspots_chart(
 
     labels = []
     top_counts = []
+    top_scores = []
+    score_errors = []
 
     for spot in hotspots_data:
 
@@ -112,50 +487,46 @@ def generate_blackspots_chart(
         labels.append(full_label)
         top_counts.append(count)
 
-    # --- Chart Drawing Logic ---
-    plt.figure(figsize=(12, 10))
-    y_pos = np.arange(len(labels))
+        if score != "count":
+            top_scores.append(spot["score"])
+            score_errors.append((
+                spot["score"] - spot.get("score_low", spot["score"]),
+                spot.get("score_high", spot["score"]) - spot["score"],
+            ))
 
-    # Reverse the lists so the highest count is at the top
-    bars = plt.barh(
-        y_pos, top_counts[::-1], color="#F70202", align="center", height=0.6
-    )
-    plt.yticks(y_pos, labels[::-1], fontsize=11)
-    plt.gca().xaxis.set_major_locator(MaxNLocator(integer=True))
-
-    for bar in bars:
-        width = bar.get_width()
-        plt.text(
-            width + 0.1,
-            bar.get_y() + bar.get_height() / 2,
-            f"{int(width)} Incidents",
-            va="center",
-            color="black",
-            fontsize=12,
-        )
-
-    plt.title(
-        "Priority Analysis: Top 5 West Yorkshire Blackspots",
-        fontsize=18,
-        pad=25,
-        weight="bold",
-    )
-    plt.xlabel("Total Incident Count", fontsize=12)
-    plt.xlim(0, max(top_counts) * 1.4)
-    plt.tight_layout(pad=3.0)
-
-    # Add a note for the user to open the PDF for a full summary.
-    plt.figtext(
-        0.5,
-        0.01,
-        f"Anaylsis Period: {data_duration} | Coordinates listed in full report.",
-        ha="center",
-        fontsize=12,
-        style="italic",
-        color="black",
-    )
+    # --- Chart Drawing Logic ---
+    if score == "count":
+        # Reverse the lists so the highest count is at the top
+        values = top_counts[::-1]
+        errors = None
+        bar_texts = [f"{int(count)} Incidents" for count in values]
+        bar_ends = values
+        xlabel = "Total Incident Count"
+    else:
+        # Scored bars, with the interval as error bars when there is one.
+        values = top_scores[::-1]
+        errors = np.array(score_errors[::-1]).T
+        errors = errors if errors.any() else None
+        bar_texts = [
+            f"{value:.1f} pts ({int(count)} Incidents)"
+            for value, count in zip(values, top_counts[::-1])
+        ]
+        bar_ends = [
+            value + high for value, (_, high) in
+            zip(values, score_errors[::-1])
+        ]
+        xlabel = "Severity-weighted Priority Score"
 
-    # Save PDF.
     save_path = os.path.join(chart_folder, "blackspot_priority_analysis.png")
-    plt.savefig(save_path, dpi=300)
-    plt.close()
+    return _submit(
+        "blackspots", None, save_path,
+        labels=labels[::-1],
+        values=values,
+        errors=errors,
+        texts=bar_texts,
+        ends=bar_ends,
+        xlabel=xlabel,
+        integer_ticks=score == "count",
+        data_duration=data_duration,
+        region=region,
+    )
@@ -0,0 +1,65 @@
+import json
+import numpy as np
+import pandas as pd
+
+# Client-side marker rendering for the folium maps.
+# Instead of one Python marker object (and one block of popup HTML) per
+# incident, the incidents go to the browser as one array of small integers
+# plus a lookup table per popup field. The popup HTML is only built when a
+# marker is clicked.
+
+
+def compact_payload(lats, lons, fields):
+    """
+    Packs the incidents into rows of [lat, lon, code, code, ...].
+    fields maps a popup field name to one value per incident; each field is
+    factorized so repeated labels are shipped once in its table.
+    """
+    names = list(fields)
+    codes = []
+    tables = {}
+
+    for name in names:
+        field_codes, uniques = pd.factorize(
+            pd.Series(fields[name], dtype=object))
+        tables[name] = [str(value) for value in uniques] + ["Unknown"]
+
+        # Missing values factorize to -1, point them at the trailing "Unknown".
+        field_codes = np.where(field_codes >= 0, field_codes, len(uniques))
+        codes.append(field_codes.tolist())
+
+    rows = [
+        list(row)
+        for row in zip(np.asarray(lats).tolist(), np.asarray(lons).tolist(),
+                       *codes)
+    ]
+    return rows, names, tables
+
+
+def popup_callback(template, names, tables, marker_js, max_width=300,
+                   tooltip="Click for details"):
+    """
+    Returns the FastMarkerCluster callback for the payload above.
+    marker_js builds `marker` from `row` and `value(name)`; the popup
+    template's {name} placeholders are filled in the browser on click.
+    """
+    return f"""(function () {{
+        var names = {json.dumps(names)};
+        var tables = {json.dumps(tables)};
+        var template = {json.dumps(template)};
+
+        return function (row) {{
+            function value(name) {{
+                return tables[name][row[names.indexOf(name) + 2]];
+            }}
+            var marker;
+            {marker_js}
+            marker.bindPopup(function () {{
+                return template.replace(/\\{{(\\w+)\\}}/g, function (match, name) {{
+                    return names.indexOf(name) < 0 ? match : value(name);
+                }});
+            }}, {{maxWidth: {int(max_width)}}});
+            marker.bindTooltip({json.dumps(tooltip)});
+            return marker;
+        }};
+    }})()"""
@@ -0,0 +1,97 @@
+import json
+import os
+import threading
+import reverse_geocoder as rg # offline tool, no web requests.
+
+# Coordinates are rounded to this many places before lookup (~1m), which
+# is also the key of the on-disk cache.
+COORD_DECIMALS = 5
+
+# File name of the lookup cache inside a cache_dir.
+CACHE_FILE = "geocode.json"
+
+# Cached places per cache file, loaded from disk once per process.
+_places = {}
+# Pipeline stages geocode from several threads; this guards _places and
+# the cache files.
+_places_lock = threading.Lock()
+
+
+def coord_key(lat, lon, decimals=COORD_DECIMALS):
+    """Cache key of a coordinate: '53.80080,-1.54910'."""
+    return f"{float(lat):.{decimals}f},{float(lon):.{decimals}f}"
+
+
+def _read_places(cache_path):
+    """The places saved in one cache file (an empty dict if there's none)."""
+    try:
+        with open(cache_path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _load_places(cache_path):
+    """The cached places for one cache file, read once per process."""
+    if cache_path not in _places:
+        _places[cache_path] = _read_places(cache_path)
+    return _places[cache_path]
+
+
+def _save_places(cache_path, places):
+    """
+    Writes the cache atomically so a crash can't leave half a file.
+    Places other processes saved since it was read are merged in first
+    (and into places), so batch workers don't drop each other's lookups.
+    """
+    os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+    for key, place in _read_places(cache_path).items():
+        places.setdefault(key, place)
+    # One temp file per process, batch workers may save at the same time.
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(places, f)
+    os.replace(tmp_path, cache_path)
+
+
+def reverse_geocode(coords, cache_dir=None):
+    """
+    Looks up the nearest place for every (lat, lon) in coords.
+    Returns one dict per coordinate with name, admin1, admin2 and cc.
+    Every coordinate not already cached goes to reverse_geocoder in a single
+    batched search (single process, so no worker pool is started, and the
+    library keeps its KD-tree loaded for the rest of the process).
+    Pass a cache_dir to keep the answers on disk between runs.
+    """
+    keys = [coord_key(lat, lon) for lat, lon in coords]
+    if not keys:
+        return []
+
+    if cache_dir is None:
+        return _lookup(keys, {})
+
+    cache_path = os.path.join(cache_dir, CACHE_FILE)
+    with _places_lock:
+        places = _load_places(cache_path)
+        size = len(places)
+        found = _lookup(keys, places)
+        if len(places) > size:
+            try:
+                _save_places(cache_path, places)
+            except (OSError, TypeError, ValueError) as e:
+                print(f"Could not save the geocode cache: {e}")
+    return found
+
+
+def _lookup(keys, places):
+    """Fills in the places missing for keys with one search, then returns them."""
+    missing = list(dict.fromkeys(key for key in keys if key not in places))
+    if missing:
+        points = [tuple(float(v) for v in key.split(",")) for key in missing]
+        results = rg.search(points, mode=1, verbose=False)
+        for key, result in zip(missing, results):
+            places[key] = {
+                field: result.get(field, "")
+                for field in ("name", "admin1", "admin2", "cc")
+            }
+    return [places[key] for key in keys]
@@ -0,0 +1,220 @@
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+# Instrumentation - where a run spends its time and memory.
+# The hot paths are wrapped in spans (the timed decorator or the span
+# context manager). While instrumentation is off a span is one flag check
+# and a shared do-nothing context, so it can stay in the code. Once
+# enable() is called every span records an event: its name, when it
+# started, how long it took, which thread ran it and any fields added with
+# add() (row counts, bytes read), plus the Python allocation peak with
+# memory=True. The events can be written as JSON or as a Chrome trace
+# (chrome://tracing or https://ui.perfetto.dev).
+# Events are only kept in this process: charts drawn in ChartQueue's worker
+# processes show up as one "render_charts" span, not one per chart.
+
+_enabled = False
+_memory = False
+_origin = 0.0
+_events = []
+
+# One stack of open spans (and of memory peaks) per thread.
+_local = threading.local()
+
+# tracemalloc is process wide: it runs while any memory_peak block is open.
+_tracing_lock = threading.Lock()
+_tracing = {"open": 0, "started": False}
+
+# What span() returns while instrumentation is off. It yields None rather
+# than a dict, which every caller would share: use add() to set fields.
+_NULL_SPAN = nullcontext()
+
+
+def enable(memory=False):
+    """Starts recording events (and with memory, allocation peaks)."""
+    global _enabled, _memory, _origin
+    if not _enabled:
+        _origin = time.perf_counter()
+    _enabled, _memory = True, memory
+
+
+def disable():
+    """Stops recording; the events so far are kept."""
+    global _enabled, _memory
+    _enabled, _memory = False, False
+
+
+def enabled():
+    return _enabled
+
+
+def reset():
+    """Drops the recorded events and restarts the clock."""
+    global _origin
+    _events.clear()
+    _origin = time.perf_counter()
+
+
+def events():
+    """The recorded events, in the order the spans finished."""
+    return list(_events)
+
+
+def _stack(name):
+    stack = getattr(_local, name, None)
+    if stack is None:
+        stack = []
+        setattr(_local, name, stack)
+    return stack
+
+
+@contextmanager
+def memory_peak():
+    """
+    Measures the Python allocation peak of the block: the dict it yields
+    gets peak_mb, in MiB above what was allocated when the block started.
+    Blocks nest (an outer block's peak includes its inner blocks); blocks
+    on other threads at the same time share tracemalloc and so each
+    other's allocations.
+    """
+    with _tracing_lock:
+        if _tracing["open"] == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracing["started"] = True
+        _tracing["open"] += 1
+
+    peaks = _stack("peaks")
+    # The enclosing blocks keep the peak so far, then it starts over here.
+    current, peak = tracemalloc.get_traced_memory()
+    if peaks:
+        peaks[-1][0] = max(peaks[-1][0], peak)
+    tracemalloc.reset_peak()
+    mine = [current]
+    peaks.append(mine)
+    result = {}
+
+    try:
+        yield result
+    finally:
+        peak = max(mine[0], tracemalloc.get_traced_memory()[1])
+        peaks.pop()
+        if peaks:
+            peaks[-1][0] = max(peaks[-1][0], peak)
+        tracemalloc.reset_peak()
+        result["peak_mb"] = round((peak - current) / 2**20, 1)
+
+        with _tracing_lock:
+            _tracing["open"] -= 1
+            if _tracing["open"] == 0 and _tracing["started"]:
+                tracemalloc.stop()
+                _tracing["started"] = False
+
+
+@contextmanager
+def _span(name, fields):
+    event = {"name": name, **fields}
+    spans = _stack("spans")
+    spans.append(event)
+    memory = memory_peak() if _memory else nullcontext({})
+    start = time.perf_counter()
+
+    try:
+        with memory as peak:
+            yield event
+    finally:
+        end = time.perf_counter()
+        spans.pop()
+        event["start"] = round(start - _origin, 6)
+        event["seconds"] = round(end - start, 6)
+        event["thread"] = threading.current_thread().name
+        event["pid"] = os.getpid()
+        if "peak_mb" in peak:
+            event["peak_mb"] = peak["peak_mb"]
+        _events.append(event)
+
+
+def span(name, **fields):
+    """
+    Times the with block as an event called name, with the fields given.
+    The block gets the event dict (None while instrumentation is off), so
+    fill in more fields later with add().
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return _span(name, fields)
+
+
+def add(**fields):
+    """Adds fields (rows, bytes_read...) to this thread's innermost span."""
+    if not _enabled:
+        return
+    spans = _stack("spans")
+    if spans:
+        spans[-1].update(fields)
+
+
+def timed(name=None, rows=False):
+    """
+    Decorator: each call is a span named name (the function's name by
+    default). With rows, the length of what it returns is added as rows.
+    """
+    def decorate(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _span(label, {}) as event:
+                result = fn(*args, **kwargs)
+                if rows and result is not None:
+                    event["rows"] = len(result)
+                return result
+
+        return wrapper
+
+    return decorate
+
+
+def write_json(path):
+    """Writes the events as a JSON list."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(events(), f, indent=2, default=str)
+
+
+def chrome_trace():
+    """The events in Chrome's trace event format (complete "X" events)."""
+    trace = []
+    threads = {}
+    for event in events():
+        tid = threads.setdefault(event["thread"], len(threads) + 1)
+        trace.append({
+            "name": event["name"],
+            "ph": "X",
+            "ts": round(event["start"] * 1e6),
+            "dur": round(event["seconds"] * 1e6),
+            "pid": event["pid"],
+            "tid": tid,
+            "args": {key: value for key, value in event.items()
+                     if key not in ("name", "start", "seconds", "thread", "pid")},
+        })
+
+    # Name the thread lanes.
+    pid = os.getpid()
+    for thread, tid in threads.items():
+        trace.append({"name": "thread_name", "ph": "M", "pid": pid,
+                      "tid": tid, "args": {"name": thread}})
+    return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+
+def write_chrome_trace(path):
+    """Writes the events as a Chrome trace JSON file."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(chrome_trace(), f, default=str)
@@ -1,7 +1,22 @@
+import hashlib
+import json
+import os
+from functools import partial
+import numpy as np
 import pandas as pd
+from src import instrument
+from src.cache import cached_frame
 from src.mappings import road_type_labels, road_class_labels, district_names
+from src.schema import (
+    ACCIDENT_SCHEMA,
+    LINKED_SCHEMA,
+    WEEKDAYS,
+    apply_schema,
+    label_codes,
+)
 
 
+@instrument.timed(rows=True)
 def load_linked_data(filepath, target_indices, index_col="collision_index"):
     """
     Loads a secondary/third CSV file (Vehicles or Casualties) and filters it.
@@ -12,6 +27,8 @@ def load_linked_data(filepath, target_indices, index_col="collision_index"):
     # Optimize: Only load relevant columns if file is huge.
     try:
         df = pd.read_csv(filepath, low_memory=False)
+        if instrument.enabled():
+            instrument.add(bytes_read=os.path.getsize(filepath), rows_read=len(df))
 
         # Standardize the index name if needed.
         if index_col not in df.columns and "accident_index" in df.columns:
@@ -21,20 +38,245 @@ def load_linked_data(filepath, target_indices, index_col="collision_index"):
         filtered_df = df[df[index_col].isin(target_indices)]
 
         # print(f" > Found {len(filtered_df)} related records.")
-        return filtered_df
+        return apply_schema(filtered_df, LINKED_SCHEMA)
 
     except Exception as e:
         print(f"Error loading {filepath}: {e}")
         return pd.DataFrame()  # Return empty if it fails.
 
 
-def load_wy_data(path="data/accidents.csv"):
+def _expand_ranges(starts, stops):
+    """Turns [start, stop) pairs into one flat array of row positions."""
+    lengths = stops - starts
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(lengths.sum())
 
-    # Load the dataset.
-    df = pd.read_csv(path, low_memory=False)
+
+def _read_sorted_linked(filepath, index_col, year_col):
+    """Reads a linked CSV once and sorts it by year, then collision."""
+    df = pd.read_csv(filepath, low_memory=False)
+
+    # Standardize the index and year names if needed.
+    if index_col not in df.columns and "accident_index" in df.columns:
+        df = df.rename(columns={"accident_index": index_col})
+    if year_col not in df.columns and "accident_year" in df.columns:
+        df = df.rename(columns={"accident_year": year_col})
+
+    df = apply_schema(df, LINKED_SCHEMA)
+
+    sort_cols = [c for c in (year_col, index_col) if c in df.columns]
+    return df.sort_values(sort_cols, kind="stable").reset_index(drop=True)
+
+
+class LinkedTableStore:
+    """
+    Keeps a whole Vehicles or Casualties file in memory, sorted by
+    collision_index inside each collision_year, so the rows for any set of
+    collisions are found with a binary search instead of a CSV re-read.
+    """
+
+    def __init__(self, filepath, index_col="collision_index",
+                 year_col="collision_year", cache_dir=None):
+        self.index_col = index_col
+        build = partial(_read_sorted_linked, filepath, index_col, year_col)
+
+        try:
+            if cache_dir is not None:
+                self.frame = cached_frame(
+                    filepath, build, cache_dir,
+                    extra_key=[index_col, year_col])
+            else:
+                self.frame = build()
+        except Exception as e:
+            print(f"Error loading {filepath}: {e}")
+            self.frame = pd.DataFrame(columns=[index_col])
+
+        self._keys = self.frame[index_col].to_numpy()
+
+        # Each year is one contiguous block of rows: year -> (start, stop).
+        # Without a year column the whole file is one block, searched
+        # whatever year is asked for.
+        self._partitions = None
+        if year_col in self.frame.columns and not self.frame.empty:
+            years, starts = np.unique(
+                self.frame[year_col].to_numpy(), return_index=True)
+            stops = np.append(starts[1:], len(self.frame))
+            self._partitions = {
+                int(y): (a, b) for y, a, b in zip(years, starts, stops)}
+
+    def rows_for(self, collision_ids, year=None):
+        """
+        Returns the rows linked to the given collisions, in sorted order.
+        Passing the year only searches that year's block.
+        """
+        return self.frame.iloc[self.positions_for(collision_ids, year)]
+
+    def positions_for(self, collision_ids, year=None):
+        """Row positions (in frame) of the rows linked to the collisions."""
+        ids = np.unique(np.asarray(collision_ids, dtype=self._keys.dtype))
+
+        positions = []
+        for start, stop in self._blocks(year):
+            keys = self._keys[start:stop]
+            lefts = np.searchsorted(keys, ids, side="left")
+            rights = np.searchsorted(keys, ids, side="right")
+            positions.append(_expand_ranges(lefts, rights) + start)
+
+        return np.concatenate(positions)
+
+    def rows_for_year(self, year):
+        """
+        Returns every row recorded against the given collision year
+        (every row, if the file has no year column).
+        """
+        start, stop = self._blocks(year)[0]
+        return self.frame.iloc[start:stop]
+
+    def _blocks(self, year):
+        """The (start, stop) blocks of rows that can hold year's rows."""
+        if self._partitions is None:
+            return [(0, len(self.frame))]
+        if year is None:
+            return list(self._partitions.values())
+        return [self._partitions.get(int(year), (0, 0))]
+
+
+# Label used when a collision happened on a motorway, whatever its layout.
+MOTORWAY_LABEL = "Motorway(Motorway)"
+
+# Only the accident columns the analysis suites, maps and dashboard touch.
+ACCIDENT_COLUMNS = [
+    "collision_index",
+    "collision_year",
+    "location_easting_osgr",
+    "location_northing_osgr",
+    "longitude",
+    "latitude",
+    "police_force",
+    "collision_severity",
+    "number_of_vehicles",
+    "number_of_casualties",
+    "date",
+    "time",
+    "local_authority_district",
+    "local_authority_ons_district",
+    "first_road_class",
+    "road_type",
+    "speed_limit",
+    "light_conditions",
+    "weather_conditions",
+    "road_surface_conditions",
+    "special_conditions_at_site",
+    "urban_or_rural_area",
+]
+
+# Rows read per chunk - this caps peak memory on the national extracts.
+CHUNK_ROWS = 250_000
+
+# Pass as districts to keep every district (the national extract).
+ALL_DISTRICTS = "all"
+
+
+def add_road_labels(df):
+    """
+    Adds road_type, road_class_name and display_road_type as categoricals.
+    Motorway collisions are labelled as such regardless of the road layout.
+    """
+    road_type = label_codes(df["road_type"], road_type_labels)
+    road_class = label_codes(df["first_road_class"], road_class_labels)
+
+    # The smart label - swap in the motorway label wherever the class says so.
+    categories = road_type.categories.tolist()
+    if MOTORWAY_LABEL not in categories:
+        categories.append(MOTORWAY_LABEL)
+    is_motorway = np.asarray(road_class == "Motorway")
+    display_codes = np.where(
+        is_motorway, categories.index(MOTORWAY_LABEL), road_type.codes)
+
+    df["road_type"] = road_type
+    df["road_class_name"] = road_class
+    df["display_road_type"] = pd.Categorical.from_codes(
+        display_codes, categories=categories)
+
+    return df
+
+
+def read_district_rows(path, districts, chunksize=CHUNK_ROWS):
+    """
+    Streams the accidents CSV in chunks and keeps only the rows in the
+    given districts, so nothing else is ever parsed or held in memory.
+    districts=ALL_DISTRICTS keeps every row.
+    """
+    wanted_columns = set(ACCIDENT_COLUMNS)
+    keep_all = districts == ALL_DISTRICTS
+    wanted_districts = [] if keep_all else list(districts)
+
+    kept = []
+    for chunk in pd.read_csv(
+        path,
+        usecols=lambda col: col in wanted_columns,
+        dtype={"local_authority_ons_district": str},
+        chunksize=chunksize,
+    ):
+        if keep_all:
+            kept.append(chunk)
+            continue
+        in_area = chunk["local_authority_ons_district"].isin(wanted_districts)
+        kept.append(chunk[in_area])
+
+    df = pd.concat(kept) if kept else pd.DataFrame(columns=ACCIDENT_COLUMNS)
+    if df.empty:
+        # No rows to infer types from: use the ones a read with rows gives.
+        types = {"latitude": "float64", "longitude": "float64", **ACCIDENT_SCHEMA}
+        df = df.astype({col: types[col] for col in df.columns if col in types})
+    return df
+
+
+def _accidents_cache_name(selection):
+    """
+    Cache name of one district selection, so the West Yorkshire and the
+    national caches of the same CSV don't replace each other.
+    """
+    if selection == ALL_DISTRICTS:
+        return "accidents-all"
+    if selection == sorted(district_names):
+        return "accidents"
+    digest = hashlib.sha256(json.dumps(selection).encode()).hexdigest()
+    return f"accidents-{digest[:8]}"
+
+
+@instrument.timed(rows=True)
+def load_wy_data(path="data/accidents.csv", cache_dir=None, districts=None,
+                 chunksize=CHUNK_ROWS):
+    """
+    Loads and cleans the accidents CSV for West Yorkshire (or the given
+    districts, or ALL_DISTRICTS for the whole country).
+    Pass a cache_dir to reuse the cleaned frame between runs.
+    """
+    if districts is None:
+        districts = district_names
+
+    if cache_dir is not None:
+        selection = (districts if districts == ALL_DISTRICTS
+                     else sorted(districts))
+        return cached_frame(
+            path,
+            partial(load_wy_data, path, districts=districts,
+                    chunksize=chunksize),
+            cache_dir,
+            name=_accidents_cache_name(selection),
+            extra_key=selection,
+        )
+
+    # Load only the district rows - everything below runs on this subset.
+    df = read_district_rows(path, districts, chunksize)
+    if instrument.enabled():
+        instrument.add(bytes_read=os.path.getsize(path))
 
     # Extract useful components from the date.
-    df["date"] = pd.to_datetime(df["date"], errors="coerce")
+    # STATS19 dates are day first (21/05/2024) - say so rather than guess,
+    # the guess depends on whichever row happens to come first.
+    df["date"] = pd.to_datetime(df["date"], dayfirst=True, errors="coerce")
 
     # This removes any row where the date couldn't be parsed (NAT ones)
     df = df.dropna(subset=["date"])
@@ -42,7 +284,8 @@ def load_wy_data(path="data/accidents.csv"):
     # Extract useful components from the year/month/day name.
     df["year"] = df["date"].dt.year  # type:ignore
     df["month"] = df["date"].dt.month  # type:ignore
-    df["day_name"] = df["date"].dt.day_name()  # type:ignore
+    df["day_name"] = pd.Categorical.from_codes(
+        df["date"].dt.dayofweek, categories=WEEKDAYS, ordered=True)
 
     # Clean the 'time' column and extract the hour of the day.
     # Some rows may be missing or have malformed info. so we use errors='coerce'
@@ -55,24 +298,12 @@ def load_wy_data(path="data/accidents.csv"):
     # Remove rows where latitude or longitude is missing.
     df = df.dropna(subset=["latitude", "longitude"])
 
-    # human readable string across the whole dataset.
-    df["road_type"] = df["road_type"].map(road_type_labels)
-
-    # Map the road class (The rank)
-    df["road_class_name"] = df["first_road_class"].map(road_class_labels)
-
-    # Create the smart label - combining class and type of road.
-    def identify_road(row):
-        if row["road_class_name"] == "Motorway":
-            # This turns Dual Carriageway into Motorway(Dual Carriageway)
-            return "Motorway(Motorway)"
-        else:
-            return row["road_type"]
-
-    df["display_road_type"] = df.apply(identify_road, axis=1)
+    # Attach the readable road labels (vectorised, categorical).
+    df = add_road_labels(df)
 
-    # Apply filter to clean the new filtered data.
-    df_filtered = df[df["local_authority_ons_district"].isin(district_names)]
+    # Rows outside the districts were already dropped while reading.
+    # Shrink the coded columns to int8/int16 and categories.
+    df_filtered = apply_schema(df, ACCIDENT_SCHEMA)
 
     # How many motorways are in West Yorkshire.
     wy_motorways = len(df_filtered[df_filtered["first_road_class"] == 1])
@@ -0,0 +1,514 @@
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import nullcontext
+from src import instrument
+from src.cache import (
+    CACHE_VERSION,
+    DEFAULT_CACHE_DIR,
+    file_fingerprint,
+    mappings_fingerprint,
+)
+from src.load_data import get_data_period
+from src.charts import (
+    CHART_FOLDER,
+    DEFAULT_REGION,
+    ChartQueue,
+    generate_blackspots_chart,
+)
+
+# The analysis as a graph of stages: load -> blackspots -> charts -> report,
+# with the vehicles and casualties loaded next to blackspots and the map
+# hanging off blackspots. Every stage reads what the stages it requires
+# produced and adds its own outputs to a shared state dict. Stages whose
+# requirements are done run side by side on threads (the CSV reads and the
+# map write mostly wait on I/O; the charts are drawn in worker processes by
+# ChartQueue). The outputs can be saved to an artefact folder, so a later
+# run of one stage picks up where the last run left off instead of starting
+# from the CSVs.
+
+# Where the stage outputs and the timing report are kept between runs.
+ARTEFACT_DIR = os.path.join(DEFAULT_CACHE_DIR, "pipeline")
+TIMINGS_FILE = "timings.json"
+
+# Stages run at the same time by default (threads, see run_stages).
+DEFAULT_STAGE_WORKERS = 4
+
+# Everything a run can be configured with (see run_stages).
+DEFAULT_SETTINGS = {
+    "accidents_path": "data/accidents.csv",
+    "vehicles_path": "data/vehicles.csv",
+    "casualties_path": "data/casualties.csv",
+    "output_dir": CHART_FOLDER,
+    "cache_dir": None,
+    "region": None,
+    "chart_workers": None,
+    "map_path": "collision_map.html",
+    "open_browser": True,
+    "top_n": 5,
+    # A folder of running blackspot totals (see blackspot_state); when set,
+    # the blackspots stage folds in only the collisions after the last run.
+    "blackspot_state": None,
+}
+
+# Settings that change how a run goes, not what it makes - changing them
+# keeps the saved artefacts.
+RUN_ONLY_SETTINGS = ("chart_workers", "open_browser")
+
+# The saved outputs' fingerprint file, next to the artefacts (see artefact_key).
+FINGERPRINT_FILE = "{stage}.fingerprint"
+
+
+class StageError(Exception):
+    """A stage can't run (no data, or an unknown stage name)."""
+
+
+# Imports sit inside the stages so loading this module (and the CLI) stays
+# quick; folium, fpdf, scipy and matplotlib only load once a stage needs them.
+
+def load_stage(state, settings):
+    """Loads the West Yorkshire accidents."""
+    from src.load_data import load_wy_data
+
+    #print("Loading West Yorkshire collison data...")
+    df = load_wy_data(settings["accidents_path"], cache_dir=settings["cache_dir"])
+
+    if df is None or df.empty:
+        raise StageError("No data loaded. Please check the file path.")
+    return {"df": df}
+
+
+def _linked_stage(table):
+    """A stage loading the vehicles or casualties linked to the accidents."""
+    def linked_stage(state, settings):
+        from src.load_data import load_linked_data
+
+        # Link the new files to run after the main accidents csv file.
+        wy_indices = state["df"]['collision_index'].unique()
+        return {f"{table}_df": load_linked_data(settings[f"{table}_path"], wy_indices)}
+
+    linked_stage.__doc__ = f"Loads the {table} linked to the accidents."
+    return linked_stage
+
+
+def blackspots_stage(state, settings):
+    """The top blackspots (a list of dictionaries) and the data period."""
+    from src.analysis.blackspot_state import refresh_blackspots
+    from src.analysis.blackspots import identify_blackspots
+
+    df = state["df"]
+
+    # Get the duration.
+    data_duration = get_data_period(df)
+    #print(f"Analyzing data from: {data_duration}")
+
+    # This now returns a list of dictionaries.
+    if settings["blackspot_state"]:
+        hotspots = refresh_blackspots(
+            df, settings["blackspot_state"], top_n=settings["top_n"],
+            cache_dir=settings["cache_dir"])
+    else:
+        hotspots = identify_blackspots(
+            df, top_n=settings["top_n"], cache_dir=settings["cache_dir"])
+
+    # Print the results for verification.
+    #print("\n" + "😊" * 17)
+    #print("🌍 OFFLINE GEO-LOOKUP SUCCESSFUL")
+    #print("" + "😊" * 17)
+
+    for i, spot in enumerate(hotspots, 1):
+        #print(f"{i}. {spot['site_label']} | {spot['road_type']})")
+        #print(f"   Coords: {spot['latitude']}, {spot['longitude']}")
+        #print(f"   Total Incidents: {spot['count']}")
+        print("-" * 30)
+
+    return {"hotspots": hotspots, "data_duration": data_duration}
+
+
+def charts_stage(state, settings):
+    """Runs the analysis suites, draws their charts and the summary lines."""
+    from src.analysis.geography import run_geographical_suite
+    from src.analysis.environmental import run_environmental_suite
+    from src.analysis.infrastructure import run_infrastructure_suite
+    from src.analysis.temporal import run_temporal_suite
+    from src.analysis.summary_analysis import run_comprehensive_summary
+    from src.analysis.aggregates import aggregate_collisions
+    from src.analysis.demographics import run_demographic_suite
+
+    df, vehicles_df = state["df"], state["vehicles_df"]
+    output_dir = settings["output_dir"]
+    # The area named in the chart titles.
+    region = settings["region"] or DEFAULT_REGION
+
+    # Execute analysis suites. Print charts to folder.
+    #print("Running full analysis suites(Saving charts to folder)...")
+    # Every count the suites chart, worked out in one pass.
+    aggregates = aggregate_collisions(df)
+
+    # The charts are queued and drawn in parallel when the block ends.
+    with ChartQueue(workers=settings["chart_workers"], folder=output_dir) as charts:
+        run_geographical_suite(df, aggregates, region)
+        run_temporal_suite(df, aggregates, region)
+        run_infrastructure_suite(df, aggregates, region)
+        run_environmental_suite(df, aggregates, region)
+        run_demographic_suite(vehicles_df, state["casualties_df"], region)
+
+        # Print the 5 accident blackspots chart.
+        generate_blackspots_chart(
+            df, output_dir, hotspots_data=state["hotspots"],
+            data_duration=state["data_duration"], region=region)
+
+        # Run the summary
+        report_content = run_comprehensive_summary(
+            df, vehicles_df, aggregates, region)
+
+    # Insert the duration into the list for the PDF.
+    report_content.insert(0, f"Analysis Period: {state['data_duration']}")
+    report_content.insert(1, "") # Add a blank space for better look on pdf.
+
+    # Every chart of this run has a record; one without a size wasn't saved.
+    missing = [chart["path"] for chart in charts.records if chart["bytes"] is None]
+    paths = charts.paths
+
+    #print("-" * 30)
+    #print(f"📊 FINAL SANITY CHECK:")
+    #print(f"Total Charts Made:    {len(paths)}")
+    #print(f"Total Charts Missing: {len(missing)}")
+    #print("-" * 30)
+
+    if missing or len(set(paths)) < len(paths):
+        print("⚠️ WARNING: Some charts are missing. Check for duplicate titles!")
+    else:
+        print("✅ All systems go! The folder is full.")
+
+    return {"charts": charts.records, "report_content": report_content}
+
+
+def map_stage(state, settings):
+    """Saves the interactive map (and opens it in the browser)."""
+    from src.analysis.mapping import generate_severity_map
+
+    # Print Folium map - this will open in the browser.
+    print("Generating Interactive Map...")
+    generate_severity_map(
+        state["df"], blackspots=state["hotspots"],
+        output_path=settings["map_path"], cache_dir=settings["cache_dir"],
+        open_browser=settings["open_browser"])
+    return {"map_path": settings["map_path"]}
+
+
+def report_stage(state, settings):
+    """Builds the PDF from the summary lines, blackspots and chart records."""
+    from src.analysis.report_generator import (
+        REPORT_IMAGE_DPI,
+        generate_pdf_report,
+        report_filename,
+    )
+
+    # Generate the PDF file from this run's charts.
+    generate_pdf_report(
+        state["report_content"], hotspots_list=state["hotspots"],
+        chart_folder=settings["output_dir"], charts=state["charts"],
+        image_dpi=REPORT_IMAGE_DPI, region=settings["region"])
+    return {"report_path": os.path.join(
+        settings["output_dir"], report_filename(settings["region"]))}
+
+
+# Stage name -> (stages it needs, outputs it adds to the state, function).
+STAGES = {
+    "load": ((), ("df",), load_stage),
+    "vehicles": (("load",), ("vehicles_df",), _linked_stage("vehicles")),
+    "casualties": (("load",), ("casualties_df",), _linked_stage("casualties")),
+    "blackspots": (("load",), ("hotspots", "data_duration"), blackspots_stage),
+    "charts": (("load", "vehicles", "casualties", "blackspots"),
+               ("charts", "report_content"), charts_stage),
+    "map": (("load", "blackspots"), ("map_path",), map_stage),
+    "report": (("blackspots", "charts"), ("report_path",), report_stage),
+}
+
+
+def plan_stages(targets, reusable):
+    """
+    The stages to go through, in order, as (stage, "run" or "reuse").
+    A stage that isn't a target is reused when reusable(stage) says its
+    outputs are at hand - then the stages it needs aren't needed either.
+    """
+    plan = {}
+
+    def visit(name):
+        if name not in STAGES:
+            raise StageError(
+                f"Unknown stage {name!r}, expected one of {list(STAGES)}")
+        if name in plan:
+            return
+        if name not in targets and reusable(name):
+            plan[name] = "reuse"
+            return
+        for required in STAGES[name][0]:
+            visit(required)
+        plan[name] = "run"
+
+    for target in targets:
+        visit(target)
+    return list(plan.items())
+
+
+def artefact_key(settings):
+    """
+    Fingerprint of what stage outputs are made from: the source CSVs, the
+    label mappings and the settings (the same parts as cache.cache_key).
+    """
+    sources = {}
+    for table in ("accidents_path", "vehicles_path", "casualties_path"):
+        try:
+            sources[table] = file_fingerprint(settings[table])
+        except OSError:
+            sources[table] = None
+    options = {key: value for key, value in settings.items()
+               if key not in RUN_ONLY_SETTINGS}
+    payload = json.dumps(
+        [CACHE_VERSION, mappings_fingerprint(), sources, options],
+        sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def save_artefacts(folder, stage, outputs, fingerprint=None):
+    """
+    Saves a stage's outputs: frames as pickles, the rest as JSON, and the
+    artefact_key they were made with.
+    """
+    os.makedirs(folder, exist_ok=True)
+    for key, value in outputs.items():
+        path = os.path.join(folder, f"{stage}.{key}")
+        # Temp file, then rename, so a crash never leaves half an artefact.
+        if hasattr(value, "to_pickle"):
+            value.to_pickle(path + ".pkl.tmp")
+            os.replace(path + ".pkl.tmp", path + ".pkl")
+        else:
+            with open(path + ".json.tmp", "w", encoding="utf-8") as f:
+                json.dump(value, f, default=str)
+            os.replace(path + ".json.tmp", path + ".json")
+
+    if fingerprint is not None:
+        path = os.path.join(folder, FINGERPRINT_FILE.format(stage=stage))
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(fingerprint)
+        os.replace(path + ".tmp", path)
+
+
+def _artefact_path(folder, stage, key):
+    """The saved file of one output (None if it was never saved)."""
+    for ext in (".pkl", ".json"):
+        path = os.path.join(folder, f"{stage}.{key}{ext}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def has_artefacts(folder, stage, key=None):
+    """
+    Whether every output of the stage was saved - and, given a key, saved
+    from the same data and settings (see artefact_key).
+    """
+    if folder is None or not all(
+            _artefact_path(folder, stage, output) for output in STAGES[stage][1]):
+        return False
+    return key is None or saved_key(folder, stage) == key
+
+
+def saved_key(folder, stage):
+    """The artefact_key a stage's outputs were saved with (None if unknown)."""
+    try:
+        with open(os.path.join(folder, FINGERPRINT_FILE.format(stage=stage)),
+                  encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def load_artefacts(folder, stage):
+    """A stage's saved outputs, or None if any of them is missing."""
+    import pandas as pd
+
+    outputs = {}
+    for key in STAGES[stage][1]:
+        path = _artefact_path(folder, stage, key)
+        if path is None:
+            return None
+        if path.endswith(".pkl"):
+            outputs[key] = pd.read_pickle(path)
+        else:
+            with open(path, encoding="utf-8") as f:
+                outputs[key] = json.load(f)
+    return outputs
+
+
+def _max_rss_mb():
+    """Peak resident memory of the process so far (None where unsupported)."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    # ru_maxrss is in KiB on Linux.
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def _run_stage(stage, action, state, settings, artefact_dir, trace_memory,
+               key=None):
+    """
+    Runs or reuses one stage against a snapshot of the state.
+    Returns its outputs and its timing (see run_stages).
+    """
+    start = time.perf_counter()
+    memory = instrument.memory_peak() if trace_memory else nullcontext({})
+
+    with memory as peak, instrument.span(f"stage {stage}", action=action):
+        if action == "reuse" and all(key in state for key in STAGES[stage][1]):
+            produced, source = {}, "state"
+        elif action == "reuse":
+            produced, source = load_artefacts(artefact_dir, stage), "artefact"
+        else:
+            produced = STAGES[stage][2](state, settings)
+            if artefact_dir is not None:
+                save_artefacts(artefact_dir, stage, produced, key)
+            source = "run"
+
+    end = time.perf_counter()
+    return produced, {
+        "stage": stage,
+        "source": source,
+        "seconds": round(end - start, 4),
+        "start": start,
+        "end": end,
+        "process_peak_rss_mb": _max_rss_mb(),
+        "peak_traced_mb": peak.get("peak_mb"),
+    }
+
+
+def critical_path_seconds(timings):
+    """
+    The longest chain of stages through the graph, in seconds: the least
+    wall time the run could take with enough workers.
+    """
+    seconds = {timing["stage"]: timing["seconds"] for timing in timings}
+    finish = {}
+    # The timings are in plan order, so a stage's requirements come first.
+    for stage in seconds:
+        before = [finish[r] for r in STAGES[stage][0] if r in finish]
+        finish[stage] = seconds[stage] + max(before, default=0)
+    return round(max(finish.values(), default=0), 4)
+
+
+def run_stages(targets, settings=None, state=None, artefact_dir=None,
+               timings_path=None, trace_memory=False, workers=None):
+    """
+    Runs the target stages, and whatever they need first.
+    A needed stage that isn't a target is taken from state, or from the
+    artefact folder when it was saved there from the same CSVs and
+    settings (artefact_key), and only run if neither has it (see
+    plan_stages). Every stage that runs is saved to artefact_dir (when
+    given).
+    Up to workers stages (DEFAULT_STAGE_WORKERS) run at once, each as soon
+    as the stages it needs are done. Each stage sees only what was done
+    before it started and the results are merged in plan order, so the
+    outputs are the same as a serial run. trace_memory runs one stage at a
+    time, since tracemalloc can't tell concurrent stages apart.
+    Returns (state, timings): one dict per stage, in plan order, with the
+    seconds taken, when it started and ended (seconds into the run), where
+    its outputs came from ("run", "artefact" or "state"), the process's
+    peak RSS so far (process_peak_rss_mb - the whole process, not just this
+    stage) and, with trace_memory, the stage's Python allocation peak. The
+    timings, the wall time and the critical path are also written to
+    timings_path as JSON.
+    """
+    settings = {**DEFAULT_SETTINGS, **(settings or {})}
+    state = dict(state or {})
+    workers = 1 if trace_memory else max(workers or DEFAULT_STAGE_WORKERS, 1)
+
+    def in_state(stage):
+        return all(key in state for key in STAGES[stage][1])
+
+    key = artefact_key(settings) if artefact_dir is not None else None
+
+    def reusable(stage):
+        if in_state(stage) or has_artefacts(artefact_dir, stage, key):
+            return True
+        if has_artefacts(artefact_dir, stage):
+            print(f"Saved {stage} outputs are out of date "
+                  f"(the data or settings changed), running it again.")
+        return False
+
+    plan = plan_stages(targets, reusable)
+    planned = dict(plan)
+    results = {}
+    began = time.perf_counter()
+
+    def ready(stage):
+        return all(r in results for r in STAGES[stage][0] if r in planned)
+
+    def start(pool, stage):
+        snapshot = dict(state)
+        for done in results.values():
+            snapshot.update(done[0])
+        return pool.submit(_run_stage, stage, planned[stage], snapshot,
+                           settings, artefact_dir, trace_memory, key)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        running = {}
+        while len(results) < len(plan):
+            for stage, _ in plan:
+                if stage not in results and stage not in running.values() and ready(stage):
+                    running[start(pool, stage)] = stage
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                # A failed stage raises here; the pool lets the others finish.
+                results[running.pop(future)] = future.result()
+
+    timings = []
+    for stage, _ in plan:
+        produced, timing = results[stage]
+        state.update(produced)
+        timing["start"] = round(timing["start"] - began, 4)
+        timing["end"] = round(timing["end"] - began, 4)
+        timings.append(timing)
+
+    if timings_path is not None:
+        os.makedirs(os.path.dirname(timings_path) or ".", exist_ok=True)
+        with open(timings_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "targets": list(targets),
+                "workers": workers,
+                "wall_seconds": round(time.perf_counter() - began, 4),
+                "critical_path_seconds": critical_path_seconds(timings),
+                "stages": timings,
+            }, f, indent=2)
+
+    return state, timings
+
+
+def run_analysis(df, vehicles_df, casualties_df, output_dir=CHART_FOLDER,
+                 cache_dir=None, region=None, chart_workers=None,
+                 map_path="collision_map.html", open_browser=True,
+                 stage_workers=None):
+    """
+    Runs everything after the data is loaded: blackspots, the analysis
+    suites and their charts, the map and the PDF report.
+    Charts and the PDF go to output_dir. Returns the chart records.
+    """
+    state, _ = run_stages(
+        ["blackspots", "charts", "map", "report"],
+        settings={
+            "output_dir": output_dir,
+            "cache_dir": cache_dir,
+            "region": region,
+            "chart_workers": chart_workers,
+            "map_path": map_path,
+            "open_browser": open_browser,
+        },
+        state={"df": df, "vehicles_df": vehicles_df,
+               "casualties_df": casualties_df},
+        workers=stage_workers,
+    )
+    return state["charts"]
@@ -0,0 +1,196 @@
+import numpy as np
+import pandas as pd
+
+# Compact dtypes for the STATS19 tables.
+# The coded columns are small integers (mostly -1 to 99) so int8/int16 holds
+# them, and the repeated strings (districts, makes, LSOAs) become categories.
+
+ACCIDENT_SCHEMA = {
+    "collision_year": "int16",
+    "collision_ref_no": "int32",
+    "location_easting_osgr": "int32",
+    "location_northing_osgr": "int32",
+    "police_force": "int16",
+    "collision_severity": "int8",
+    "number_of_vehicles": "int16",
+    "number_of_casualties": "int16",
+    "local_authority_district": "int16",
+    "local_authority_ons_district": "category",
+    "first_road_class": "int8",
+    "speed_limit": "int16",
+    "light_conditions": "int8",
+    "weather_conditions": "int8",
+    "road_surface_conditions": "int8",
+    "special_conditions_at_site": "int8",
+    "urban_or_rural_area": "int8",
+    # Columns derived in load_wy_data.
+    "year": "int16",
+    "month": "int8",
+    "hour": "int8",
+}
+
+VEHICLE_SCHEMA = {
+    "collision_year": "int16",
+    "collision_ref_no": "int32",
+    "vehicle_reference": "int16",
+    "vehicle_type": "int8",
+    "towing_and_articulation": "int8",
+    "vehicle_manoeuvre_historic": "int8",
+    "vehicle_manoeuvre": "int8",
+    "vehicle_direction_from": "int8",
+    "vehicle_direction_to": "int8",
+    "vehicle_location_restricted_lane_historic": "int8",
+    "vehicle_location_restricted_lane": "int8",
+    "junction_location": "int8",
+    "skidding_and_overturning": "int8",
+    "hit_object_in_carriageway": "int8",
+    "vehicle_leaving_carriageway": "int8",
+    "hit_object_off_carriageway": "int8",
+    "first_point_of_impact": "int8",
+    "vehicle_left_hand_drive": "int8",
+    "journey_purpose_of_driver_historic": "int8",
+    "journey_purpose_of_driver": "int8",
+    "sex_of_driver": "int8",
+    "age_of_driver": "int16",
+    "age_band_of_driver": "int8",
+    "engine_capacity_cc": "int32",
+    "propulsion_code": "int8",
+    "age_of_vehicle": "int16",
+    "generic_make_model": "category",
+    "driver_imd_decile": "int8",
+    "lsoa_of_driver": "category",
+    "escooter_flag": "int8",
+    "driver_distance_banding": "int8",
+}
+
+CASUALTY_SCHEMA = {
+    "collision_year": "int16",
+    "collision_ref_no": "int32",
+    "vehicle_reference": "int16",
+    "casualty_reference": "int16",
+    "casualty_class": "int8",
+    "sex_of_casualty": "int8",
+    "age_of_casualty": "int16",
+    "age_band_of_casualty": "int8",
+    "casualty_severity": "int8",
+    "pedestrian_location": "int8",
+    "pedestrian_movement": "int8",
+    "car_passenger": "int8",
+    "bus_or_coach_passenger": "int8",
+    "pedestrian_road_maintenance_worker": "int8",
+    "casualty_type": "int8",
+    "casualty_imd_decile": "int8",
+    "lsoa_of_casualty": "category",
+    "enhanced_casualty_severity": "int8",
+    "casualty_injury_based": "int8",
+    "casualty_adjusted_severity_serious": "float32",
+    "casualty_adjusted_severity_slight": "float32",
+    "casualty_distance_banding": "int8",
+}
+
+# The linked loaders don't know which file they were given.
+LINKED_SCHEMA = {**VEHICLE_SCHEMA, **CASUALTY_SCHEMA}
+
+# Ordered weekday labels (Monday = 0, the same as dt.dayofweek).
+WEEKDAYS = [
+    "Monday",
+    "Tuesday",
+    "Wednesday",
+    "Thursday",
+    "Friday",
+    "Saturday",
+    "Sunday",
+]
+
+
+def label_codes(codes, labels):
+    """
+    Translates numeric codes into a categorical of readable labels.
+    Codes missing from the labels become NaN, the same as Series.map.
+    """
+    categories = list(dict.fromkeys(labels.values()))
+
+    # Position of each code's label in the categories (labels can repeat).
+    # The trailing -1 is picked up by codes that aren't in the table.
+    label_positions = np.array(
+        [categories.index(v) for v in labels.values()] + [-1])
+
+    # Hash lookup of every code at once, -1 means "not in the table".
+    found = pd.Index(list(labels.keys())).get_indexer(np.asarray(codes))
+
+    return pd.Categorical.from_codes(
+        label_positions[found], categories=categories)
+
+
+def compact_column(series, dtype):
+    """
+    Casts one column to its compact dtype.
+    Integers with gaps use the nullable version (Int8), and anything that
+    doesn't fit (text codes, out of range values) is left alone.
+    """
+    if dtype == "category":
+        return series.astype("category")
+
+    if not pd.api.types.is_numeric_dtype(series):
+        return series
+
+    if dtype.startswith("float"):
+        return series.astype(dtype)
+
+    values = series.dropna()
+    limits = np.iinfo(dtype)
+    if not values.empty and (
+        values.min() < limits.min
+        or values.max() > limits.max
+        or (values % 1 != 0).any()
+    ):
+        return series
+
+    if len(values) < len(series):
+        dtype = dtype.capitalize()
+
+    return series.astype(dtype)
+
+
+def apply_schema(df, schema):
+    """Casts every column of df that appears in the schema."""
+    # Shallow copy - columns are swapped, the caller's frame isn't touched.
+    df = df.copy(deep=False)
+    for col, dtype in schema.items():
+        if col in df.columns and str(df[col].dtype) != dtype:
+            df[col] = compact_column(df[col], dtype)
+    return df
+
+
+def frame_bytes(df):
+    """Total memory used by a frame, strings included."""
+    return int(df.memory_usage(deep=True).sum())
+
+
+def memory_report(before, after):
+    """
+    Compares the per-column memory of a frame before and after the schema.
+    Returns a table sorted by the biggest saving, with a TOTAL row.
+    """
+    report = pd.DataFrame({
+        "dtype_before": before.dtypes.astype(str),
+        "dtype_after": after.dtypes.astype(str),
+        "bytes_before": before.memory_usage(deep=True, index=False),
+        "bytes_after": after.memory_usage(deep=True, index=False),
+    }).dropna(subset=["bytes_before", "bytes_after"])
+
+    report["bytes_before"] = report["bytes_before"].astype("int64")
+    report["bytes_after"] = report["bytes_after"].astype("int64")
+    report["saved"] = report["bytes_before"] - report["bytes_after"]
+    report = report.sort_values("saved", ascending=False)
+
+    report.loc["TOTAL"] = [
+        "",
+        "",
+        report["bytes_before"].sum(),
+        report["bytes_after"].sum(),
+        report["saved"].sum(),
+    ]
+    report["ratio"] = report["bytes_before"] / report["bytes_after"]
+
+    return report
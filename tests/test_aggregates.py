@@ -0,0 +1,124 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from unittest.mock import patch
+from src.analysis.aggregates import (
+    aggregate_collisions,
+    code_counts,
+    district_severity,
+)
+from src.analysis.summary_analysis import run_comprehensive_summary
+from src.analysis.temporal import run_temporal_suite
+from src.load_data import load_wy_data
+from src.mappings import (
+    district_names,
+    severity_labels,
+    special_labels,
+    urban_rural_labels,
+    weather_labels,
+)
+
+ACCIDENTS_CSV = os.path.join(
+    os.path.dirname(__file__), "..", "data", "accidents.csv")
+
+
+@pytest.fixture(scope="module")
+def collisions():
+    return load_wy_data(ACCIDENTS_CSV)
+
+
+@pytest.fixture(scope="module")
+def aggregates(collisions):
+    return aggregate_collisions(collisions)
+
+
+def _same_counts(result, expected):
+    """Same counts per label, biggest first (ties may swap places)."""
+    assert result.to_dict() == expected.to_dict()
+    assert result.is_monotonic_decreasing
+
+
+def test_ordered_counts_match_value_counts(collisions, aggregates):
+    for name in ("hour", "month", "speed_limit"):
+        expected = collisions[name].value_counts().sort_index()
+        assert aggregates[name].tolist() == expected.tolist()
+        assert aggregates[name].index.tolist() == expected.index.tolist()
+
+    expected = collisions["day_name"].value_counts().reindex(
+        aggregates["weekday"].index)
+    assert aggregates["weekday"].tolist() == expected.tolist()
+
+
+@pytest.mark.parametrize("name, column, labels", [
+    ("weather", "weather_conditions", weather_labels),
+    ("special", "special_conditions_at_site", special_labels),
+    ("urban_rural", "urban_or_rural_area", urban_rural_labels),
+    ("severity", "collision_severity", severity_labels),
+])
+def test_labelled_counts_match_map_value_counts(
+        collisions, aggregates, name, column, labels):
+    _same_counts(aggregates[name], collisions[column].map(labels).value_counts())
+
+
+def test_road_type_counts_match(collisions, aggregates):
+    expected = collisions["display_road_type"].value_counts()
+    _same_counts(aggregates["road_type"], expected[expected > 0])
+
+
+def test_district_severity_matches_crosstab(collisions, aggregates):
+    expected = pd.crosstab(
+        collisions["local_authority_ons_district"].map(district_names),
+        collisions["collision_severity"].map(severity_labels),
+    )[["Fatal", "Serious", "Slight"]]
+
+    result = aggregates["district_severity"]
+    assert result.index.tolist() == expected.index.tolist()
+    assert result.columns.tolist() == expected.columns.tolist()
+    np.testing.assert_array_equal(result.to_numpy(), expected.to_numpy())
+
+
+def test_district_severity_keeps_unnamed_district_codes():
+    df = pd.DataFrame({
+        "local_authority_ons_district": ["E08000035", "E07000001", "E07000001"],
+        "collision_severity": [3, 2, 3],
+    })
+
+    result = district_severity(df)
+
+    assert sorted(result.index) == ["E07000001", "Leeds"]
+    assert result.loc["E07000001"].tolist() == [1, 1]
+    assert result.loc["Leeds"].tolist() == [0, 1]
+
+
+def test_summary_from_aggregates_matches_full_scan(collisions, aggregates):
+    vehicles = pd.DataFrame(
+        {"sex_of_driver": [1, 1, 2], "generic_make_model": ["A", "A", "B"]})
+
+    with patch("src.analysis.summary_analysis.pie_chart"):
+        result = run_comprehensive_summary(
+            collisions, vehicles, aggregates=aggregates)
+
+    # The figures a scan of the frame itself gives.
+    motorway = (collisions["first_road_class"] == 1).sum()
+    weather = weather_labels[collisions["weather_conditions"].mode()[0]]
+    severity = collisions["collision_severity"].map(severity_labels)
+    assert f"TOTAL DATASET: {len(collisions)} records" in result[0]
+    assert f"MOTORWAY SCOPE: {motorway} incidents" in result[1]
+    assert f"Predominant Weather: {weather}" in result[8]
+    for label, count in severity.value_counts().items():
+        assert f" - {label}: {count}" in result
+
+
+def test_suite_passes_precomputed_counts(aggregates):
+    with patch("src.analysis.temporal.bar_chart") as mock_chart:
+        run_temporal_suite(None, aggregates=aggregates)
+
+    assert mock_chart.call_args_list[0].args[0] is aggregates["hour"]
+    assert mock_chart.call_count == 3
+
+
+def test_code_counts_skips_missing_and_negative_codes():
+    counts = code_counts(pd.Series([-1, 3, 3, None, 30], dtype="Int16"))
+
+    assert counts.to_dict() == {-1: 1, 3: 2, 30: 1}
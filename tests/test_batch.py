@@ -0,0 +1,153 @@
+import os
+from concurrent.futures import Future
+import numpy as np
+import pandas as pd
+import pytest
+from unittest.mock import patch
+from benchmarks.synthetic import generate
+from src.batch import (
+    _run_parallel,
+    partition_regions,
+    run_batch,
+    share_frame,
+    take_rows,
+)
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+
+
+def _collisions():
+    return pd.DataFrame({
+        "collision_index": ["a", "b", "c", "d", "e"],
+        "police_force": [13, 4, 13, 13, 4],
+        "local_authority_ons_district": pd.Categorical(
+            ["E08000035", "E06000008", "E08000032", "E08000035", "E06000008"]),
+        "collision_severity": np.array([3, 2, 3, 1, 3], dtype="int8"),
+    })
+
+
+def test_partition_by_police_force_biggest_first():
+    regions = partition_regions(_collisions(), by="police_force")
+
+    assert list(regions) == ["Police Force 13", "Police Force 4"]
+    assert regions["Police Force 13"].tolist() == [0, 2, 3]
+    assert regions["Police Force 4"].tolist() == [1, 4]
+
+
+def test_partition_by_district_uses_district_names():
+    regions = partition_regions(_collisions(), by="local_authority_ons_district")
+
+    assert regions["Leeds"].tolist() == [0, 3]
+    assert regions["Bradford"].tolist() == [2]
+    # No name for it in the mappings, so the code is used.
+    assert regions["E06000008"].tolist() == [1, 4]
+
+
+def test_partition_by_named_groups_of_districts():
+    regions = partition_regions(
+        _collisions(), by={"West Yorkshire": ["E08000035", "E08000032"],
+                           "Nowhere": ["X"]})
+
+    assert list(regions) == ["West Yorkshire"]
+    assert regions["West Yorkshire"].tolist() == [0, 2, 3]
+
+
+def test_partition_rejects_unknown_column():
+    with pytest.raises(ValueError):
+        partition_regions(_collisions(), by="road_type")
+
+
+def test_shared_frame_rows_match_the_frame(tmp_path):
+    df = _collisions().set_index(pd.Index([10, 11, 12, 13, 14]))
+    path = share_frame(df, str(tmp_path), "collisions")
+
+    rows = take_rows(path, np.array([3, 0]))
+
+    pd.testing.assert_frame_equal(rows, df.iloc[[3, 0]])
+
+
+def test_run_batch_gives_each_region_only_its_rows(tmp_path):
+    seen = {}
+
+    def fake_analysis(df, vehicles_df, casualties_df, output_dir, region, **kwargs):
+        seen[region] = (df, vehicles_df, casualties_df, output_dir)
+        return []
+
+    with patch("src.batch.run_analysis", side_effect=fake_analysis):
+        folders = run_batch(
+            os.path.join(DATA_DIR, "accidents.csv"),
+            os.path.join(DATA_DIR, "vehicles.csv"),
+            os.path.join(DATA_DIR, "casualties.csv"),
+            by="local_authority_ons_district",
+            output_root=str(tmp_path), cache_dir=None, workers=1)
+
+    assert set(folders) == {"Leeds", "Bradford", "Wakefield", "Calderdale", "Kirklees"}
+    assert folders["Leeds"] == os.path.join(str(tmp_path), "Leeds")
+
+    for region, (df, vehicles_df, casualties_df, output_dir) in seen.items():
+        assert set(df["local_authority_ons_district"].astype(str).map(
+            {"E08000035": "Leeds", "E08000032": "Bradford",
+             "E08000036": "Wakefield", "E08000034": "Calderdale",
+             "E08000033": "Kirklees"})) == {region}
+        ids = set(df["collision_index"])
+        assert len(vehicles_df) and set(vehicles_df["collision_index"]) <= ids
+        assert set(casualties_df["collision_index"]) <= ids
+        assert os.path.isdir(output_dir)
+
+    assert sum(len(df) for df, *_ in seen.values()) == 4060
+
+
+def _jobs(tmp_path):
+    return [{"name": name, "output_dir": str(tmp_path / name)}
+            for name in ("Leeds", "Bradford")]
+
+
+def test_failing_region_is_raised_not_rerun(tmp_path):
+    class Pool:
+        def __init__(self, max_workers):
+            pass
+
+        def submit(self, fn, job):
+            future = Future()
+            future.set_exception(ValueError(f"bad {job['name']}"))
+            return future
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+    with (
+        patch("src.batch.ProcessPoolExecutor", Pool),
+        patch("src.batch.run_region") as serial,
+        pytest.raises(ValueError, match="bad Leeds"),
+    ):
+        _run_parallel(_jobs(tmp_path), workers=2)
+
+    serial.assert_not_called()
+
+
+def test_pool_that_cannot_start_falls_back_to_serial(tmp_path):
+    with patch("src.batch.ProcessPoolExecutor", side_effect=OSError("no semaphores")):
+        assert _run_parallel(_jobs(tmp_path), workers=2) is None
+
+
+def test_run_batch_reports_a_region_outside_west_yorkshire(tmp_path):
+    paths = generate(str(tmp_path / "extract"), 3000)
+    districts = pd.read_csv(paths["accidents"])["local_authority_ons_district"]
+    elsewhere = districts[districts.str.startswith("E07")].value_counts()
+
+    outputs = run_batch(
+        paths["accidents"], paths["vehicles"], paths["casualties"],
+        by={"Elsewhere": list(elsewhere.index[:5])},
+        output_root=str(tmp_path / "regions"), cache_dir=None, workers=1)
+
+    folder = outputs["Elsewhere"]
+    files = os.listdir(folder)
+    assert "Elsewhere_Traffic_Analysis_Report.pdf" in files
+    # The districts have no names, so the severity chart uses their codes.
+    assert "Accident_Severity_Breakdown_by_Elsewhere_District.png" in files
+    assert "Collisions_by_Month_Elsewhere.png" in files
+    # Nothing in the region's report is labelled West Yorkshire.
+    assert not [name for name in files if "West_Yorkshire" in name]
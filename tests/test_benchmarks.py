@@ -0,0 +1,107 @@
+import filecmp
+import numpy as np
+import pandas as pd
+from benchmarks.run import (
+    check_budgets,
+    check_regressions,
+    load_baselines,
+    save_baselines,
+)
+from benchmarks.synthetic import generate, wy_rows
+from src.load_data import load_linked_data, load_wy_data
+
+
+def test_synthetic_extract_is_deterministic(tmp_path):
+    first = generate(str(tmp_path / "a"), 1500, seed=3, chunk_rows=600)
+    second = generate(str(tmp_path / "b"), 1500, seed=3, chunk_rows=600)
+    other = generate(str(tmp_path / "c"), 1500, seed=4, chunk_rows=600)
+
+    for table in first:
+        assert filecmp.cmp(first[table], second[table], shallow=False)
+    assert not filecmp.cmp(first["accidents"], other["accidents"], shallow=False)
+
+
+def test_synthetic_tables_link_up(tmp_path):
+    paths = generate(str(tmp_path), 2000, chunk_rows=700)
+    accidents = pd.read_csv(paths["accidents"])
+    vehicles = pd.read_csv(paths["vehicles"])
+    casualties = pd.read_csv(paths["casualties"])
+
+    assert accidents["collision_index"].is_unique
+    assert len(accidents) == 2000
+
+    # Every collision has exactly the vehicles and casualties it says.
+    per_collision = accidents.set_index("collision_index")
+    assert (vehicles.groupby("collision_index").size()
+            == per_collision["number_of_vehicles"]).all()
+    assert (casualties.groupby("collision_index").size()
+            == per_collision["number_of_casualties"]).all()
+    assert set(casualties["collision_index"]) <= set(accidents["collision_index"])
+
+    # Most of the country is outside West Yorkshire.
+    assert 20 < wy_rows(paths["accidents"]) < 160
+
+
+def test_synthetic_grid_positions_move_with_lat_lon(tmp_path):
+    paths = generate(str(tmp_path), 2000)
+    df = pd.read_csv(paths["accidents"])
+
+    # The OS grid distance between two collisions matches the lat/lon one.
+    a, b = df.iloc[:1000], df.iloc[1000:]
+    grid = np.hypot(
+        a["location_easting_osgr"].to_numpy() - b["location_easting_osgr"].to_numpy(),
+        a["location_northing_osgr"].to_numpy() - b["location_northing_osgr"].to_numpy())
+    mid = np.radians((a["latitude"].to_numpy() + b["latitude"].to_numpy()) / 2)
+    degrees = np.hypot(
+        a["latitude"].to_numpy() - b["latitude"].to_numpy(),
+        (a["longitude"].to_numpy() - b["longitude"].to_numpy()) * np.cos(mid))
+    assert np.median(np.abs(grid / (degrees * 111_320) - 1)) < 0.02
+
+
+def test_synthetic_extract_loads_like_the_real_one(tmp_path):
+    paths = generate(str(tmp_path), 3000)
+
+    df = load_wy_data(paths["accidents"])
+    vehicles = load_linked_data(paths["vehicles"], df["collision_index"].unique())
+
+    assert len(df) == wy_rows(paths["accidents"])
+    assert df["latitude"].between(53.5, 54.1).all()
+    assert set(vehicles["collision_index"]) == set(df["collision_index"])
+
+
+def test_regression_check_uses_threshold_and_noise_floor():
+    baseline = {"slow": {"best": 1.0}, "quick": {"best": 0.001},
+                "same": {"best": 2.0}}
+    results = {"slow": {"best": 1.6}, "quick": {"best": 0.003},
+               "same": {"best": 2.1}, "new": {"best": 0.5}}
+
+    rows = {row[0]: row for row in check_regressions(results, baseline, 1.5)}
+
+    assert rows["slow"][3] == 1.6 and rows["slow"][4]
+    # Three times slower, but only by 2ms.
+    assert not rows["quick"][4]
+    assert not rows["same"][4]
+    assert rows["new"][2:] == (None, None, False)
+
+
+def test_budget_check_needs_no_baseline():
+    results = {"import_main": {"best": 1.2}, "load_wy_data": {"best": 9.0}}
+
+    assert check_budgets(results, {"import_main": 0.9}) == [
+        ("import_main", 1.2, 0.9)]
+    assert check_budgets(results, {"import_main": 1.5}) == []
+    # A budget for a benchmark that didn't run is skipped.
+    assert check_budgets({}, {"import_main": 0.9}) == []
+
+
+def test_baselines_are_kept_per_size(tmp_path):
+    path = str(tmp_path / "baselines.json")
+    assert load_baselines(path) == {}
+
+    save_baselines({"load_wy_data": {"best": 0.2}}, 10_000, path)
+    save_baselines({"load_wy_data": {"best": 2.0}}, 100_000, path)
+
+    baselines = load_baselines(path)
+    assert baselines["10000"]["benchmarks"]["load_wy_data"]["best"] == 0.2
+    assert baselines["100000"]["benchmarks"]["load_wy_data"]["best"] == 2.0
+    assert "python" in baselines["10000"]["environment"]
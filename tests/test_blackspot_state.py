@@ -0,0 +1,112 @@
+import os
+from unittest.mock import patch
+import numpy as np
+import pandas as pd
+import pytest
+from src.analysis.blackspot_state import (
+    STATE_FILE,
+    BlackspotState,
+    refresh_blackspots,
+)
+from src.analysis.blackspots import identify_blackspots
+from src.load_data import load_wy_data
+
+ACCIDENTS_CSV = os.path.join(
+    os.path.dirname(__file__), "..", "data", "accidents.csv")
+
+
+def _fake_search(coords, mode=1, verbose=False):
+    return [{"admin2": "Leeds"} for _ in coords]
+
+
+@pytest.fixture(scope="module")
+def collisions():
+    return load_wy_data(ACCIDENTS_CSV).sort_values("date")
+
+
+@pytest.mark.parametrize("score", ["count", "severity"])
+def test_state_matches_the_batch_run(collisions, score):
+    state = BlackspotState()
+    state.update(collisions)
+
+    with patch("src.geocoding.rg.search", side_effect=_fake_search):
+        expected = identify_blackspots(collisions, top_n=50, score=score)
+        result = state.identify_blackspots(top_n=50, score=score)
+
+    assert result == expected
+
+
+def test_monthly_updates_add_up_to_one_load(collisions, tmp_path):
+    whole = BlackspotState()
+    whole.update(collisions)
+
+    # Fold the year in month by month, saving and reloading in between.
+    for _, month in collisions.groupby(collisions["date"].dt.month):
+        state = BlackspotState.load(str(tmp_path))
+        state.update(month)
+        state.save(str(tmp_path))
+    state = BlackspotState.load(str(tmp_path))
+
+    np.testing.assert_array_equal(state.keys, whole.keys)
+    np.testing.assert_array_equal(state.counts, whole.counts)
+    np.testing.assert_array_equal(state.severity, whole.severity)
+    np.testing.assert_array_equal(state.last_seen, whole.last_seen)
+    np.testing.assert_allclose(state.decayed, whole.decayed)
+    assert list(state.modal_roads()) == list(whole.modal_roads())
+
+
+def test_overlapping_extracts_are_not_counted_twice(collisions):
+    dates = collisions["date"].drop_duplicates()
+    first = collisions[collisions["date"] <= dates.iloc[20]]
+    second = collisions[collisions["date"] <= dates.iloc[40]]
+    state = BlackspotState()
+
+    assert state.update(first) == len(first)
+    # Only the collisions after the last day already counted are new.
+    assert state.update(second) == len(second) - len(first)
+    assert state.update(second) == 0
+    assert state.counts.sum() == len(second)
+
+
+def test_watermark_is_saved(collisions, tmp_path):
+    state = BlackspotState()
+    state.update(collisions.head(100))
+    state.save(str(tmp_path))
+
+    loaded = BlackspotState.load(str(tmp_path))
+    assert loaded.watermark == state.watermark
+    assert loaded.update(collisions.head(100)) == 0
+
+
+def test_late_reported_collision_is_counted_once(collisions, tmp_path):
+    cutoff = collisions["date"].drop_duplicates().iloc[40]
+    late = collisions[collisions["date"] <= cutoff].head(5)
+    state = BlackspotState()
+    # The first extract is missing five collisions reported late.
+    state.update(collisions[~collisions.index.isin(late.index)])
+    state.save(str(tmp_path))
+
+    state = BlackspotState.load(str(tmp_path))
+    assert state.update(pd.concat([late, collisions.tail(10)])) == 5
+    assert state.update(late) == 0
+    assert state.counts.sum() == len(collisions)
+
+
+def test_missing_severity_counts_in_no_band(collisions):
+    rows = collisions.head(50).copy()
+    rows["collision_severity"] = rows["collision_severity"].astype("Int64")
+    rows.iloc[:5, rows.columns.get_loc("collision_severity")] = pd.NA
+    state = BlackspotState()
+
+    assert state.update(rows) == 50
+    assert state.severity.sum() == 45
+
+
+def test_refresh_blackspots_persists_state(collisions, tmp_path):
+    with patch("src.geocoding.rg.search", side_effect=_fake_search):
+        spots = refresh_blackspots(
+            collisions, str(tmp_path), top_n=3, score="eb")
+
+    assert os.path.exists(os.path.join(str(tmp_path), STATE_FILE))
+    assert len(spots) == 3
+    assert {"count", "score", "score_low", "score_high"} <= set(spots[0])
@@ -1,6 +1,11 @@
+import os
+import time
+from unittest.mock import patch
+import numpy as np
 import pytest
 import pandas as pd
-from src.analysis.blackspots import identify_blackspots
+from src.analysis.blackspots import RadiusClusters, SiteGrid, identify_blackspots
+from src.load_data import load_wy_data
 
 
 def test_identify_blackspots_logic():
@@ -29,3 +34,151 @@ def test_identify_blackspots_logic():
     assert (
         "latitude" in results[0]
     )  # Ensure the keys needed for the map/pdf exists.
+
+
+ACCIDENTS_CSV = os.path.join(
+    os.path.dirname(__file__), "..", "data", "accidents.csv")
+
+
+def _unique_row_blackspots(df, top_n):
+    """The original np.unique(axis=0) ranking, kept as the parity reference."""
+    lats = np.round(df["latitude"].to_numpy(), 3)
+    lons = np.round(df["longitude"].to_numpy(), 3)
+    coords = np.column_stack((lats, lons))
+    unique_coords, counts = np.unique(coords, axis=0, return_counts=True)
+
+    results = []
+    for i in np.argsort(-counts)[:top_n]:
+        lat, lon = unique_coords[i]
+        mask = (np.round(df["latitude"], 3) == lat) & (
+            np.round(df["longitude"], 3) == lon)
+        road = df[mask]["display_road_type"].mode().iloc[0]
+        results.append((lat, lon, int(counts[i]), road))
+    return results
+
+
+def _fake_search(coords, mode=1, verbose=False):
+    return [{"admin2": "Leeds"} for _ in coords]
+
+
+def test_grid_binning_matches_unique_rows_on_bundled_data():
+    df = load_wy_data(ACCIDENTS_CSV)
+
+    with patch("src.geocoding.rg.search", side_effect=_fake_search):
+        results = identify_blackspots(df, top_n=50, min_accidents=1)
+
+    found = [
+        (s["latitude"], s["longitude"], s["count"], s["road_type"])
+        for s in results
+    ]
+    assert found == _unique_row_blackspots(df, 50)
+
+
+def test_site_grid_members_and_modal_road():
+    grid = SiteGrid(
+        [53.1001, 53.1004, 53.2, 53.1002],
+        [-1.1, -1.1, -1.2, -1.1],
+        ["B-Road", "A-Road", "A-Road", "A-Road"],
+    )
+
+    top = grid.top(1)[0]
+    assert grid.counts[top] == 3
+    assert (grid.latitude[top], grid.longitude[top]) == (53.1, -1.1)
+    assert grid.members(top).tolist() == [0, 1, 3]
+    assert grid.road[top] == "A-Road"
+
+
+def test_site_grid_cell_size_is_configurable():
+    lats, lons = [53.11, 53.14], [-1.1, -1.1]
+
+    assert len(SiteGrid(lats, lons, decimals=2)) == 2
+    assert len(SiteGrid(lats, lons, decimals=1)) == 1
+
+
+def test_site_grid_bins_a_million_rows_quickly():
+    rng = np.random.default_rng(0)
+    lats = rng.uniform(50, 58, 1_000_000)
+    lons = rng.uniform(-5, 1.5, 1_000_000)
+    roads = pd.Categorical(rng.choice(["A", "B", "C"], size=1_000_000))
+
+    start = time.perf_counter()
+    SiteGrid(lats, lons, roads)
+
+    assert time.perf_counter() - start < 2
+
+
+def test_radius_clusters_join_a_junction_split_by_the_grid():
+    # Three collisions 20m apart either side of a 3 dp grid line, one far off.
+    clusters = RadiusClusters(
+        [414000, 414020, 414040, 420000],
+        [422000, 422000, 422000, 425000],
+        radius=50,
+        min_samples=2,
+    )
+
+    assert len(clusters) == 1
+    assert clusters.members(0).tolist() == [0, 1, 2]
+    assert clusters.labels[3] == -1  # Noise, not a site.
+
+
+def test_radius_clusters_attach_border_points():
+    # 0-1-2 are core (3 within 50m of 1), 3 only reaches 2.
+    clusters = RadiusClusters(
+        [0, 40, 80, 125], [0, 0, 0, 0], radius=50, min_samples=3)
+
+    assert clusters.labels.tolist() == [0, 0, 0, 0]
+
+
+def test_radius_clusters_are_the_same_in_small_batches():
+    rng = np.random.default_rng(1)
+    eastings = rng.uniform(0, 2000, 3000)
+    northings = rng.uniform(0, 2000, 3000)
+    # A busy junction, every collision a neighbour of every other.
+    eastings[:300], northings[:300] = 1000, 1000
+
+    whole = RadiusClusters(eastings, northings, radius=50, min_samples=3)
+    batched = RadiusClusters(eastings, northings, radius=50, min_samples=3,
+                             batch=500)
+
+    assert batched.labels.tolist() == whole.labels.tolist()
+    assert batched.counts.max() >= 300
+
+
+def test_identify_blackspots_rejects_unknown_mode():
+    with pytest.raises(ValueError, match="cluster"):
+        identify_blackspots(pd.DataFrame({"latitude": [], "longitude": []}),
+                            mode="cluster")
+
+
+def test_identify_blackspots_radius_mode_keeps_the_dict_shape():
+    df = pd.DataFrame({
+        "location_easting_osgr": [414000, 414020, 414040, 420000],
+        "location_northing_osgr": [422000, 422000, 422000, 425000],
+        "latitude": [53.70, 53.70, 53.70, 53.80],
+        "longitude": [-1.7800, -1.7797, -1.7794, -1.69],
+        "display_road_type": ["A-Road", "A-Road", "B-Road", "B-Road"],
+    })
+
+    with patch("src.geocoding.rg.search", side_effect=_fake_search):
+        results = identify_blackspots(df, mode="radius", radius=50)
+
+    assert len(results) == 1
+    spot = results[0]
+    assert spot["count"] == 3
+    assert spot["road_type"] == "A-Road"
+    assert (spot["latitude"], spot["longitude"]) == (53.7, -1.7797)
+    assert spot["site_label"] == "Site @ 53.7, -1.7797 (Leeds)"
+    assert set(spot) == {
+        "latitude", "longitude", "area", "site_label", "count", "road_type"}
+
+
+def test_radius_clusters_scale_to_a_million_points():
+    rng = np.random.default_rng(0)
+    eastings = rng.uniform(380_000, 450_000, 1_000_000)
+    northings = rng.uniform(400_000, 460_000, 1_000_000)
+
+    start = time.perf_counter()
+    clusters = RadiusClusters(eastings, northings, radius=50)
+
+    assert time.perf_counter() - start < 10
+    assert clusters.counts.sum() == (clusters.labels >= 0).sum()
@@ -0,0 +1,97 @@
+import os
+import pandas as pd
+from unittest.mock import MagicMock, patch
+from src.cache import cached_frame, file_fingerprint
+
+
+def _write_csv(path, rows):
+    pd.DataFrame({"value": rows}).to_csv(path, index=False)
+
+
+def test_cached_frame_builds_once_then_reuses(tmp_path):
+    source = tmp_path / "accidents.csv"
+    _write_csv(source, [1, 2, 3])
+
+    frame = pd.DataFrame(
+        {"road": pd.Categorical(["A", "B"]), "date": pd.to_datetime(
+            ["2024-01-01", "2024-02-01"])},
+        index=[4, 9],
+    )
+    build = MagicMock(return_value=frame)
+
+    first = cached_frame(str(source), build, cache_dir=str(tmp_path / "c"))
+    second = cached_frame(str(source), build, cache_dir=str(tmp_path / "c"))
+
+    # The second call is served from the Arrow file.
+    build.assert_called_once()
+    pd.testing.assert_frame_equal(first, second)
+    assert list(second.index) == [4, 9]
+
+
+def test_cached_frame_rebuilds_when_source_changes(tmp_path):
+    source = tmp_path / "accidents.csv"
+    cache_dir = tmp_path / "c"
+    _write_csv(source, [1, 2, 3])
+
+    build = MagicMock(return_value=pd.DataFrame({"x": [1]}))
+    cached_frame(str(source), build, cache_dir=str(cache_dir))
+
+    # Same size, different content and mtime.
+    _write_csv(source, [7, 8, 9])
+    os.utime(source, ns=(1, 1))
+    cached_frame(str(source), build, cache_dir=str(cache_dir))
+
+    assert build.call_count == 2
+    # Only the newest cache file is kept.
+    assert len(os.listdir(cache_dir)) == 1
+
+
+def test_cached_frame_rebuilds_when_mappings_change(tmp_path):
+    source = tmp_path / "accidents.csv"
+    _write_csv(source, [1])
+
+    build = MagicMock(return_value=pd.DataFrame({"x": [1]}))
+    cached_frame(str(source), build, cache_dir=str(tmp_path))
+
+    with patch("src.mappings.road_type_labels", {1: "Changed"}):
+        cached_frame(str(source), build, cache_dir=str(tmp_path))
+
+    assert build.call_count == 2
+
+
+def test_cached_frame_missing_source_just_builds(tmp_path):
+    build = MagicMock(return_value=pd.DataFrame({"x": [1]}))
+
+    result = cached_frame("missing.csv", build, cache_dir=str(tmp_path))
+
+    assert list(result["x"]) == [1]
+    assert os.listdir(tmp_path) == []
+
+
+def test_file_fingerprint_changes_with_content(tmp_path):
+    source = tmp_path / "a.csv"
+    _write_csv(source, [1])
+    before = file_fingerprint(str(source))
+
+    _write_csv(source, [2])
+    os.utime(source, ns=(1, 1))
+
+    assert file_fingerprint(str(source)) != before
+
+
+def test_caches_of_different_selections_are_kept_side_by_side(tmp_path):
+    source = tmp_path / "accidents.csv"
+    cache_dir = tmp_path / "c"
+    _write_csv(source, [1, 2, 3])
+
+    build = MagicMock(return_value=pd.DataFrame({"x": [1]}))
+    # West Yorkshire then national, as main.py and the batch runner do.
+    cached_frame(str(source), build, str(cache_dir), name="accidents",
+                 extra_key=["E08000035"])
+    cached_frame(str(source), build, str(cache_dir), name="accidents-all",
+                 extra_key="all")
+    cached_frame(str(source), build, str(cache_dir), name="accidents",
+                 extra_key=["E08000035"])
+
+    assert build.call_count == 2
+    assert len(os.listdir(cache_dir)) == 2
@@ -1,7 +1,13 @@
 import os
+import threading
+from concurrent.futures import Future
 import pandas as pd
+import pytest
 from unittest.mock import patch, MagicMock
 from src.charts import (
+    MANIFEST_FILE,
+    ChartQueue,
+    load_manifest,
     bar_chart,
     stacked_bar_chart,
     pie_chart,
@@ -9,29 +15,41 @@ from src.charts import (
 )
 
 
+def _fake_figure():
+    """A real figure whose savefig is mocked, so nothing is written."""
+    from matplotlib.figure import Figure
+
+    fig = Figure()
+    fig.savefig = MagicMock()
+    return fig, fig.add_subplot()
+
+
 def test_bar_chart_saves_correct_file():
     series = pd.Series([1, 2, 3], index=["A", "B", "C"])
 
-    with patch("src.charts.plt") as mock_plt:
-        mock_fig = MagicMock()
-        mock_plt.figure.return_value = mock_fig
+    with patch("src.charts._new_figure") as mock_figure:
+        fig, ax = _fake_figure()
+        mock_figure.return_value = (fig, ax)
 
         bar_chart(series, "Test Chart (Example)", "X", "Y", color="red")
 
         expected_filename = "Test_Chart_Example.png"
         expected_path = os.path.join("output_charts", expected_filename)
 
-        mock_plt.savefig.assert_called_once_with(expected_path)
-        mock_plt.close.assert_called_once()
+        fig.savefig.assert_called_once_with(expected_path)
+        assert ax.get_title() == "Test Chart (Example)"
 
 
 def test_stacked_bar_chart_saves_file():
     df = pd.DataFrame({"Fatal": [1], "Serious": [2]})
 
     with (
-        patch("src.charts.plt") as mock_plt,
+        patch("src.charts._new_figure") as mock_figure,
         patch.object(pd.DataFrame, "plot") as mock_plot,
     ):
+        fig, ax = _fake_figure()
+        mock_figure.return_value = (fig, ax)
+
         stacked_bar_chart(df, "Severity Breakdown", "X", "Y", ["red", "orange"])
 
         expected_filename = "Severity_Breakdown.png"
@@ -39,30 +57,30 @@ def test_stacked_bar_chart_saves_file():
 
         mock_plot.assert_called_once()
 
-        actual_path = mock_plt.savefig.call_args[0][0]
+        actual_path = fig.savefig.call_args[0][0]
 
         assert os.path.normpath(actual_path) == os.path.normpath(expected_path)
 
-        mock_plt.close.assert_called_once()
-
 
 def test_pie_chart_saves_file():
     series = pd.Series([50, 50], index=["A", "B"])
 
-    with patch("src.charts.plt") as mock_plt:
+    with patch("src.charts._new_figure") as mock_figure:
+        fig, ax = _fake_figure()
+        mock_figure.return_value = (fig, ax)
+
         pie_chart(series, "Pie Chart (Test)", colors=["red", "blue"])
 
         expected_filename = "Pie_Chart_Test.png"
         expected_path = os.path.join("output_charts", expected_filename)
 
-        mock_plt.savefig.assert_called_once_with(expected_path)
-        mock_plt.close.assert_called_once()
+        fig.savefig.assert_called_once_with(expected_path)
 
 
 def test_blackspots_chart_no_data():
-    with patch("src.charts.plt") as mock_plt:
+    with patch("src.charts.render_job") as mock_render:
         generate_blackspots_chart(None, "charts", hotspots_data=None)
-        mock_plt.figure.assert_not_called()
+        mock_render.assert_not_called()
 
 
 def test_blackspots_chart_generates_file():
@@ -71,12 +89,215 @@ def test_blackspots_chart_generates_file():
         {"area": "Bradford", "road_type": "Motorway", "count": 20},
     ]
 
-    with patch("src.charts.plt") as mock_plt:
+    with patch("src.charts._new_figure") as mock_figure:
+        fig, ax = _fake_figure()
+        mock_figure.return_value = (fig, ax)
+
         generate_blackspots_chart(
             None, "charts", hotspots_data=hotspots, data_duration="2020-2023"
         )
 
         expected_path = os.path.join("charts", "blackspot_priority_analysis.png")
 
-        mock_plt.savefig.assert_called_once_with(expected_path, dpi=300)
-        mock_plt.close.assert_called_once()
+        fig.savefig.assert_called_once_with(expected_path, dpi=300)
+
+
+def test_blackspots_chart_scored_bars_use_score_and_interval():
+    hotspots = [
+        {"area": "Leeds", "road_type": "A Road", "count": 3,
+         "score": 20.0, "score_low": 15.0, "score_high": 26.0},
+        {"area": "Bradford", "road_type": "Motorway", "count": 2,
+         "score": 12.0, "score_low": 8.0, "score_high": 17.0},
+    ]
+
+    with patch("src.charts.render_job") as mock_render:
+        generate_blackspots_chart(
+            None, "charts", hotspots_data=hotspots, score="eb"
+        )
+
+        kind, data, path, spec = mock_render.call_args.args[0]
+        # Reversed so the top site is drawn at the top.
+        assert spec["values"] == [12.0, 20.0]
+        assert spec["errors"].tolist() == [[4.0, 5.0], [5.0, 6.0]]
+        assert spec["xlabel"] == "Severity-weighted Priority Score"
+
+
+def test_empty_table_is_skipped_not_drawn():
+    empty = pd.DataFrame(index=pd.Index([], name="district"))
+
+    with patch("src.charts.render_job") as mock_render:
+        with ChartQueue(workers=1) as queue:
+            record = stacked_bar_chart(empty, "Nothing", "X", "Y", ["red"])
+
+    assert record is None
+    assert queue.records == []
+    mock_render.assert_not_called()
+
+
+def test_chart_queue_defers_until_the_block_ends():
+    series = pd.Series([1, 2], index=["A", "B"])
+
+    with patch("src.charts.render_job") as mock_render:
+        with ChartQueue(workers=1) as queue:
+            record = bar_chart(series, "Queued", "X", "Y")
+            mock_render.assert_not_called()
+            assert record["render_seconds"] is None
+
+    assert record["path"] == os.path.join("output_charts", "Queued.png")
+    assert record["title"] == "Queued"
+    mock_render.assert_called_once()
+    assert queue.records == [record]
+    assert record["render_seconds"] is not None
+
+
+def test_chart_queue_parallel_output_matches_serial(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("output_charts")
+    series = pd.Series([3, 1, 2], index=["A", "B", "C"])
+
+    def draw_all():
+        bar_chart(series, "Bar One", "X", "Y", color="red")
+        pie_chart(series, "Pie One")
+        stacked_bar_chart(
+            pd.DataFrame({"Fatal": [1, 2], "Slight": [3, 4]}, index=["L", "B"]),
+            "Stacked One", "X", "Y", ["red", "yellow"])
+
+    with ChartQueue(workers=1) as serial:
+        draw_all()
+    serial_bytes = [open(path, "rb").read() for path in serial.paths]
+
+    # Forget the cached charts so the parallel run draws them again.
+    os.remove(os.path.join("output_charts", MANIFEST_FILE))
+
+    with ChartQueue(workers=3) as parallel:
+        draw_all()
+    parallel_bytes = [open(path, "rb").read() for path in parallel.paths]
+
+    assert parallel.paths == serial.paths
+    assert parallel_bytes == serial_bytes
+
+
+def test_chart_queue_falls_back_to_serial():
+    series = pd.Series([1, 2], index=["A", "B"])
+
+    with (
+        patch("src.charts.ProcessPoolExecutor", side_effect=OSError("no fork")),
+        patch("src.charts.render_job") as mock_render,
+    ):
+        with ChartQueue(workers=4):
+            bar_chart(series, "One", "X", "Y")
+            bar_chart(series, "Two", "X", "Y")
+
+    assert mock_render.call_count == 2
+
+
+def test_chart_that_fails_to_draw_is_raised_not_redrawn(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    series = pd.Series([1, 2], index=["A", "B"])
+
+    class Pool:
+        def __init__(self, max_workers, mp_context):
+            assert mp_context.get_start_method() != "fork"
+
+        def submit(self, fn, job):
+            future = Future()
+            future.set_exception(ValueError(f"bad {job[2]}"))
+            return future
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+    with (
+        patch("src.charts.ProcessPoolExecutor", Pool),
+        patch("src.charts.render_job") as serial,
+        pytest.raises(ValueError, match="bad"),
+    ):
+        with ChartQueue(workers=4):
+            bar_chart(series, "One", "X", "Y")
+            bar_chart(series, "Two", "X", "Y")
+
+    serial.assert_not_called()
+
+
+def test_chart_queue_only_collects_its_own_threads_charts(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    series = pd.Series([1, 2], index=["A", "B"])
+    drawn = []
+
+    def other_stage():
+        drawn.append(bar_chart(series, "Elsewhere", "X", "Y"))
+
+    with patch("src.charts.render_job") as mock_render:
+        with ChartQueue(workers=1) as queue:
+            bar_chart(series, "Mine", "X", "Y")
+            worker = threading.Thread(target=other_stage)
+            worker.start()
+            worker.join()
+            # The other thread's chart was drawn straight away.
+            mock_render.assert_called_once()
+
+    assert [record["title"] for record in queue.records] == ["Mine"]
+    assert drawn[0]["render_seconds"] is not None
+
+
+def test_unchanged_chart_is_not_redrawn(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("output_charts")
+    series = pd.Series([3, 1, 2], index=["A", "B", "C"])
+
+    record = bar_chart(series, "Cached", "X", "Y", color="red")
+    entry = load_manifest("output_charts")["Cached.png"]
+    assert entry["hash"] == record["hash"]
+    assert entry["bytes"] == os.path.getsize(record["path"]) > 0
+
+    with patch("src.charts.render_job") as mock_render:
+        cached = bar_chart(series, "Cached", "X", "Y", color="red")
+        mock_render.assert_not_called()
+        assert cached["cached"] and cached["path"] == record["path"]
+
+        # Different data or colours give a different hash, so it's redrawn.
+        bar_chart(series + 1, "Cached", "X", "Y", color="red")
+        bar_chart(series, "Cached", "X", "Y", color="blue")
+        assert mock_render.call_count == 2
+
+
+def test_missing_png_is_redrawn(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("output_charts")
+    series = pd.Series([1, 2], index=["A", "B"])
+
+    os.remove(bar_chart(series, "Deleted", "X", "Y")["path"])
+
+    with patch("src.charts.render_job") as mock_render:
+        bar_chart(series, "Deleted", "X", "Y")
+        mock_render.assert_called_once()
+
+
+def test_chart_queue_records_cached_charts_too(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("output_charts")
+    series = pd.Series([1, 2], index=["A", "B"])
+    bar_chart(series, "Kept", "X", "Y")
+
+    with ChartQueue(workers=1) as queue:
+        bar_chart(series, "Kept", "X", "Y")
+        bar_chart(series, "New", "X", "Y")
+
+    assert [r["title"] for r in queue.records] == ["Kept", "New"]
+    assert [r["cached"] for r in queue.records] == [True, False]
+    assert all(r["bytes"] > 0 for r in queue.records)
+
+
+def test_chart_queue_folder_redirects_the_charts(tmp_path):
+    series = pd.Series([1, 2], index=["A", "B"])
+    folder = str(tmp_path / "Leeds")
+
+    with patch("src.charts.render_job"):
+        with ChartQueue(workers=1, folder=folder):
+            record = bar_chart(series, "Regional", "X", "Y")
+
+    assert record["path"] == os.path.join(folder, "Regional.png")
+    assert os.path.isdir(folder)
@@ -0,0 +1,136 @@
+import os
+import pandas as pd
+import pytest
+from filters import FilterIndex, apply_filters
+from src.load_data import load_linked_data, load_wy_data
+from src.mappings import ui_mappings
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+
+
+@pytest.fixture(scope="module")
+def bundled():
+    df = load_wy_data(os.path.join(DATA_DIR, "accidents.csv"))
+    cas = load_linked_data(
+        os.path.join(DATA_DIR, "casualties.csv"), df["collision_index"])
+    return df, cas
+
+
+def _reference_filter(df, cas_df, choices):
+    """Plain sequential isin filtering, one pass per sidebar filter."""
+    columns = {
+        "severity": "collision_severity",
+        "weather": "weather_conditions",
+        "light": "light_conditions",
+        "surface": "road_surface_conditions",
+    }
+    for name, col in columns.items():
+        if choices.get(name):
+            inverse = {v: k for k, v in ui_mappings[name].items()}
+            df = df[df[col].isin([inverse[c] for c in choices[name]])]
+
+    for name, col in [
+        ("gender", "sex_of_casualty"),
+        ("age_choice", "age_band_of_casualty"),
+    ]:
+        if choices.get(name):
+            inverse = {v: k for k, v in ui_mappings[name].items()}
+            hits = cas_df[cas_df[col].isin([inverse[c] for c in choices[name]])]
+            df = df[df["collision_index"].isin(hits["collision_index"])]
+
+    if choices.get("road_type"):
+        df = df[df["display_road_type"].isin(choices["road_type"])]
+
+    return df
+
+
+def _run(df, cas, choices, index=None):
+    return apply_filters(
+        df=df,
+        cas_df=cas,
+        weather_choice=choices.get("weather", []),
+        severity_choice=choices.get("severity", []),
+        light_choice=choices.get("light", []),
+        surface_choice=choices.get("surface", []),
+        road_type_choice=choices.get("road_type", []),
+        age_choice=choices.get("age_choice", []),
+        selected_genders=choices.get("gender", []),
+        ui_mappings=ui_mappings,
+        index=index,
+    )
+
+
+@pytest.mark.parametrize(
+    "choices",
+    [
+        {},
+        {"severity": ["Fatal", "Serious"]},
+        {"weather": ["Raining (no high winds)"], "light": ["Daylight"]},
+        {"surface": ["Wet / Damp"], "road_type": ["Single carriageway"]},
+        {"gender": ["Female"], "severity": ["Slight"]},
+        {"age_choice": ["16-20", "21-25"], "gender": ["Male"]},
+        {"road_type": ["Roundabout", "Dual carriageway"], "weather": ["Fog or Mist"]},
+    ],
+)
+def test_apply_filters_matches_sequential_filtering(bundled, choices):
+    df, cas = bundled
+    index = FilterIndex(df, ui_mappings)
+
+    expected = _reference_filter(df, cas, choices)
+
+    pd.testing.assert_frame_equal(_run(df, cas, choices), expected)
+    pd.testing.assert_frame_equal(_run(df, cas, choices, index), expected)
+
+
+def test_road_type_filter_matches_the_exact_label():
+    df = pd.DataFrame(
+        {
+            "collision_index": [1, 2],
+            "collision_severity": [1, 3],
+            "display_road_type": ["Roundabout", "roundabout"],
+        }
+    )
+
+    result = _run(df, pd.DataFrame(), {"road_type": ["Roundabout"]})
+    assert list(result["collision_index"]) == [1]
+
+    result = _run(df, pd.DataFrame(), {"road_type": ["ROUNDABOUT"]})
+    assert result.empty
+
+
+def test_unknown_value_matches_nothing():
+    df = pd.DataFrame({"collision_index": [1], "collision_severity": [3],
+                       "display_road_type": ["Slip"]})
+
+    result = _run(df, pd.DataFrame(), {"severity": ["Fatal"]})
+
+    assert result.empty
+
+
+def test_casualty_reverse_index():
+    df = pd.DataFrame(
+        {
+            "collision_index": [30, 10, 20],
+            "collision_severity": [3, 3, 3],
+            "display_road_type": ["Slip"] * 3,
+        }
+    )
+    cas = pd.DataFrame(
+        {
+            "collision_index": [10, 10, 20, 30, 99],
+            "sex_of_casualty": [1, 1, 2, 1, 2],
+            "age_band_of_casualty": [4, 6, 4, 9, 4],
+        }
+    )
+
+    index = FilterIndex(df, ui_mappings, cas)
+
+    # Sorted collision ids per value, and accident row positions.
+    assert list(index.casualty_ids["sex_of_casualty"][1]) == [10, 30]
+    assert list(index.casualty_rows["sex_of_casualty"][1]) == [0, 1]
+    # Collision 99 isn't in the accidents frame so has no row.
+    assert list(index.casualty_rows["age_band_of_casualty"][4]) == [1, 2]
+
+    result = _run(df, cas, {"gender": ["Male"], "age_choice": ["16-20"]},
+                  index=index)
+    assert list(result["collision_index"]) == [10]
@@ -0,0 +1,67 @@
+import json
+import os
+from unittest.mock import patch
+from src.geocoding import CACHE_FILE, coord_key, reverse_geocode
+
+
+def _fake_search(coords, mode=1, verbose=False):
+    return [
+        {"lat": "0", "lon": "0", "name": f"Place {lat}", "admin1": "England",
+         "admin2": "Leeds", "cc": "GB"}
+        for lat, lon in coords
+    ]
+
+
+def test_reverse_geocode_batches_one_search():
+    with patch("src.geocoding.rg.search", side_effect=_fake_search) as mock_search:
+        places = reverse_geocode([(53.8, -1.5), (53.7, -1.4), (53.8, -1.5)])
+
+    # One single-process search, duplicates asked once.
+    mock_search.assert_called_once_with(
+        [(53.8, -1.5), (53.7, -1.4)], mode=1, verbose=False)
+    assert [p["name"] for p in places] == ["Place 53.8", "Place 53.7", "Place 53.8"]
+    assert places[0]["admin2"] == "Leeds"
+
+
+def test_reverse_geocode_reuses_disk_cache(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+
+    with patch("src.geocoding.rg.search", side_effect=_fake_search):
+        reverse_geocode([(53.8, -1.5)], cache_dir=cache_dir)
+    assert os.path.exists(os.path.join(cache_dir, CACHE_FILE))
+
+    # A later process only has the file - forget the in-memory copy.
+    with (
+        patch("src.geocoding._places", {}),
+        patch("src.geocoding.rg.search", side_effect=_fake_search) as mock_search,
+    ):
+        places = reverse_geocode(
+            [(53.8, -1.5), (53.7, -1.4)], cache_dir=cache_dir)
+
+    mock_search.assert_called_once_with([(53.7, -1.4)], mode=1, verbose=False)
+    assert places[0]["name"] == "Place 53.8"
+
+
+def test_processes_saving_the_cache_keep_each_others_places(tmp_path):
+    cache_dir = str(tmp_path / "cache")
+
+    # Two batch workers, each with its own in-memory copy of the cache:
+    # the first reads the file, the second saves to it, then the first does.
+    first, second = {}, {}
+    with patch("src.geocoding.rg.search", side_effect=_fake_search):
+        with patch("src.geocoding._places", first):
+            reverse_geocode([(53.0, -1.0)], cache_dir=cache_dir)
+        with patch("src.geocoding._places", second):
+            reverse_geocode([(53.1, -1.0)], cache_dir=cache_dir)
+        with patch("src.geocoding._places", first):
+            reverse_geocode([(53.2, -1.0)], cache_dir=cache_dir)
+
+    with open(os.path.join(cache_dir, CACHE_FILE), encoding="utf-8") as f:
+        saved = json.load(f)
+    assert set(saved) == {
+        coord_key(53.0, -1.0), coord_key(53.1, -1.0), coord_key(53.2, -1.0)}
+
+
+def test_coord_key_rounds_to_a_metre():
+    assert coord_key(53.800001, -1.5) == coord_key(53.8, -1.500002)
+    assert coord_key(53.8, -1.5) != coord_key(53.8001, -1.5)
@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(__file__), "..")
+
+# Slow to import and only needed once a run draws, maps, geocodes or
+# writes the PDF - none of them should load when the modules are imported.
+HEAVY_MODULES = ["matplotlib", "folium", "fpdf", "reverse_geocoder", "scipy", "PIL"]
+
+
+def _import(module, cwd=ROOT):
+    """Imports module in a fresh interpreter."""
+    env = dict(os.environ, PYTHONPATH=os.path.abspath(ROOT))
+    return subprocess.run(
+        [sys.executable, "-c",
+         f"import sys, {module}; print(' '.join(sorted(sys.modules)))"],
+        cwd=cwd, env=env, capture_output=True, text=True, check=True,
+    )
+
+
+def test_modules_do_not_import_heavy_dependencies():
+    for module in ["main", "src.batch", "src.analysis.blackspots",
+                   "src.analysis.blackspot_state", "src.charts"]:
+        loaded = set(_import(module).stdout.split())
+        assert not loaded & set(HEAVY_MODULES), module
+
+
+def test_importing_charts_has_no_side_effects(tmp_path):
+    _import("src.charts", cwd=tmp_path)
+
+    assert os.listdir(tmp_path) == []
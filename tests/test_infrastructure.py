@@ -1,5 +1,5 @@
 import pandas as pd
-from unittest.mock import patch
+from unittest.mock import ANY, patch
 from src.analysis.infrastructure import (
     analyse_road_type_distribution,
     analyse_urban_rural_proportion,
@@ -28,12 +28,7 @@ def test_analyse_road_type_distribution():
 def test_analyse_urban_rural_proportion():
     df = pd.DataFrame({"urban_or_rural_area": [1, 2, 1]})
 
-    with (
-        patch("src.analysis.infrastructure.pie_chart") as mock_pie,
-        patch(
-            "src.analysis.infrastructure.urban_rural_labels", {1: "Urban", 2: "Rural"}
-        ),
-    ):
+    with patch("src.analysis.infrastructure.pie_chart") as mock_pie:
         analyse_urban_rural_proportion(df)
 
         df_local = df.copy()
@@ -84,6 +79,10 @@ def test_run_infrastructure_suite():
     ):
         run_infrastructure_suite(df)
 
-        r.assert_called_once_with(df)
-        s.assert_called_once_with(df)
-        u.assert_called_once_with(df)
+        # Each gets its counts from one aggregate_collisions pass.
+        r.assert_called_once_with(df, ANY, "West Yorkshire")
+        s.assert_called_once_with(df, ANY, "West Yorkshire")
+        u.assert_called_once_with(df, ANY, "West Yorkshire")
+        assert r.call_args.args[1].to_dict() == {"A Road": 1}
+        assert s.call_args.args[1].to_dict() == {30: 1}
+        assert u.call_args.args[1].to_dict() == {"Urban": 1}
@@ -0,0 +1,110 @@
+import json
+import os
+import threading
+import pytest
+from src import instrument
+from src.load_data import load_linked_data
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+
+
+@pytest.fixture(autouse=True)
+def _instrumentation_off():
+    """Every test starts and ends with instrumentation off and no events."""
+    instrument.disable()
+    instrument.reset()
+    yield
+    instrument.disable()
+    instrument.reset()
+
+
+@instrument.timed(rows=True)
+def _make_rows(n):
+    """Returns n rows."""
+    instrument.add(asked=n)
+    return list(range(n))
+
+
+def test_disabled_records_nothing():
+    assert _make_rows(3) == [0, 1, 2]
+    with instrument.span("block") as event:
+        instrument.add(rows=1)
+
+    # The same shared do-nothing context every time.
+    assert instrument.span("other") is instrument.span("block")
+    assert event is None
+    assert instrument.events() == []
+
+
+def test_spans_nest_and_carry_fields():
+    instrument.enable()
+
+    with instrument.span("outer", table="x"):
+        _make_rows(4)
+        instrument.add(bytes_read=10)
+
+    inner, outer = instrument.events()
+    assert inner["name"] == "_make_rows"
+    assert (inner["rows"], inner["asked"]) == (4, 4)
+    assert outer == {**outer, "name": "outer", "table": "x", "bytes_read": 10}
+    assert outer["start"] <= inner["start"]
+    assert outer["seconds"] >= inner["seconds"]
+    assert _make_rows.__name__ == "_make_rows"
+    assert _make_rows.__doc__ == "Returns n rows."
+
+
+def test_memory_peaks_include_inner_blocks():
+    instrument.enable(memory=True)
+
+    with instrument.span("outer"):
+        with instrument.span("inner"):
+            block = bytearray(8 * 2**20)
+            del block
+        small = bytearray(2**20)
+        del small
+
+    inner, outer = instrument.events()
+    assert inner["peak_mb"] >= 8
+    assert outer["peak_mb"] >= inner["peak_mb"]
+
+
+def test_chrome_trace_has_a_lane_per_thread(tmp_path):
+    instrument.enable()
+
+    with instrument.span("main"):
+        worker = threading.Thread(
+            target=lambda: _make_rows(1), name="worker")
+        worker.start()
+        worker.join()
+
+    path = str(tmp_path / "trace.json")
+    instrument.write_chrome_trace(path)
+    with open(path) as f:
+        trace = json.load(f)["traceEvents"]
+
+    spans = {event["name"]: event for event in trace if event["ph"] == "X"}
+    lanes = {event["args"]["name"]: event["tid"]
+             for event in trace if event["ph"] == "M"}
+    assert spans["_make_rows"]["tid"] == lanes["worker"]
+    assert spans["main"]["tid"] == lanes["MainThread"]
+    assert spans["_make_rows"]["args"] == {"asked": 1, "rows": 1}
+    assert spans["main"]["dur"] >= spans["_make_rows"]["dur"]
+
+
+def test_loaders_report_rows_and_bytes(tmp_path):
+    instrument.enable()
+
+    linked = load_linked_data(
+        os.path.join(DATA_DIR, "vehicles.csv"), ["nothing"])
+
+    event, = instrument.events()
+    assert event["name"] == "load_linked_data"
+    assert event["rows"] == len(linked) == 0
+    assert event["bytes_read"] == os.path.getsize(
+        os.path.join(DATA_DIR, "vehicles.csv"))
+    assert event["rows_read"] > 0
+
+    path = str(tmp_path / "events.json")
+    instrument.write_json(path)
+    with open(path) as f:
+        assert json.load(f)[0]["name"] == "load_linked_data"
@@ -1,6 +1,13 @@
 import pandas as pd
 from unittest.mock import patch
-from src.load_data import load_linked_data, load_wy_data, get_data_period
+from src.load_data import (
+    ACCIDENT_COLUMNS,
+    LinkedTableStore,
+    get_data_period,
+    load_linked_data,
+    load_wy_data,
+    read_district_rows,
+)
 
 
 def test_load_linked_data_filters_correctly():
@@ -42,7 +49,7 @@ def test_load_wy_data_full_cleaning():
     )
 
     with (
-        patch("src.load_data.pd.read_csv", return_value=df_mock),
+        patch("src.load_data.pd.read_csv", return_value=[df_mock]),
         patch("src.load_data.road_type_labels", {1: "Dual", 2: "Single"}),
         patch("src.load_data.road_class_labels", {1: "Motorway", 2: "A Road"}),
         patch("src.load_data.district_names", ["E08000035"]),
@@ -64,6 +71,65 @@ def test_load_wy_data_full_cleaning():
         assert row["display_road_type"] == "Motorway(Motorway)"
 
 
+def test_load_wy_data_streams_and_projects(tmp_path):
+    csv_path = tmp_path / "accidents.csv"
+    pd.DataFrame(
+        {
+            "collision_index": ["A", "B", "C", "D"],
+            "date": ["21/05/2024", "not-parsed", "02/01/2024", "03/01/2024"],
+            "time": ["08:15", "09:00", "17:45", "18:00"],
+            "latitude": [53.8, 51.5, 53.7, 53.6],
+            "longitude": [-1.5, -0.1, -1.8, -1.7],
+            "road_type": [6, 6, 3, 1],
+            "first_road_class": [3, 3, 1, 6],
+            "local_authority_ons_district": [
+                "E08000035", "E09000001", "E08000032", "W06000015"],
+            "unused_column": [1, 2, 3, 4],
+        }
+    ).to_csv(csv_path, index=False)
+
+    # One row per chunk, so the district filter runs on every chunk.
+    result = load_wy_data(str(csv_path), chunksize=1)
+
+    assert list(result["collision_index"]) == ["A", "C"]
+    assert "unused_column" not in result.columns
+    # Day-first dates parse the same whichever row comes first.
+    assert list(result["month"]) == [5, 1]
+    assert list(result["hour"]) == [8, 17]
+
+
+def test_no_rows_in_the_districts_is_an_empty_typed_frame(tmp_path):
+    csv_path = tmp_path / "accidents.csv"
+    pd.DataFrame(
+        {
+            "collision_index": ["A"],
+            "collision_severity": [3],
+            "date": ["21/05/2024"],
+            "time": ["08:15"],
+            "latitude": [51.5],
+            "longitude": [-0.1],
+            "road_type": [6],
+            "first_road_class": [3],
+            "local_authority_ons_district": ["E09000001"],
+        }
+    ).to_csv(csv_path, index=False)
+
+    result = load_wy_data(str(csv_path))
+
+    assert result.empty
+    assert str(result["collision_severity"].dtype) == "int8"
+    assert str(result["latitude"].dtype) == "float64"
+
+
+def test_read_district_rows_with_no_chunks_keeps_the_columns():
+    with patch("src.load_data.pd.read_csv", return_value=iter([])):
+        result = read_district_rows("empty.csv", ["E08000035"])
+
+    assert result.empty
+    assert list(result.columns) == ACCIDENT_COLUMNS
+    assert str(result["collision_severity"].dtype) == "int8"
+
+
 def test_get_data_period_normal():
     df = pd.DataFrame({"date": pd.to_datetime(["2023-01-01", "2023-01-10"])})
 
@@ -79,3 +145,82 @@ def test_get_data_period_empty():
 def test_get_data_period_missing_date_column():
     df = pd.DataFrame({"x": [1, 2]})
     assert get_data_period(df) == "Unknown Period"
+
+
+def test_linked_table_store_serves_rows_by_collision():
+    df_mock = pd.DataFrame(
+        {
+            "accident_index": [30, 10, 20, 10, 40],
+            "collision_year": [2024, 2023, 2024, 2023, 2024],
+            "value": [1, 2, 3, 4, 5],
+        }
+    )
+
+    with patch("src.load_data.pd.read_csv", return_value=df_mock):
+        store = LinkedTableStore("fake.csv")
+
+    result = store.rows_for([40, 10, 99])
+    assert list(result["collision_index"]) == [10, 10, 40]
+    assert list(result["value"]) == [2, 4, 5]
+
+    # The year hint only searches that year's block.
+    assert list(store.rows_for([10, 20], year=2024)["value"]) == [3]
+    assert list(store.rows_for([10], year=2022)["value"]) == []
+    assert list(store.rows_for_year(2023)["value"]) == [2, 4]
+
+
+def test_linked_table_store_renames_accident_year():
+    df_mock = pd.DataFrame(
+        {
+            "accident_index": [30, 10, 20],
+            "accident_year": [2024, 2023, 2024],
+            "value": [1, 2, 3],
+        }
+    )
+
+    with patch("src.load_data.pd.read_csv", return_value=df_mock):
+        store = LinkedTableStore("fake.csv")
+
+    assert list(store.rows_for([10, 30], year=2024)["value"]) == [1]
+    assert list(store.rows_for_year(2023)["value"]) == [2]
+
+
+def test_linked_table_store_without_years_searches_everything():
+    df_mock = pd.DataFrame(
+        {
+            "collision_index": [30, 10, 20, 10],
+            "value": [1, 2, 3, 4],
+        }
+    )
+
+    with patch("src.load_data.pd.read_csv", return_value=df_mock):
+        store = LinkedTableStore("fake.csv")
+
+    # No year to narrow the search by, so every row is a candidate.
+    assert list(store.rows_for([10, 20], year=2024)["value"]) == [2, 4, 3]
+    assert list(store.rows_for([30])["value"]) == [1]
+    assert len(store.rows_for_year(2024)) == 4
+
+
+def test_linked_table_store_matches_load_linked_data():
+    df_mock = pd.DataFrame(
+        {
+            "collision_index": [5, 3, 9, 3, 7, 1],
+            "collision_year": [2024] * 6,
+            "value": range(6),
+        }
+    )
+
+    with patch("src.load_data.pd.read_csv", return_value=df_mock):
+        store = LinkedTableStore("fake.csv")
+        expected = load_linked_data("fake.csv", target_indices=[3, 7, 1])
+
+    result = store.rows_for([3, 7, 1])
+    assert sorted(result["value"]) == sorted(expected["value"])
+
+
+def test_linked_table_store_read_error_is_empty():
+    with patch("src.load_data.pd.read_csv", side_effect=Exception("fail")):
+        store = LinkedTableStore("bad.csv")
+
+    assert store.rows_for(["A"]).empty
@@ -0,0 +1,130 @@
+import pandas as pd
+from unittest.mock import patch
+from map_utils import (
+    build_popups,
+    casualty_summaries,
+    render_incident_map,
+    vehicle_summaries,
+)
+from src.mappings import ui_mappings
+
+
+def _incidents():
+    return pd.DataFrame(
+        {
+            "collision_index": [1, 2],
+            "latitude": [53.8, 53.7],
+            "longitude": [-1.5, -1.6],
+            "collision_severity": [1, 3],
+            "weather_conditions": [2, 1],
+            "light_conditions": [1, 4],
+            "road_surface_conditions": [2, 1],
+            "urban_or_rural_area": [1, 2],
+            "special_conditions_at_site": [0, 4],
+            "number_of_vehicles": [2, 1],
+            "display_road_type": ["Roundabout", None],
+            "road_type": [1, 3],
+            "date": ["2024-05-21", "2024-01-02"],
+        }
+    )
+
+
+def test_casualty_summaries_group_and_dedupe():
+    cas = pd.DataFrame(
+        {
+            "collision_index": [1, 1, 1, 2],
+            "sex_of_casualty": [1, 1, 2, 9],
+            "age_band_of_casualty": [6, 6, 7, 99],
+        }
+    )
+
+    result = casualty_summaries(cas, ui_mappings)
+
+    assert result[1] == "Male (26-35), Female (36-45)"
+    assert result[2] == "Unknown (Age Unknown)"
+
+
+def test_build_popups_joins_linked_summaries():
+    cas = pd.DataFrame(
+        {"collision_index": [1], "sex_of_casualty": [2],
+         "age_band_of_casualty": [5]}
+    )
+    veh = pd.DataFrame(
+        {"collision_index": [1, 1, 1],
+         "generic_make_model": ["FORD FIESTA", "BMW 3 SERIES", "FORD FIESTA"]}
+    )
+
+    first, second = build_popups(_incidents(), cas, veh, ui_mappings)
+
+    assert "Fatal Incident" in first
+    assert "21 May 2024" in first
+    assert "Raining (no high winds)" in first
+    assert "Female (21-25)" in first
+    assert "FORD FIESTA, BMW 3 SERIES" in first
+    # No linked rows, and the road label falls back to the numeric code.
+    assert "Not Recorded" in second
+    assert "Unknown Vehicle" in second
+    assert "Dual carriageway" in second
+    assert "Roadworks" in second
+
+
+def test_render_incident_map_caps_markers():
+    with patch("map_utils.folium.CircleMarker") as mock_marker:
+        render_incident_map(
+            _incidents(), pd.DataFrame(), pd.DataFrame(), False, ui_mappings,
+            max_markers=1, renderer="markers",
+        )
+
+    mock_marker.assert_called_once()
+    assert mock_marker.call_args.kwargs["color"] == "red"
+
+
+def test_render_incident_map_fast_renderer():
+    with (
+        patch("map_utils.FastMarkerCluster") as mock_fast,
+        patch("map_utils.folium.CircleMarker") as mock_marker,
+    ):
+        render_incident_map(
+            _incidents(), pd.DataFrame(), pd.DataFrame(), False, ui_mappings,
+            max_markers=1, renderer="fast",
+        )
+
+    mock_marker.assert_not_called()
+    rows = mock_fast.call_args.args[0]
+    # Every incident is shipped - the marker cap only applies to folium.
+    assert len(rows) == 2
+    assert "Fatal Incident" not in mock_fast.call_args.kwargs["callback"]
+    assert '"Fatal"' in mock_fast.call_args.kwargs["callback"]
+
+
+def test_large_selection_goes_to_the_fast_renderer():
+    with (
+        patch("map_utils.FastMarkerCluster") as mock_fast,
+        patch("map_utils.folium.CircleMarker") as mock_marker,
+    ):
+        render_incident_map(
+            _incidents(), pd.DataFrame(), pd.DataFrame(), False, ui_mappings,
+            max_markers=1,
+        )
+        mock_fast.assert_called_once()
+        mock_marker.assert_not_called()
+
+        # Within the cap every incident gets its own marker.
+        render_incident_map(
+            _incidents(), pd.DataFrame(), pd.DataFrame(), False, ui_mappings)
+        assert mock_marker.call_count == 2
+        mock_fast.assert_called_once()
+
+
+def test_vehicle_summaries_fall_back_for_missing_makes():
+    veh = pd.DataFrame({"collision_index": [1, 1, 2],
+                        "generic_make_model": ["FORD FIESTA", None, None]})
+
+    result = vehicle_summaries(veh)
+
+    # A blank make spoils the whole collision's summary, as the row-wise
+    # version did; a missing column names every make unknown.
+    assert result[1] == "Vehicle Data Missing"
+    assert result[2] == "Vehicle Data Missing"
+    assert vehicle_summaries(veh[["collision_index"]])[1] == "Unknown Make"
+    assert vehicle_summaries(veh.iloc[:1])[1] == "FORD FIESTA"
@@ -5,7 +5,7 @@ from src.analysis.mapping import get_address, generate_severity_map
 
 def test_get_address_success():
 
-    with patch("src.analysis.mapping.rg.search") as mock_search:
+    with patch("src.geocoding.rg.search") as mock_search:
         mock_search.return_value = [{"name": "Leeds"}]
 
         result = get_address(53.8, -1.5)
@@ -14,16 +14,16 @@ def test_get_address_success():
 
 def test_get_address_empty_result():
 
-    with patch("src.analysis.mapping.rg.search") as mock_search:
-        mock_search.return_value = []
+    with patch("src.geocoding.rg.search") as mock_search:
+        mock_search.return_value = [{"name": ""}]
 
         result = get_address(53.8, -1.5)
-        assert result == "Unknown Location"
+        assert result == "Unknown Area"
 
 
 def test_get_address_exception():
 
-    with patch("src.analysis.mapping.rg.search", side_effect=Exception("fail")):
+    with patch("src.geocoding.rg.search", side_effect=Exception("fail")):
         result = get_address(53.8, -1.5)
         assert result == "Area Lookup Failed"
 
@@ -108,10 +108,42 @@ def test_generate_severity_map_blackspots():
         patch("src.analysis.mapping.folium.Map"),
         patch("src.analysis.mapping.MarkerCluster"),
         patch("src.analysis.mapping.folium.CircleMarker") as mock_circle,
-        patch("src.analysis.mapping.get_address", return_value="Test Street"),
+        patch(
+            "src.analysis.mapping.get_addresses", return_value=["Test Street"]
+        ) as mock_addresses,
         patch("src.analysis.mapping.open", create=True),
         patch("src.analysis.mapping.webbrowser.open"),
     ):
         generate_severity_map(df, blackspots=blackspots)
 
         mock_circle.assert_called()
+        mock_addresses.assert_called_once_with([(53.7, -1.4)], cache_dir=None)
+
+
+def test_generate_severity_map_fast_renderer():
+    df = pd.DataFrame(
+        {
+            "latitude": [53.8, 53.7, None],
+            "longitude": [-1.5, -1.6, -1.7],
+            "collision_severity": [1, 3, 2],
+            "first_road_class": [1, 3, 3],
+            "date": ["2023-01-01", "2023-01-02", "2023-01-03"],
+            "display_road_type": ["Motorway(Motorway)", "Slip", "Slip"],
+        }
+    )
+
+    with (
+        patch("src.analysis.mapping.folium.Map"),
+        patch("src.analysis.mapping.FastMarkerCluster") as mock_fast,
+        patch("src.analysis.mapping.folium.Marker") as mock_marker,
+        patch("src.analysis.mapping.open", create=True),
+        patch("src.analysis.mapping.webbrowser.open"),
+    ):
+        generate_severity_map(df, blackspots=None, renderer="fast")
+
+    # One compact payload instead of a Marker per collision.
+    mock_marker.assert_not_called()
+    rows = mock_fast.call_args.args[0]
+    assert len(rows) == 2
+    assert rows[0][:2] == [53.8, -1.5]
+    assert "var tables" in mock_fast.call_args.kwargs["callback"]
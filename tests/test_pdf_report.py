@@ -1,10 +1,9 @@
 import pytest
-import os
 import shutil
 import base64
-from src.analysis.report_generator import generate_pdf_report
+from src.analysis.report_generator import generate_pdf_report, report_filename
 
-def test_generate_pdf_report_flow(tmp_path):
+def test_generate_pdf_report_flow(tmp_path, monkeypatch):
     """Verifies the PDF is created and handles missing assets."""
 
     # Set up Mock Folders
@@ -33,7 +32,7 @@ def test_generate_pdf_report_flow(tmp_path):
 
     # Run Generator
     try:
-        os.chdir(tmp_path)
+        monkeypatch.chdir(tmp_path)
         generate_pdf_report(summary, hotspots, chart_folder=str(chart_dir))
 
     except FileNotFoundError as e:
@@ -42,4 +41,35 @@ def test_generate_pdf_report_flow(tmp_path):
     # Assertions
     expected_pdf = chart_dir / "West_Yorkshire_Traffic_Analysis_Report.pdf"
     assert expected_pdf.exists()
-    assert expected_pdf.stat().st_size > 0
\ No newline at end of file
+    assert expected_pdf.stat().st_size > 0
+
+def _page_count(pdf_path):
+    return pdf_path.read_bytes().count(b"/Type /Page\n")
+
+
+def test_pdf_report_uses_chart_records_not_folder(tmp_path, monkeypatch):
+    """Only the charts of the run are added, not stale files in the folder."""
+    chart_dir = tmp_path / 'output_charts'
+    chart_dir.mkdir()
+    assets_dir = tmp_path / 'assets'
+    assets_dir.mkdir()
+
+    pixel_png = base64.b64decode('iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8/5+hHgAHggJ/PchI7wAAAABJRU5ErkJggg==')
+    (assets_dir / 'logo.png').write_bytes(pixel_png)
+    (chart_dir / 'Stale_Chart.png').write_bytes(pixel_png)
+    (chart_dir / 'Fresh_Chart.png').write_bytes(pixel_png)
+
+    charts = [{'path': str(chart_dir / 'Fresh_Chart.png'), 'title': 'Fresh Chart'}]
+
+    monkeypatch.chdir(tmp_path)
+    generate_pdf_report(['Total Accidents: 10'], charts=charts,
+                        chart_folder=str(chart_dir))
+
+    # The summary page plus one page for the one chart.
+    expected_pdf = chart_dir / "West_Yorkshire_Traffic_Analysis_Report.pdf"
+    assert _page_count(expected_pdf) == 2
+
+
+def test_report_filename_names_the_region():
+    assert report_filename() == "West_Yorkshire_Traffic_Analysis_Report.pdf"
+    assert report_filename("Police Force 4") == "Police_Force_4_Traffic_Analysis_Report.pdf"
@@ -0,0 +1,65 @@
+import os
+import tracemalloc
+import base64
+import pandas as pd
+from src.charts import _render_bar, _render_pie
+from src.analysis.report_generator import (
+    REPORT_IMAGE_DPI,
+    generate_pdf_report,
+    report_filename,
+)
+
+PIXEL_PNG = base64.b64decode('iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAfFcSJAAAADUlEQVR42mP8/5+hHgAHggJ/PchI7wAAAABJRU5ErkJggg==')
+
+
+def _chart_folder(tmp_path, n_charts=8):
+    """A report folder with full size (12x16 inch) bar and pie charts."""
+    chart_dir = tmp_path / "output_charts"
+    chart_dir.mkdir()
+    (tmp_path / "assets").mkdir()
+    (tmp_path / "assets" / "logo.png").write_bytes(PIXEL_PNG)
+
+    charts = []
+    for i in range(n_charts):
+        series = pd.Series(range(1, 13), index=[f"Label {j}" for j in range(12)]) * (i + 1)
+        path = str(chart_dir / f"Chart_{i}.png")
+        if i % 2:
+            _render_pie(series, path, f"Chart {i}")
+        else:
+            _render_bar(series, path, f"Chart {i}", "X", "Y", color="red")
+        charts.append({"path": path, "title": f"Chart {i}"})
+    return chart_dir, charts
+
+
+def _build(chart_dir, charts, image_dpi):
+    """Peak traced memory and file size of the report (the timings are
+    the generate_pdf_report benchmarks in benchmarks/run.py)."""
+    tracemalloc.start()
+    generate_pdf_report(["Total Accidents: 10"], chart_folder=str(chart_dir),
+                        charts=charts, image_dpi=image_dpi)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak, os.path.getsize(os.path.join(chart_dir, report_filename()))
+
+
+def test_compact_report_is_smaller_and_lighter(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    chart_dir, charts = _chart_folder(tmp_path)
+
+    full = _build(chart_dir, charts, image_dpi=None)
+    compact = _build(chart_dir, charts, image_dpi=REPORT_IMAGE_DPI)
+
+    assert compact[1] * 2 < full[1]
+    assert compact[0] * 2 < full[0]
+
+
+def test_repeated_chart_is_embedded_once(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    chart_dir, charts = _chart_folder(tmp_path, n_charts=1)
+
+    _build(chart_dir, charts, image_dpi=REPORT_IMAGE_DPI)
+    _, once = _build(chart_dir, charts, image_dpi=REPORT_IMAGE_DPI)
+    # The same chart three times (different records, same file).
+    _, thrice = _build(chart_dir, charts * 3, image_dpi=REPORT_IMAGE_DPI)
+
+    assert thrice < once * 1.2
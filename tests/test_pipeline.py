@@ -0,0 +1,198 @@
+import json
+import os
+import threading
+import pandas as pd
+import pytest
+from unittest.mock import MagicMock, patch
+from src.pipeline import (
+    STAGES,
+    StageError,
+    critical_path_seconds,
+    load_artefacts,
+    plan_stages,
+    run_stages,
+)
+import main
+
+
+def _fake_stages():
+    """The real stage graph with every stage function replaced by a mock."""
+    frame = pd.DataFrame({"collision_index": ["A", "B"]})
+    outputs = {
+        "load": {"df": frame},
+        "vehicles": {"vehicles_df": frame},
+        "casualties": {"casualties_df": frame},
+        "blackspots": {"hotspots": [{"count": 2}], "data_duration": "2024"},
+        "charts": {"charts": [{"path": "a.png"}], "report_content": ["x"]},
+        "map": {"map_path": "map.html"},
+        "report": {"report_path": "report.pdf"},
+    }
+    return {
+        name: (requires, keys, MagicMock(return_value=outputs[name]))
+        for name, (requires, keys, _) in STAGES.items()
+    }
+
+
+def test_plan_runs_everything_a_target_needs():
+    plan = plan_stages(["report"], reusable=lambda stage: False)
+
+    assert plan == [("load", "run"), ("blackspots", "run"), ("vehicles", "run"),
+                    ("casualties", "run"), ("charts", "run"), ("report", "run")]
+
+
+def test_plan_reuses_saved_stages_without_their_inputs():
+    plan = plan_stages(["report"], reusable=lambda stage: stage != "report")
+
+    # The saved charts and blackspots are enough, the data isn't loaded.
+    assert plan == [("blackspots", "reuse"), ("charts", "reuse"),
+                    ("report", "run")]
+
+
+def test_plan_rejects_unknown_stage():
+    with pytest.raises(StageError):
+        plan_stages(["nope"], reusable=lambda stage: False)
+
+
+def test_single_stage_reuses_artefacts_of_an_earlier_run(tmp_path):
+    stages = _fake_stages()
+    timings_path = str(tmp_path / "timings.json")
+
+    with patch.dict("src.pipeline.STAGES", stages):
+        run_stages(["load", "blackspots"], artefact_dir=str(tmp_path))
+        stages["load"][2].reset_mock()
+
+        state, timings = run_stages(
+            ["blackspots"], artefact_dir=str(tmp_path),
+            timings_path=timings_path)
+
+    stages["load"][2].assert_not_called()
+    assert stages["blackspots"][2].call_count == 2
+    assert list(state["df"]["collision_index"]) == ["A", "B"]
+    assert [(t["stage"], t["source"]) for t in timings] == [
+        ("load", "artefact"), ("blackspots", "run")]
+
+    with open(timings_path) as f:
+        report = json.load(f)
+    assert report["targets"] == ["blackspots"]
+    assert all(stage["seconds"] >= 0 for stage in report["stages"])
+    assert report["critical_path_seconds"] <= report["wall_seconds"] + 0.01
+
+
+def test_artefacts_round_trip_frames_and_json(tmp_path):
+    with patch.dict("src.pipeline.STAGES", _fake_stages()):
+        run_stages(["blackspots"], artefact_dir=str(tmp_path))
+
+        saved = load_artefacts(str(tmp_path), "blackspots")
+        assert saved == {"hotspots": [{"count": 2}], "data_duration": "2024"}
+        assert isinstance(load_artefacts(str(tmp_path), "load")["df"], pd.DataFrame)
+        assert load_artefacts(str(tmp_path), "charts") is None
+
+
+def test_state_given_in_is_not_loaded_again():
+    stages = _fake_stages()
+
+    with patch.dict("src.pipeline.STAGES", stages):
+        _, timings = run_stages(
+            ["blackspots"], state={"df": 1},
+            trace_memory=True)
+
+    stages["load"][2].assert_not_called()
+    assert timings[0]["source"] == "state"
+    assert timings[1]["peak_traced_mb"] is not None
+
+
+def test_independent_stages_run_at_the_same_time():
+    stages = _fake_stages()
+    # Each linked load waits for the other, so only passes side by side.
+    both_loading = threading.Barrier(2, timeout=2)
+
+    def load(state, settings):
+        both_loading.wait()
+        return {}
+
+    for name in ("vehicles", "casualties"):
+        stages[name][2].side_effect = load
+
+    with patch.dict("src.pipeline.STAGES", stages):
+        run_stages(["vehicles", "casualties"], workers=2)
+
+        # One at a time the first load waits for the second in vain.
+        both_loading.reset()
+        with pytest.raises(threading.BrokenBarrierError):
+            run_stages(["vehicles", "casualties"], workers=1)
+
+
+def test_parallel_run_matches_serial_run():
+    stages = _fake_stages()
+
+    with patch.dict("src.pipeline.STAGES", stages):
+        serial, serial_timings = run_stages(list(STAGES), workers=1)
+        parallel, parallel_timings = run_stages(list(STAGES), workers=4)
+
+    assert list(parallel) == list(serial)
+    assert [t["stage"] for t in parallel_timings] == [t["stage"] for t in serial_timings]
+    # Every stage only started once the stages it needs were done.
+    ends = {t["stage"]: t["end"] for t in parallel_timings}
+    for timing in parallel_timings:
+        assert all(ends[r] <= timing["start"] for r in STAGES[timing["stage"]][0])
+
+
+def test_critical_path_is_the_longest_chain():
+    timings = [{"stage": stage, "seconds": seconds} for stage, seconds in [
+        ("load", 1), ("blackspots", 1), ("vehicles", 3), ("casualties", 2),
+        ("charts", 2), ("map", 7), ("report", 1)]]
+
+    # load -> blackspots -> map beats load -> vehicles -> charts -> report.
+    assert critical_path_seconds(timings) == 9
+
+
+def test_main_runs_one_stage_and_reports_errors(tmp_path, capsys):
+    with patch("main.run_stages", return_value=({}, [])) as mock_run:
+        main.main(["map", "--artefacts", str(tmp_path)])
+
+    assert mock_run.call_args.args[0] == ["map"]
+    assert mock_run.call_args.kwargs["timings_path"] == os.path.join(
+        str(tmp_path), "timings.json")
+
+    with patch("main.run_stages", side_effect=StageError("No data loaded.")):
+        main.main(["load"])
+    assert "Error: No data loaded." in capsys.readouterr().out
+
+
+def test_artefacts_of_other_data_are_not_reused(tmp_path, capsys):
+    stages = _fake_stages()
+    source = tmp_path / "accidents.csv"
+    source.write_text("collision_index\nA\n")
+    settings = {"accidents_path": str(source)}
+    artefacts = str(tmp_path / "artefacts")
+
+    with patch.dict("src.pipeline.STAGES", stages):
+        run_stages(["load"], settings=settings, artefact_dir=artefacts)
+        run_stages(["blackspots"], settings=settings, artefact_dir=artefacts)
+        assert stages["load"][2].call_count == 1
+
+        # A new extract: the saved frame is stale.
+        source.write_text("collision_index\nA\nB\n")
+        _, timings = run_stages(["blackspots"], settings=settings,
+                                artefact_dir=artefacts)
+
+    assert stages["load"][2].call_count == 2
+    assert timings[0]["source"] == "run"
+    assert "Saved load outputs are out of date" in capsys.readouterr().out
+
+
+def test_blackspot_state_setting_refreshes_the_saved_totals(tmp_path):
+    df = pd.DataFrame({"date": pd.to_datetime(["2024-01-05", "2024-02-01"])})
+    state_dir = str(tmp_path / "state")
+
+    with patch("src.analysis.blackspot_state.refresh_blackspots",
+               return_value=[{"count": 2}]) as refresh, \
+            patch("src.analysis.blackspots.identify_blackspots") as batch:
+        state, _ = run_stages(
+            ["blackspots"], settings={"blackspot_state": state_dir},
+            state={"df": df}, workers=1)
+
+    refresh.assert_called_once()
+    assert refresh.call_args.args[1] == state_dir
+    batch.assert_not_called()
+    assert state["hotspots"] == [{"count": 2}]
@@ -0,0 +1,69 @@
+import os
+import numpy as np
+import pandas as pd
+from src.load_data import add_road_labels
+from src.mappings import road_type_labels, road_class_labels
+
+ACCIDENTS_CSV = os.path.join(
+    os.path.dirname(__file__), "..", "data", "accidents.csv")
+
+
+def _row_wise_labels(df):
+    """The original per-row labelling, kept here as the parity reference."""
+    df = df.copy()
+    df["road_type"] = df["road_type"].map(road_type_labels)
+    df["road_class_name"] = df["first_road_class"].map(road_class_labels)
+
+    def identify_road(row):
+        if row["road_class_name"] == "Motorway":
+            return "Motorway(Motorway)"
+        else:
+            return row["road_type"]
+
+    df["display_road_type"] = df.apply(identify_road, axis=1)
+    return df
+
+
+def _synthetic_roads(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "road_type": rng.choice([1, 2, 3, 6, 7, 9, 12, 15, -1], size=rows),
+        "first_road_class": rng.choice([1, 2, 3, 4, 5, 6], size=rows),
+    })
+
+
+def test_vectorised_labels_match_row_wise_on_bundled_data():
+    raw = pd.read_csv(
+        ACCIDENTS_CSV, usecols=["road_type", "first_road_class"])
+
+    expected = _row_wise_labels(raw)
+    result = add_road_labels(raw.copy())
+
+    for col in ["road_type", "road_class_name", "display_road_type"]:
+        assert isinstance(result[col].dtype, pd.CategoricalDtype)
+        pd.testing.assert_series_equal(
+            result[col].astype(object), expected[col].astype(object))
+
+
+def test_vectorised_labels_handle_unknown_codes():
+    df = pd.DataFrame({"road_type": [1, 99], "first_road_class": [6, 1]})
+
+    result = add_road_labels(df)
+
+    assert result["road_type"].isna().tolist() == [False, True]
+    # A motorway still gets its label even if the layout code is unknown.
+    assert list(result["display_road_type"]) == [
+        "Roundabout", "Motorway(Motorway)"]
+
+
+def test_vectorised_labels_match_row_wise_on_synthetic_codes():
+    # Every layout and class code, unknown ones too (the timing against the
+    # row-wise version is the add_road_labels benchmark in benchmarks/run.py).
+    raw = _synthetic_roads(20_000, seed=1)
+
+    expected = _row_wise_labels(raw)
+    result = add_road_labels(raw.copy())
+
+    for col in ["road_type", "road_class_name", "display_road_type"]:
+        pd.testing.assert_series_equal(
+            result[col].astype(object), expected[col].astype(object))
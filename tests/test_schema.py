@@ -0,0 +1,81 @@
+import os
+import pandas as pd
+import pytest
+from src.load_data import load_wy_data
+from src.schema import (
+    ACCIDENT_SCHEMA,
+    CASUALTY_SCHEMA,
+    VEHICLE_SCHEMA,
+    apply_schema,
+    compact_column,
+    frame_bytes,
+    memory_report,
+)
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), "..", "data")
+
+
+def test_load_wy_data_footprint_against_wide_dtypes():
+    after = load_wy_data(os.path.join(DATA_DIR, "accidents.csv"))
+
+    # Rebuild the frame the loader used to return: int64 codes and strings.
+    before = after.copy()
+    for col in before.columns:
+        if isinstance(before[col].dtype, pd.CategoricalDtype):
+            before[col] = before[col].astype(object)
+        elif pd.api.types.is_integer_dtype(before[col]):
+            before[col] = before[col].astype("int64")
+
+    report = memory_report(before, after)
+
+    assert report.loc["TOTAL", "ratio"] > 4
+    assert report.loc["display_road_type", "dtype_after"] == "category"
+    assert report.loc["collision_severity", "dtype_after"] == "int8"
+
+
+@pytest.mark.parametrize(
+    "filename, schema",
+    [
+        ("vehicles.csv", VEHICLE_SCHEMA),
+        ("casualties.csv", CASUALTY_SCHEMA),
+    ],
+)
+def test_schema_shrinks_linked_tables(filename, schema):
+    before = pd.read_csv(os.path.join(DATA_DIR, filename), low_memory=False)
+
+    after = apply_schema(before, schema)
+
+    # Same values, a fraction of the memory.
+    for col in before.columns:
+        assert list(after[col].astype(object)) == list(before[col])
+    assert frame_bytes(after) * 3 < frame_bytes(before)
+
+    report = memory_report(before, after)
+    assert report.loc["TOTAL", "bytes_before"] == frame_bytes(before) - (
+        before.index.memory_usage())
+    assert report.loc["TOTAL", "ratio"] > 3
+
+
+def test_compact_column_uses_nullable_int_for_gaps():
+    result = compact_column(pd.Series([1.0, None, 3.0]), "int8")
+
+    assert str(result.dtype) == "Int8"
+    assert result.isna().tolist() == [False, True, False]
+
+
+def test_compact_column_leaves_values_that_dont_fit():
+    too_big = pd.Series([1, 300])
+    text = pd.Series(["1", "NULL"])
+
+    assert compact_column(too_big, "int8").dtype == too_big.dtype
+    assert compact_column(text, "int8").dtype == text.dtype
+
+
+def test_apply_schema_leaves_input_frame_alone():
+    df = pd.DataFrame({"collision_severity": [1, 2], "other": [5, 6]})
+
+    result = apply_schema(df, ACCIDENT_SCHEMA)
+
+    assert str(result["collision_severity"].dtype) == "int8"
+    assert str(df["collision_severity"].dtype) == "int64"
+    assert str(result["other"].dtype) == "int64"
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+import pytest
+from unittest.mock import patch
+from src.analysis.blackspots import identify_blackspots
+from src.analysis.scoring import collision_weights, empirical_bayes, site_scores
+
+
+def _collisions():
+    return pd.DataFrame({
+        "latitude": [53.1, 53.1, 53.1, 53.2, 53.3],
+        "longitude": [-1.1, -1.1, -1.1, -1.2, -1.3],
+        "collision_severity": [3, 3, 3, 1, 2],
+        "number_of_casualties": [1, 1, 1, 2, 1],
+        "date": pd.to_datetime([
+            "2024-12-31", "2024-12-31", "2024-12-31",
+            "2024-12-31", "2023-12-31",
+        ]),
+        "display_road_type": ["A", "A", "A", "B", "B"],
+    })
+
+
+def _fake_search(coords, mode=1, verbose=False):
+    return [{"admin2": "Leeds"} for _ in coords]
+
+
+def test_collision_weights_severity_casualties_and_decay():
+    df = _collisions()
+
+    assert collision_weights(df).tolist() == [1, 1, 1, 20, 3]
+
+    decayed = collision_weights(df, decay=True, half_life_days=366)
+    # The serious collision is one half life older than the latest one.
+    assert decayed[4] == pytest.approx(1.5)
+    assert decayed[3] == 20
+
+
+def test_empirical_bayes_shrinks_towards_the_group_mean():
+    observed = np.array([1.0, 2.0, 3.0, 30.0, 2.0])
+    groups = ["A", "A", "A", "A", "B"]
+
+    mean, low, high = empirical_bayes(observed, groups)
+
+    # The outlier is pulled towards its group mean and keeps its rank.
+    assert 9 < mean[3] < 30
+    assert mean[3] == mean.max()
+    assert (low <= mean).all() and (mean <= high).all()
+
+
+def test_site_scores_count_is_the_raw_count():
+    counts = np.array([3, 1])
+    scores, low, high = site_scores(_collisions(), np.array([0] * 5), counts)
+
+    assert scores.tolist() == [3.0, 1.0]
+    assert low is None and high is None
+
+
+def test_site_scores_rejects_unknown_score():
+    with pytest.raises(ValueError):
+        site_scores(_collisions(), np.zeros(5, dtype=int), np.array([5]),
+                    score="bogus")
+
+
+def test_identify_blackspots_severity_score_reranks_sites():
+    df = _collisions()
+
+    with patch("src.geocoding.rg.search", side_effect=_fake_search):
+        by_count = identify_blackspots(df, min_accidents=1)
+        by_harm = identify_blackspots(df, min_accidents=1, score="severity")
+        by_eb = identify_blackspots(df, min_accidents=1, score="eb")
+
+    assert by_count[0]["count"] == 3
+    # The single fatal collision with two casualties outweighs three slights.
+    assert (by_harm[0]["latitude"], by_harm[0]["score"]) == (53.2, 20.0)
+    assert by_harm[0]["count"] == 1
+    assert {"score", "score_low", "score_high"} <= set(by_eb[0])
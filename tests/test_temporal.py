@@ -1,5 +1,5 @@
 import pandas as pd
-from unittest.mock import patch
+from unittest.mock import ANY, patch
 from src.analysis.temporal import (
     analyse_hour_distribution,
     analyse_weekday_distribution,
@@ -82,6 +82,10 @@ def test_run_temporal_suite_calls_all_three():
     ):
         run_temporal_suite(df)
 
-        h.assert_called_once_with(df)
-        w.assert_called_once_with(df)
-        m.assert_called_once_with(df)
+        # Each gets its counts from one aggregate_collisions pass.
+        h.assert_called_once_with(df, ANY, "West Yorkshire")
+        w.assert_called_once_with(df, ANY, "West Yorkshire")
+        m.assert_called_once_with(df, ANY, "West Yorkshire")
+        assert h.call_args.args[1].to_dict() == {1: 1}
+        assert w.call_args.args[1]["Monday"] == 1
+        assert m.call_args.args[1].to_dict() == {1: 1}